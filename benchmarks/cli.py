@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Benchmark of CLI output helpers with large argument sets and commands lists, comparing the cost of each helper when
+its messages are discarded because of the log level against the cost when they are written.
+
+Usage: PYTHONPATH=. python benchmarks/cli.py
+"""
+import logging
+import timeit
+
+from clinner.cli import CLI
+from clinner.command import Type
+
+ARGUMENTS = {"argument_{}".format(i): "value_{}".format(i) for i in range(1000)}
+COMMANDS = [["command", "--option", "value_{}".format(i)] for i in range(10000)]
+NUMBER = 200
+
+
+def bench(cli, level):
+    cli.set_level(level)
+    header = timeit.timeit(lambda: cli.print_header("foo", **ARGUMENTS), number=NUMBER)
+    commands = timeit.timeit(lambda: cli.print_commands_list(COMMANDS, Type.SHELL), number=NUMBER)
+    return header / NUMBER * 1e6, commands / NUMBER * 1e6
+
+
+def main():
+    cli = CLI()
+    cli.disable()
+    cli.handler = logging.NullHandler()
+    cli.enable()
+
+    print("{:<10} {:>22} {:>22}".format("Level", "print_header (us)", "print_commands (us)"))
+    for name, level in (("WARNING", logging.WARNING), ("DEBUG", logging.DEBUG)):
+        header, commands = bench(cli, level)
+        print("{:<10} {:>22.1f} {:>22.1f}".format(name, header, commands))
+
+
+if __name__ == "__main__":
+    main()
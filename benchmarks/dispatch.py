@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Benchmark of running many commands, comparing the cost of creating a Main for each command, that builds and parses the
+whole parser every time, against dispatching them through a single Main that builds its parser once.
+
+Usage: PYTHONPATH=. python benchmarks/dispatch.py
+"""
+import timeit
+
+from clinner.command import Type, command
+from clinner.run.main import Main
+
+NUMBER = 1000
+COMMANDS = 50
+
+
+def register_commands():
+    for i in range(COMMANDS):
+
+        def foo(*args, **kwargs):
+            return 0
+
+        foo.__name__ = foo.__qualname__ = "foo_{}".format(i)
+        command(command_type=Type.PYTHON, args=((("--bar",), {"type": int}),))(foo)
+
+
+def main():
+    register_commands()
+    argv = ["-q", "foo_0", "--bar", "1"]
+
+    create = timeit.timeit(lambda: Main(argv).run(), number=NUMBER)
+
+    dispatcher = Main(argv)
+    dispatch = timeit.timeit(lambda: dispatcher.dispatch(argv), number=NUMBER)
+
+    print("{:<24} {:>18}".format("Mode", "per command (us)"))
+    print("{:<24} {:>18.1f}".format("Main per command", create / NUMBER * 1e6))
+    print("{:<24} {:>18.1f}".format("Main.dispatch", dispatch / NUMBER * 1e6))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,8 @@
-import shlex
 from functools import partial, update_wrapper
-from typing import Callable, List, Tuple, Union
+from typing import Callable, List, Mapping, Tuple, Union
 
 from clinner.command import Type as CommandType
-from clinner.command import command
+from clinner.command import CommandSpec, command
 from clinner.exceptions import CommandTypeError
 from clinner.settings import settings
 
@@ -44,28 +43,29 @@ class Builder:
         return [cmd]
 
     @staticmethod
-    def build_command(command_name: str, *args, **kwargs) -> Tuple[List[Union[List[str], Callable]], CommandType]:
+    def build_command(
+        command_name: str, *args, spec: CommandSpec = None, default_args: Mapping = None, **kwargs
+    ) -> Tuple[List[Union[List[str], Callable]], CommandType]:
         """
         Build command given his name and a list of args.
 
         :param command_name: command name.
         :param args: List of command args.
+        :param spec: Command spec, looked up in register by its name if not given.
+        :param default_args: Default args of each command, taken from global settings if not given.
         :param kwargs: Dict of command kwargs.
         :return: List of commands ready to be executed.
         """
         # Get registered command
-        cmd = command.register[command_name]
+        cmd = spec or command.register[command_name]
 
         # Get command callable
-        method = cmd["callable"]
-        command_type = cmd["type"]
+        method = cmd.callable
+        command_type = cmd.type
 
-        # Get default args if necessary
+        # Get default args if necessary, already tokenized by settings
         if not args:
-            try:
-                args = shlex.split(settings.default_args[command_name])
-            except KeyError:
-                args = []
+            args = (settings.default_args if default_args is None else default_args).get(command_name, ())
 
         if command_type == CommandType.PYTHON:
             built = Builder._build_python_command(method, *args, **kwargs)
@@ -0,0 +1,267 @@
+"""
+Cache of command results and output files, kept in a local content-addressed store bounded in size.
+"""
+import glob
+import hashlib
+import json
+import os
+import shutil
+import threading
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Union
+
+__all__ = ["Cache", "ResultStore", "MISSING", "file_digest"]
+
+CACHE_PATH = os.path.join(".clinner", "cache")
+
+#: Value returned by stores when a key is not found.
+MISSING = object()
+
+# File digests by path, modification time and size
+_digests = {}
+
+
+def _files(patterns: Iterable[str]) -> List[str]:
+    files = set()
+    for pattern in patterns:
+        for path in glob.glob(pattern, recursive=True):
+            if os.path.isdir(path):
+                for root, dirs, filenames in os.walk(path):
+                    dirs[:] = [d for d in dirs if not d.startswith(".")]
+                    files.update(os.path.join(root, f) for f in filenames)
+            else:
+                files.add(path)
+
+    return sorted(files)
+
+
+def file_digest(path: str, block_size: int = 65536) -> str:
+    """
+    SHA256 digest of file content, read in blocks.
+
+    :param path: File path.
+    :param block_size: Size of each block read.
+    :return: Hex digest.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+
+def _digest(path: str) -> str:
+    """
+    Content digest of a file, computed again only if the file is modified.
+    """
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    try:
+        return _digests[key]
+    except KeyError:
+        return _digests.setdefault(key, file_digest(path))
+
+
+class Cache:
+    """
+    Cache policy of a command or a step. A result is identified by the command, its arguments, the content of its
+    input files and the value of allowed environment variables, so it is reused while none of them change. Output files
+    are stored along with the result and restored instead of running the command or step again.
+    """
+
+    def __init__(self, inputs: Iterable[str] = (), outputs: Iterable[str] = (), env: Iterable[str] = ()):
+        """
+        Cache policy.
+
+        :param inputs: Input files, as paths, directories or glob patterns.
+        :param outputs: Output files, as paths, directories or glob patterns.
+        :param env: Environment variables that are part of the key, any other is ignored.
+        """
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.env = tuple(env)
+
+    @classmethod
+    def build(cls, value: Union[None, bool, Iterable[str], dict, "Cache"]) -> Optional["Cache"]:
+        """
+        Build a cache policy from given value, that can be a boolean, a list of input files, a dict of policy kwargs or
+        a policy.
+
+        :param value: Cache value.
+        :return: Cache policy or None if value is empty.
+        """
+        if value is None or value is False or isinstance(value, cls):
+            return value or None
+
+        if value is True:
+            return cls()
+
+        if isinstance(value, dict):
+            return cls(**value)
+
+        if isinstance(value, (list, tuple)):
+            return cls(inputs=value)
+
+        raise TypeError("Wrong cache policy '{}'".format(value))
+
+    def key(
+        self, name: str, args: Iterable[Any], kwargs: Dict[str, Any], environ: Optional[Mapping[str, str]] = None
+    ) -> str:
+        """
+        Key of a command result.
+
+        :param name: Command qualified name.
+        :param args: Command args.
+        :param kwargs: Command kwargs.
+        :param environ: Environment the command runs with, os.environ if not given.
+        :return: Hex digest.
+        """
+        digest = hashlib.sha256()
+        digest.update(name.encode())
+        environ = {var: (environ or os.environ).get(var) for var in self.env}
+        digest.update(json.dumps([list(args), kwargs, environ], sort_keys=True, default=repr).encode())
+        for path in _files(self.inputs):
+            digest.update("\0{}\0{}".format(path, _digest(path)).encode())
+
+        return digest.hexdigest()
+
+    def output_files(self) -> List[str]:
+        """
+        Output files that currently exist.
+
+        :return: Sorted file paths.
+        """
+        return _files(self.outputs)
+
+    def __repr__(self):
+        return "Cache(inputs={}, outputs={}, env={})".format(list(self.inputs), list(self.outputs), list(self.env))
+
+
+class ResultStore:
+    """
+    Store of command results addressed by their key, and of files addressed by their content digest, bounded in size.
+    Results are stored as JSON along with the digests of their output files, that are restored when the result is read.
+    The least recently used entries are evicted when the max size is exceeded.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_size: int = 256 * 1024 * 1024):
+        """
+        Results store.
+
+        :param path: Store directory. Taken from CLINNER_CACHE environment variable if not given.
+        :param max_size: Max size in bytes of stored results.
+        """
+        self.path = path or os.environ.get("CLINNER_CACHE", CACHE_PATH)
+        self.max_size = max_size
+        self._lock = threading.Lock()
+
+    def _entry(self, key: str) -> str:
+        return os.path.join(self.path, key[:2], key)
+
+    @staticmethod
+    def _write(entry: str, source: str):
+        if os.path.dirname(entry):
+            os.makedirs(os.path.dirname(entry), exist_ok=True)
+        partial = "{}.{}.{}".format(entry, os.getpid(), threading.get_ident())
+        shutil.copy(source, partial)
+        os.replace(partial, entry)
+
+    def _restore_files(self, manifest: Dict[str, str]) -> bool:
+        if not all(os.path.exists(self._entry(d)) for d in manifest.values()):
+            return False
+
+        try:
+            for path, digest in manifest.items():
+                if not os.path.isfile(path) or _digest(path) != digest:
+                    self._write(path, self._entry(digest))
+                os.utime(self._entry(digest))
+        except OSError:
+            # Evicted meanwhile
+            return False
+
+        return True
+
+    def get(self, key: str) -> Any:
+        """
+        Get a result, marking it as recently used. Its output files are restored to their paths, keeping the ones
+        whose content is already the stored one.
+
+        :param key: Result key.
+        :return: Result or MISSING if it is not stored or its output files are not stored anymore.
+        """
+        entry = self._entry(key)
+        try:
+            with open(entry) as f:
+                stored = json.load(f)
+            value, files = stored["value"], stored["files"]
+            os.utime(entry)
+        except (OSError, ValueError, TypeError, KeyError):
+            return MISSING
+
+        return value if self._restore_files(files) else MISSING
+
+    def put(self, key: str, value: Any, files: Iterable[str] = ()) -> bool:
+        """
+        Store a result along with its output files, evicting least recently used results if the store exceeds its max
+        size. File contents are stored once, by their digest, and the result points to them.
+
+        :param key: Result key.
+        :param value: Result, that must be serializable as JSON.
+        :param files: Output file paths.
+        :return: True if result has been stored, False if it cannot be serialized or it exceeds store size.
+        """
+        try:
+            manifest = {path: _digest(path) for path in files}
+            data = json.dumps({"value": value, "files": manifest}, sort_keys=True)
+        except (TypeError, ValueError, OSError):
+            return False
+
+        if len(data) + sum(os.path.getsize(p) for p in manifest) > self.max_size:
+            return False
+
+        for path, digest in manifest.items():
+            blob = self._entry(digest)
+            if os.path.exists(blob):
+                os.utime(blob)
+            else:
+                self._write(blob, path)
+
+        entry = self._entry(key)
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        partial = "{}.{}.{}".format(entry, os.getpid(), threading.get_ident())
+        with open(partial, "w") as f:
+            f.write(data)
+        os.replace(partial, entry)
+
+        self._evict()
+        return True
+
+    def _evict(self):
+        with self._lock:
+            entries = []
+            for root, _, filenames in os.walk(self.path):
+                for f in filenames:
+                    try:
+                        stat = os.stat(os.path.join(root, f))
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime_ns, stat.st_size, os.path.join(root, f)))
+
+            size = sum(e[1] for e in entries)
+            for _, entry_size, path in sorted(entries):
+                if size <= self.max_size:
+                    break
+
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                size -= entry_size
+
+    def clear(self):
+        """
+        Remove all stored results.
+        """
+        for root, _, filenames in os.walk(self.path):
+            for f in filenames:
+                os.remove(os.path.join(root, f))
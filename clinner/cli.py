@@ -1,6 +1,11 @@
+import atexit
+import json
 import logging
+import queue
+import threading
 import typing
 from collections import OrderedDict
+from logging.handlers import QueueHandler, QueueListener
 
 from clinner.command import Type
 
@@ -11,7 +16,138 @@ try:
 except ImportError:  # pragma: no cover
     _colorlog = False
 
-__all__ = ["CLI"]
+__all__ = ["CLI", "CLILogger", "JSONFormatter"]
+
+
+class JSONFormatter(logging.Formatter):
+    """
+    Formatter that renders each record as a single line JSON object. Records logged by CLI contain an event name and
+    structured data that are added as fields of the object.
+    """
+
+    def format(self, record):
+        event = {
+            "time": record.created,
+            "level": record.levelname,
+            "event": getattr(record, "event", "message"),
+            "message": record.getMessage(),
+        }
+        event.update(getattr(record, "data", {}))
+
+        if record.exc_info:
+            event["exception"] = self.formatException(record.exc_info)
+
+        return json.dumps(event, default=str)
+
+
+class CLILogger(logging.LoggerAdapter):
+    """
+    Logger of a CLI. Every CLI writes through the shared *cli* logger, whose handlers are added only once, but each one
+    has its own level and handlers, so mains running at the same time do not change the output of each other.
+    """
+
+    def __init__(self, logger, level=logging.NOTSET):
+        super(CLILogger, self).__init__(logger, {})
+        self.level = level
+        self.handlers = []
+
+    def setLevel(self, level):  # noqa
+        self.level = level
+
+    def getEffectiveLevel(self):  # noqa
+        return self.level or self.logger.getEffectiveLevel()
+
+    def isEnabledFor(self, level):  # noqa
+        return level >= self.getEffectiveLevel()
+
+    def addHandler(self, handler):  # noqa
+        if handler not in self.handlers:
+            self.handlers.append(handler)
+
+    def removeHandler(self, handler):  # noqa
+        if handler in self.handlers:
+            self.handlers.remove(handler)
+
+    def process(self, msg, kwargs):
+        kwargs["extra"] = dict(kwargs.get("extra") or {}, cli_handlers=tuple(self.handlers))
+        return msg, kwargs
+
+
+# Handlers shared by all CLI instances, by format
+_handlers = {}
+_handlers_lock = threading.Lock()
+_json_listener = None
+
+
+def _text_handler() -> logging.Handler:
+    if _colorlog:
+        handler = colorlog.StreamHandler()
+        handler.setFormatter(
+            colorlog.ColoredFormatter(
+                "%(log_color)s%(message)s",
+                datefmt=None,
+                reset=True,
+                log_colors={
+                    "DEBUG": "cyan",
+                    "INFO": "green",
+                    "WARNING": "yellow",
+                    "ERROR": "red",
+                    "CRITICAL": "red,bg_white",
+                },
+                style="%",
+            )
+        )
+    else:
+        #  Default to basic logging
+        handler = logging.StreamHandler()
+
+    return handler
+
+
+def _json_handler() -> logging.Handler:
+    global _json_listener
+
+    handler = logging.StreamHandler()
+    handler.setFormatter(JSONFormatter())
+
+    records = queue.Queue()
+    _json_listener = QueueListener(records, handler)
+    _json_listener.start()
+    atexit.register(_json_listener.stop)
+
+    return QueueHandler(records)
+
+
+def _shared_handler(log_format: str) -> logging.Handler:
+    """
+    Get the handler of given format, creating it and adding it to *cli* logger the first time. Each handler only
+    writes records of the CLI instances using it.
+
+    :param log_format: Output format, text or json.
+    :return: Handler.
+    """
+    with _handlers_lock:
+        if log_format not in _handlers:
+            handler = _text_handler() if log_format == "text" else _json_handler()
+            handler.addFilter(lambda record: handler in getattr(record, "cli_handlers", (handler,)))
+
+            logger = logging.getLogger("cli")
+            logger.addHandler(handler)
+            logger.setLevel(logging.DEBUG)
+            logger.propagate = False
+            _handlers[log_format] = handler
+
+        return _handlers[log_format]
+
+
+def _flush_json():
+    """
+    Write all pending JSON records, restarting the listener.
+    """
+    with _handlers_lock:
+        if _json_listener is not None:
+            _json_listener.stop()
+            _json_listener.start()
 
 
 class CLI:
@@ -20,33 +156,15 @@ class CLI:
     """
 
     SEP = "-" * 70
+    FORMATS = ("text", "json")
+    MAX_COMMANDS = 50
 
     def __init__(self, level=logging.INFO):
-        if _colorlog:
-            self.handler = colorlog.StreamHandler()
-            self.handler.setFormatter(
-                colorlog.ColoredFormatter(
-                    "%(log_color)s%(message)s",
-                    datefmt=None,
-                    reset=True,
-                    log_colors={
-                        "DEBUG": "cyan",
-                        "INFO": "green",
-                        "WARNING": "yellow",
-                        "ERROR": "red",
-                        "CRITICAL": "red,bg_white",
-                    },
-                    style="%",
-                )
-            )
-        else:
-            #  Default to basic logging
-            self.handler = logging.StreamHandler()
+        self.handler = _shared_handler("text")
+        self.listener = None
 
-        self.logger = logging.getLogger("cli")
+        self.logger = CLILogger(logging.getLogger("cli"), level)
         self.logger.addHandler(self.handler)
-        self.logger.setLevel(level)
-        self.logger.propagate = False
 
     def disable(self):
         self.logger.removeHandler(self.handler)
@@ -57,31 +175,146 @@ class CLI:
     def set_level(self, level):
         self.logger.setLevel(level)
 
-    def print_return(self, code: typing.Optional[int]):
+    def set_format(self, log_format: str):
+        """
+        Set output format. Text format writes human readable messages while JSON format writes a JSON object per event.
+        JSON records are written by a listener thread through a queue, so logging never blocks commands execution.
+
+        :param log_format: Output format, text or json.
+        """
+        if log_format not in self.FORMATS:
+            raise ValueError("Wrong log format '{}'".format(log_format))
+
+        if log_format == "json" and self.listener is None:
+            self.logger.removeHandler(self.handler)
+            self.handler = _shared_handler("json")
+            self.listener = _json_listener
+            self.logger.addHandler(self.handler)
+
+    def close(self):
+        """
+        Stop using JSON listener, writing all pending records.
+        """
+        if self.listener is not None:
+            _flush_json()
+            self.listener = None
+
+    def is_enabled_for(self, level: int) -> bool:
+        """
+        Check if a message of given level would be written, to avoid building messages that will be discarded.
+
+        :param level: Message level.
+        :return: True if messages of given level are written.
+        """
+        return self.logger.isEnabledFor(level) and bool(self.logger.handlers)
+
+    def _log(self, level: int, event: str, msg: str, *args, **data):
+        self.logger.log(level, msg, *args, extra={"event": event, "data": data})
+
+    def print_return(self, code: typing.Optional[int], duration: typing.Optional[float] = None):
         if code is None:
             code = 0
 
         level = logging.DEBUG if code == 0 else logging.ERROR
-        self.logger.log(level, "Return code: %d", code)
+        self._log(level, "return", "Return code: %d", code, return_code=code, duration=duration)
+
+    def print_retry(self, reason: str, attempt: int, attempts: int, delay: float):
+        self._log(
+            logging.WARNING,
+            "retry",
+            "Step failed (%s), retrying in %.2fs (%d/%d)",
+            reason,
+            delay,
+            attempt,
+            attempts,
+            reason=reason,
+            delay=delay,
+            attempt=attempt,
+            attempts=attempts,
+        )
+
+    def print_timeout(self, timeout: float):
+        self._log(logging.ERROR, "timeout", "Step timed out after %.2fs", timeout, timeout=timeout)
+
+    def print_cached(self, step: str):
+        self._log(logging.INFO, "cached", "Cached result of %s", step, step=step)
+
+    def print_cache_stats(self, hits: int, misses: int):
+        self._log(logging.INFO, "cache", "Cache: %d hits, %d misses", hits, misses, hits=hits, misses=misses)
+
+    def print_build_error(self, command: str, error: str):
+        self._log(
+            logging.ERROR, "build_error", "Cannot build command %s: %s", command, error, command=command, error=error
+        )
+
+    def print_interrupted(self, steps: typing.List[str]):
+        if steps:
+            self._log(logging.WARNING, "interrupted", "Interrupted steps: %s", ", ".join(steps), steps=steps)
+
+    def print_settings(self, sources: typing.List[str], duration: float):
+        self._log(
+            logging.DEBUG,
+            "settings",
+            "Settings loaded from %s in %.3fms",
+            ", ".join(sources),
+            duration * 1000,
+            sources=sources,
+            duration=duration,
+        )
+
+    def print_step(self, step: str, command_type: Type):
+        level = logging.DEBUG if command_type == Type.PYTHON else logging.INFO
+        self._log(level, "step", "[%s] %s", command_type.value, step, step=step, type=command_type.value)
 
     def print_header(self, command, **kwargs):
-        header = "{0}\n{1}\n{0}".format(self.SEP, command)
-        self.logger.info(header)
+        if self.is_enabled_for(logging.INFO):
+            header = "{0}\n{1}\n{0}".format(self.SEP, command)
+            self._log(logging.INFO, "header", header, command=command)
 
-        fields = OrderedDict(sorted(kwargs.items(), key=lambda x: x[0]))
-        fmt = "{:<%d}: {}" % (max([len(x) for x in fields.keys()]),)
-        command_args = "---------\nArguments\n---------\n" + "\n".join([fmt.format(k, v) for k, v in fields.items()])
-        self.logger.debug(command_args)
+        if self.is_enabled_for(logging.DEBUG):
+            fields = OrderedDict(sorted(kwargs.items(), key=lambda x: x[0]))
+            fmt = "{:<%d}: {}" % (max([len(x) for x in fields.keys()], default=0),)
+            command_args = "---------\nArguments\n---------\n" + "\n".join(
+                [fmt.format(k, v) for k, v in fields.items()]
+            )
+            self._log(logging.DEBUG, "arguments", command_args, arguments=fields)
 
     def print_commands_list(
         self, commands: typing.List[typing.Union[typing.Callable, typing.List[str]]], commands_type: Type
     ):
+        if not self.is_enabled_for(logging.DEBUG):
+            return
+
+        # Summarize large lists showing only the first commands
+        shown = commands[: self.MAX_COMMANDS]
         if commands_type == Type.PYTHON:
-            cmds = "\n".join(
-                [" - [{}] {}.{}".format(commands_type.value, str(c.__module__), str(c.__qualname__)) for c in commands]
-            )
+            steps = ["{}.{}".format(str(c.__module__), str(c.__qualname__)) for c in shown]
         else:
-            cmds = "\n".join([" - [{}] {}".format(commands_type.value, " ".join(c)) for c in commands])
+            steps = [" ".join(c) for c in shown]
+
+        lines = [" - [{}] {}".format(commands_type.value, s) for s in steps]
+        if len(commands) > len(shown):
+            lines.append(" ... {} more commands".format(len(commands) - len(shown)))
+
+        msg = "--------\nCommands\n--------\n" + "\n".join(lines)
+        self._log(logging.DEBUG, "commands", msg, type=commands_type.value, commands=steps, total=len(commands))
+
+    def print_report(self, results):
+        failed = [r for r in results if r.failed]
+        lines = ["------\nReport\n------"]
+        for r in results:
+            status = "failed: {}".format(r.return_code) if r.failed else "ok"
+            lines.append(" - [{}] {:.2f}s {}".format(status, r.duration, r.step))
+            if r.failed:
+                lines += ["   | {}".format(line.rstrip("\n")) for line in r.output]
+                if r.error:
+                    lines.append("   | {}".format(r.error))
 
-        msg = "--------\nCommands\n--------\n" + cmds
-        self.logger.debug(msg)
+        lines.append("{} steps, {} failed".format(len(results), len(failed)))
+        self._log(
+            logging.ERROR if failed else logging.INFO,
+            "report",
+            "\n".join(lines),
+            steps=[vars(r) for r in results],
+            failed=len(failed),
+        )
@@ -1,10 +1,15 @@
+import threading
+from collections import OrderedDict, defaultdict
 from enum import Enum
 from functools import partial, update_wrapper
-from typing import Any, Callable, Dict, Tuple
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Iterable, List, Tuple
 
+from clinner.cache import Cache
 from clinner.exceptions import WrongCommandError
+from clinner.retry import Retry
 
-__all__ = ["command", "Type"]
+__all__ = ["command", "Type", "Step", "CommandSpec"]
 
 
 class Type(Enum):
@@ -15,21 +20,224 @@ class Type(Enum):
     BASH_WITH_HELP = SHELL_WITH_HELP
 
 
-class CommandRegister(dict):
+class Step(list):
     """
-    Register for commands.
+    Shell command step, a list of strings as returned by shlex.split along with its own execution options. It can be
+    returned by shell commands instead of a plain list to override command options for a single step.
     """
 
-    def register(
-        self, func: Callable, command_type: Type, arguments: Tuple[Tuple[str], Dict[str, Any]], parser: Dict[str, Any]
+    def __init__(self, args: Iterable[str], retry=None, independent: bool = False, name: str = None, cache=None):
+        """
+        Shell command step.
+
+        :param args: Command split by shlex.
+        :param retry: Retry policy for this step, overrides the command one.
+        :param independent: Step does not depend on its adjacent independent steps, so they can run concurrently.
+        :param name: Name used to show this step in logs and reports instead of the command itself.
+        :param cache: Cache policy of the output files of this step, as a dict of Cache kwargs or a Cache.
+        """
+        super(Step, self).__init__(args)
+        self.retry = Retry.build(retry)
+        self.independent = independent
+        self.name = name
+        self.cache = Cache.build(cache)
+
+
+class CommandSpec:
+    """
+    Immutable record of a registered command.
+    """
+
+    __slots__ = (
+        "name",
+        "qualified_name",
+        "module",
+        "callable",
+        "type",
+        "arguments",
+        "parser",
+        "retry",
+        "tags",
+        "cache",
+    )
+
+    def __init__(
+        self,
+        func: Callable,
+        command_type: Type,
+        arguments: Tuple[Tuple[str], Dict[str, Any]],
+        parser: Dict[str, Any],
+        retry: Retry = None,
+        tags: Iterable[str] = (),
+        cache: Cache = None,
     ):
-        self[func.__name__] = {"callable": func, "type": command_type, "arguments": arguments, "parser": parser}
+        """
+        Command spec.
+
+        :param func: Command callable.
+        :param command_type: Command type.
+        :param arguments: Command line arguments, as a sequence of add_argument args and kwargs or a callable.
+        :param parser: argparse.ArgumentParser.add_subparser kwargs.
+        :param retry: Retry policy.
+        :param tags: Tags used to group commands.
+        :param cache: Cache policy of command results.
+        """
+        values = (
+            ("name", func.__name__),
+            ("qualified_name", "{}.{}".format(func.__module__, func.__qualname__)),
+            ("module", func.__module__),
+            ("callable", func),
+            ("type", command_type),
+            ("arguments", arguments if callable(arguments) else tuple(arguments)),
+            ("parser", MappingProxyType(dict(parser))),
+            ("retry", retry),
+            ("tags", frozenset(tags)),
+            ("cache", cache),
+        )
+        for key, value in values:
+            object.__setattr__(self, key, value)
+
+    def __setattr__(self, key, value):
+        raise AttributeError("Command spec is immutable")
+
+    def __delattr__(self, item):
+        raise AttributeError("Command spec is immutable")
 
     def __getitem__(self, item):
-        if item not in self:
-            raise WrongCommandError(item)
+        """
+        Access fields as a dict, keeping compatibility with previous register entries.
+        """
+        try:
+            return getattr(self, item)
+        except AttributeError:
+            raise KeyError(item)
+
+    def __repr__(self):
+        return "CommandSpec({}, type={})".format(self.qualified_name, self.type.value)
+
+
+class CommandRegister(dict):
+    """
+    Register for commands. Commands are registered by their qualified name (module and function qualified name, so
+    methods with same name in different classes do not collide) and by their short name as an alias, that points to the
+    last registered command with that name. Both names can be used to look up a command. Commands are also indexed by
+    type, tag and module. Register is safe to be used from several threads, and iterating it gives a snapshot of
+    registered commands.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(CommandRegister, self).__init__(*args, **kwargs)
+        self._lock = threading.RLock()
+        self._qualified = OrderedDict()
+        self._index = {"type": defaultdict(set), "tag": defaultdict(set), "module": defaultdict(set)}
+
+    def _index_keys(self, spec: CommandSpec):
+        yield "type", spec.type
+        yield "module", spec.module
+        for tag in spec.tags:
+            yield "tag", tag
+
+    def register(
+        self,
+        func: Callable,
+        command_type: Type,
+        arguments: Tuple[Tuple[str], Dict[str, Any]],
+        parser: Dict[str, Any],
+        retry: Retry = None,
+        tags: Iterable[str] = (),
+        cache: Cache = None,
+    ) -> CommandSpec:
+        spec = CommandSpec(func, command_type, arguments, parser, retry, tags, cache)
+
+        with self._lock:
+            if spec.qualified_name in self._qualified:
+                self._remove(self._qualified[spec.qualified_name])
+
+            self._qualified[spec.qualified_name] = spec
+            dict.__setitem__(self, spec.name, spec)
+            for index, key in self._index_keys(spec):
+                self._index[index][key].add(spec.qualified_name)
 
-        return dict.__getitem__(self, item)
+        return spec
+
+    def _remove(self, spec: CommandSpec):
+        """
+        Remove a command spec from register. If its alias points to it, the alias will point to the previous command
+        registered with same name, if any.
+        """
+        del self._qualified[spec.qualified_name]
+        for index, key in self._index_keys(spec):
+            self._index[index][key].discard(spec.qualified_name)
+
+        if dict.get(self, spec.name) is spec:
+            previous = [s for s in self._qualified.values() if s.name == spec.name]
+            if previous:
+                dict.__setitem__(self, spec.name, previous[-1])
+            else:
+                dict.__delitem__(self, spec.name)
+
+    def _filter(self, index: str, key) -> List[CommandSpec]:
+        with self._lock:
+            return [self._qualified[q] for q in sorted(self._index[index].get(key, ()))]
+
+    def by_type(self, command_type: Type) -> List[CommandSpec]:
+        """
+        Commands of given type.
+
+        :param command_type: Command type.
+        :return: List of command specs.
+        """
+        return self._filter("type", command_type)
+
+    def by_tag(self, tag: str) -> List[CommandSpec]:
+        """
+        Commands tagged with given tag.
+
+        :param tag: Tag.
+        :return: List of command specs.
+        """
+        return self._filter("tag", tag)
+
+    def by_module(self, module: str) -> List[CommandSpec]:
+        """
+        Commands defined in given module.
+
+        :param module: Module name.
+        :return: List of command specs.
+        """
+        return self._filter("module", module)
+
+    def __contains__(self, item):
+        return dict.__contains__(self, item) or item in self._qualified
+
+    def __getitem__(self, item) -> CommandSpec:
+        with self._lock:
+            if dict.__contains__(self, item):
+                return dict.__getitem__(self, item)
+
+            try:
+                return self._qualified[item]
+            except KeyError:
+                raise WrongCommandError(item)
+
+    def __delitem__(self, item):
+        with self._lock:
+            self._remove(self[item])
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def keys(self) -> List[str]:
+        with self._lock:
+            return list(dict.keys(self))
+
+    def values(self) -> List[CommandSpec]:
+        with self._lock:
+            return list(dict.values(self))
+
+    def items(self) -> List[Tuple[str, CommandSpec]]:
+        with self._lock:
+            return list(dict.items(self))
 
 
 class command:  # noqa
@@ -39,7 +247,9 @@ class command:  # noqa
 
     register = CommandRegister()
 
-    def __init__(self, func=None, command_type=Type.PYTHON, args=None, parser_opts=None):
+    def __init__(
+        self, func=None, command_type=Type.PYTHON, args=None, parser_opts=None, retry=None, tags=(), cache=None
+    ):
         """
         Decorator to register given functions in a register. This decorator allows to be used as a common decorator
         without arguments:
@@ -61,6 +271,16 @@ class command:  # noqa
         def foobar(*args, **kwargs):
             pass
 
+        Failed steps can be retried using a retry policy, given as a number of attempts or a Retry object:
+        @command(command_type=Type.SHELL, retry=Retry(attempts=5, codes=(7,)))
+        def download(*args, **kwargs):
+            return [['curl', '-f', 'https://example.com']]
+
+        Results of python commands that only depend on their arguments and input files can be cached:
+        @command(cache={'inputs': ['schemas/*.json']})
+        def compile_schemas(*args, **kwargs):
+            pass
+
         For last, is possible to decorate functions or class methods:
         class Foo:
             @staticmethod
@@ -71,10 +291,17 @@ class command:  # noqa
         :param func: Function or class method to be decorated.
         :param args: argparse.ArgumentParser.add_argument args.
         :param parser_opts: argparse.ArgumentParser.add_subparser kwargs.
+        :param retry: Retry policy for command steps, as a number of attempts, a dict of Retry kwargs or a Retry.
+        :param tags: Tags used to group commands in register.
+        :param cache: Cache policy for results of python commands, as a boolean, a list of input files, a dict of Cache
+        kwargs or a Cache.
         """
         self.args = args or ()
         self.kwargs = parser_opts or {}
         self.command_type = command_type
+        self.retry = Retry.build(retry)
+        self.tags = tuple(tags)
+        self.cache = Cache.build(cache)
 
         if func is not None and callable(func):
             # Full initialization decorator
@@ -87,7 +314,7 @@ class command:  # noqa
         self.func = func
         update_wrapper(self, func)
 
-        self.register.register(self, command_type, args, parse_opts)
+        self.register.register(self, command_type, args, parse_opts, self.retry, self.tags, self.cache)
 
     def __get__(self, instance, owner=None):
         """
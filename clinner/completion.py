@@ -0,0 +1,181 @@
+"""
+Shell completion for mains. A manifest with commands, options and their choices is generated once from the parser of a
+main and cached as JSON, and completion queries are answered from it by this module, that only depends on standard
+library, so user command modules are never imported while completing:
+``python -m clinner.completion query ~/.cache/clinner/completion/build.py.json -- pytest --sh``
+"""
+import argparse
+import json
+import os
+import re
+import shlex
+import sys
+from typing import Dict, List
+
+__all__ = ["SHELLS", "manifest_path", "build_manifest", "write_manifest", "complete", "script"]
+
+SHELLS = ("bash", "zsh", "fish")
+MANIFEST_VERSION = 1
+
+BASH = """_clinner_{name}() {{
+    local IFS=$'\\n'
+    COMPREPLY=($({query} -- "${{COMP_WORDS[@]:1:COMP_CWORD}}"))
+}}
+complete -o default -F _clinner_{name} {prog}
+"""
+
+ZSH = """#compdef {prog}
+_clinner_{name}() {{
+    local -a candidates
+    candidates=("${{(@f)$({query} -- "${{(@)words[2,CURRENT]}}")}}")
+    compadd -a candidates
+}}
+compdef _clinner_{name} {prog}
+"""
+
+FISH = """function __clinner_{name}
+    set -l words (commandline -opc)
+    {query} -- $words[2..-1] (commandline -ct)
+end
+complete -c {prog} -f -a '(__clinner_{name})'
+"""
+
+SCRIPTS = {"bash": BASH, "zsh": ZSH, "fish": FISH}
+
+
+def manifest_path(prog: str) -> str:
+    """
+    Path of the cached manifest of a program, placed in user cache directory.
+
+    :param prog: Program name.
+    :return: Manifest path.
+    """
+    cache = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache, "clinner", "completion", "{}.json".format(os.path.basename(prog)))
+
+
+def _options(parser: argparse.ArgumentParser) -> Dict[str, Dict]:
+    options = {}
+    for action in parser._actions:
+        if isinstance(action, argparse._SubParsersAction):
+            continue
+
+        for option in action.option_strings:
+            options[option] = {
+                "value": action.nargs != 0,
+                "choices": [str(c) for c in action.choices] if action.choices is not None else None,
+            }
+
+    return options
+
+
+def _positional_choices(parser: argparse.ArgumentParser) -> List[str]:
+    choices = []
+    for action in parser._actions:
+        if not action.option_strings and action.choices is not None:
+            if not isinstance(action, argparse._SubParsersAction):
+                choices += [str(c) for c in action.choices]
+
+    return choices
+
+
+def build_manifest(parser: argparse.ArgumentParser, command_parsers: Dict[str, argparse.ArgumentParser]) -> Dict:
+    """
+    Build a completion manifest from the parser of a main.
+
+    :param parser: Main parser.
+    :param command_parsers: Parser of each command by command name.
+    :return: Manifest.
+    """
+    return {
+        "version": MANIFEST_VERSION,
+        "prog": parser.prog,
+        "options": _options(parser),
+        "commands": {
+            name: {"options": _options(p), "choices": _positional_choices(p)} for name, p in command_parsers.items()
+        },
+    }
+
+
+def write_manifest(manifest: Dict, path: str):
+    """
+    Write a completion manifest, replacing the previous one atomically.
+
+    :param manifest: Manifest.
+    :param path: Manifest path.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    partial = "{}.{}".format(path, os.getpid())
+    with open(partial, "w") as f:
+        json.dump(manifest, f, sort_keys=True)
+
+    os.replace(partial, path)
+
+
+def complete(manifest: Dict, words: List[str]) -> List[str]:
+    """
+    Completion candidates for a command line.
+
+    :param manifest: Completion manifest.
+    :param words: Words of the command line after the program name, being the last one the word to complete.
+    :return: Sorted candidates.
+    """
+    words = list(words) or [""]
+    current, previous = words[-1], words[:-1]
+
+    command = next((w for w in previous if w in manifest["commands"]), None)
+    scope = manifest["commands"][command] if command is not None else manifest
+    options = scope["options"]
+
+    if previous and previous[-1] in options and options[previous[-1]]["value"]:
+        candidates = options[previous[-1]]["choices"] or []
+    elif current.startswith("-"):
+        candidates = list(options)
+    elif command is None:
+        candidates = list(manifest["commands"])
+    else:
+        candidates = scope["choices"]
+
+    return sorted(c for c in candidates if c.startswith(current))
+
+
+def script(shell: str, prog: str, path: str, python: str = None) -> str:
+    """
+    Completion script for a shell.
+
+    :param shell: Shell name, one of bash, zsh or fish.
+    :param prog: Program name to complete.
+    :param path: Manifest path.
+    :param python: Python interpreter used to answer queries, current one if not given.
+    :return: Completion script.
+    """
+    query = " ".join(shlex.quote(x) for x in (python or sys.executable, "-m", "clinner.completion", "query", path))
+    name = re.sub(r"\W", "_", os.path.basename(prog))
+    return SCRIPTS[shell].format(name=name, prog=shlex.quote(os.path.basename(prog)), query=query)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Completion helpers")
+    subparsers = parser.add_subparsers(dest="action")
+    subparsers.required = True
+
+    query = subparsers.add_parser("query", help="Print completion candidates for a command line")
+    query.add_argument("manifest", help="Manifest path")
+    query.add_argument("words", nargs=argparse.REMAINDER, help="Words after program name, last one is completed")
+
+    args = parser.parse_args(argv)
+    words = args.words[1:] if args.words[:1] == ["--"] else args.words
+    try:
+        with open(args.manifest) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return 1
+
+    for candidate in complete(manifest, words):
+        print(candidate)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
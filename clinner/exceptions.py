@@ -20,3 +20,7 @@ class CommandArgParseError(ValueError):
 
 class ImproperlyConfigured(Exception):
     pass
+
+
+class CommandBuildError(Exception):
+    pass
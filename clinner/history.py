@@ -0,0 +1,89 @@
+"""
+Local store of durations measured in previous runs, used to schedule and estimate future runs.
+"""
+import os
+import sqlite3
+import time
+from contextlib import closing
+from typing import Dict, Iterable, Optional
+
+__all__ = ["DurationStore"]
+
+HISTORY_PATH = os.path.join(".clinner", "history.db")
+
+
+class DurationStore:
+    """
+    Durations store backed by a SQLite database. Durations are grouped by scope, e.g: test runner, and identified by a
+    key, e.g: test file. The store is bounded in size, evicting entries not updated for a long time and the least
+    recently updated ones when the max number of entries is exceeded.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = 10000, max_age: float = 30 * 24 * 3600):
+        """
+        Durations store.
+
+        :param path: Database path. Taken from CLINNER_HISTORY environment variable if not given.
+        :param max_entries: Max number of entries stored.
+        :param max_age: Seconds after which entries that have not been updated are evicted.
+        """
+        self.path = path or os.environ.get("CLINNER_HISTORY", HISTORY_PATH)
+        self.max_entries = max_entries
+        self.max_age = max_age
+
+    def _connect(self) -> sqlite3.Connection:
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS durations ("
+            "scope TEXT NOT NULL, key TEXT NOT NULL, duration REAL NOT NULL, updated REAL NOT NULL, "
+            "PRIMARY KEY (scope, key)) WITHOUT ROWID"
+        )
+        return connection
+
+    def get(self, scope: str, keys: Iterable[str] = None) -> Dict[str, float]:
+        """
+        Get durations of given scope.
+
+        :param scope: Durations scope.
+        :param keys: Keys to look up. All keys of the scope are returned if not given.
+        :return: Dict of key and its duration in seconds. Keys without a known duration are not included.
+        """
+        if not os.path.exists(self.path):
+            return {}
+
+        with closing(self._connect()) as connection:
+            rows = connection.execute("SELECT key, duration FROM durations WHERE scope = ?", (scope,))
+            durations = dict(rows)
+
+        if keys is not None:
+            durations = {k: durations[k] for k in keys if k in durations}
+
+        return durations
+
+    def record(self, scope: str, durations: Dict[str, float]):
+        """
+        Record durations of given scope, replacing previous ones, and evict stale entries.
+
+        :param scope: Durations scope.
+        :param durations: Dict of key and its duration in seconds.
+        """
+        now = time.time()
+        with closing(self._connect()) as connection, connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO durations (scope, key, duration, updated) VALUES (?, ?, ?, ?)",
+                [(scope, k, v, now) for k, v in durations.items()],
+            )
+            self._evict(connection, now)
+
+    def _evict(self, connection: sqlite3.Connection, now: float):
+        connection.execute("DELETE FROM durations WHERE updated < ?", (now - self.max_age,))
+        (count,) = connection.execute("SELECT COUNT(*) FROM durations").fetchone()
+        if count > self.max_entries:
+            connection.execute(
+                "DELETE FROM durations WHERE (scope, key) IN "
+                "(SELECT scope, key FROM durations ORDER BY updated LIMIT ?)",
+                (count - self.max_entries,),
+            )
@@ -0,0 +1,90 @@
+from random import uniform
+from typing import Iterable, Optional, Tuple, Type, Union
+
+__all__ = ["Retry"]
+
+
+class Retry:
+    """
+    Retry policy for command steps. Failed steps are retried up to a maximum number of attempts, waiting between them
+    using a capped exponential backoff with jitter.
+    """
+
+    def __init__(
+        self,
+        attempts: int = 3,
+        backoff: float = 0.5,
+        max_backoff: float = 30.0,
+        jitter: bool = True,
+        codes: Optional[Iterable[int]] = None,
+        exceptions: Tuple[Type[BaseException], ...] = (),
+    ):
+        """
+        Retry policy.
+
+        :param attempts: Max number of attempts, including the first one.
+        :param backoff: Base delay in seconds, doubled after each failed attempt.
+        :param max_backoff: Max delay in seconds between two attempts.
+        :param jitter: Wait a random time between zero and the calculated delay.
+        :param codes: Return codes that will be retried. Any non-zero code is retried if not specified.
+        :param exceptions: Exception types raised by python commands that will be retried.
+        """
+        if attempts < 1:
+            raise ValueError("Retry attempts must be greater than zero")
+
+        self.attempts = attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.codes = frozenset(codes) if codes is not None else None
+        self.exceptions = tuple(exceptions)
+
+    @classmethod
+    def build(cls, value: Union[None, int, dict, "Retry"]) -> Optional["Retry"]:
+        """
+        Build a retry policy from given value, that can be a number of attempts, a dict of policy kwargs or a policy.
+
+        :param value: Retry value.
+        :return: Retry policy or None if value is empty.
+        """
+        if value is None or isinstance(value, cls):
+            return value
+
+        if isinstance(value, dict):
+            return cls(**value)
+
+        if isinstance(value, int):
+            return cls(attempts=value)
+
+        raise TypeError("Wrong retry policy '{}'".format(value))
+
+    def delay(self, attempt: int) -> float:
+        """
+        Time to wait after given failed attempt.
+
+        :param attempt: Failed attempt number, starting from 1.
+        :return: Delay in seconds.
+        """
+        delay = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+        return uniform(0, delay) if self.jitter else delay
+
+    def retry_code(self, code: Optional[int]) -> bool:
+        """
+        Check if given return code should be retried.
+
+        :param code: Return code.
+        :return: True if code should be retried.
+        """
+        return code not in (None, 0) and (self.codes is None or code in self.codes)
+
+    def retry_exception(self, exception: BaseException) -> bool:
+        """
+        Check if given exception should be retried.
+
+        :param exception: Exception raised by command.
+        :return: True if exception should be retried.
+        """
+        return isinstance(exception, self.exceptions)
+
+    def __repr__(self):
+        return "Retry(attempts={}, backoff={}, max_backoff={})".format(self.attempts, self.backoff, self.max_backoff)
@@ -1,4 +1,5 @@
 from clinner.run.base import *  # noqa
 from clinner.run.django_command import *  # noqa
+from clinner.run.injection import *  # noqa
 from clinner.run.main import *  # noqa
 from clinner.run.mixins import *  # noqa
@@ -1,35 +1,102 @@
 import argparse
 import asyncio
+import copy
+import heapq
+import json
 import logging
 import os
 import signal
+import sys
+import threading
+import time
 from abc import ABCMeta, abstractmethod
-from collections import OrderedDict
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache, partial
 from importlib import import_module
-from subprocess import Popen
+from subprocess import PIPE, STDOUT, Popen
+from typing import List, Optional, Tuple
 
+from clinner import completion
 from clinner.builder import Builder
+from clinner.cache import MISSING, ResultStore
 from clinner.cli import CLI
-from clinner.command import Type, command
-from clinner.exceptions import CommandArgParseError, CommandTypeError
-from clinner.settings import settings
+from clinner.command import CommandSpec, Type, command
+from clinner.exceptions import CommandArgParseError, CommandBuildError, CommandTypeError
+from clinner.history import DurationStore
+from clinner.retry import Retry
+from clinner.run.supervisor import Supervisor
+from clinner.settings import CommandSettings, Settings, settings, use_settings
 
-__all__ = ["MainMeta", "BaseMain"]
+__all__ = ["MainMeta", "BaseMain", "StepResult"]
 
 
-class MainMeta(ABCMeta):
-    def __new__(mcs, name, bases, namespace):  # noqa
-        def inject(self):
-            """
-            Add all environment variables defined in all inject methods.
-            """
-            # Gather inject methods from bases and current class_dict
-            methods = {k: v for b in bases for k, v in b.__dict__.items() if k.startswith("inject_")}
-            methods.update({k: v for k, v in namespace.items() if k.startswith("inject_")})
+class StepResult:
+    """
+    Result of a single command step.
+    """
+
+    def __init__(
+        self, step: str, return_code: Optional[int], duration: float, output: List[str] = None, error: str = None
+    ):
+        """
+        Step result.
+
+        :param step: Step description.
+        :param return_code: Step return code.
+        :param duration: Step duration in seconds.
+        :param output: Last lines of step output, if captured.
+        :param error: Exception raised by the step, if any.
+        """
+        self.step = step
+        self.return_code = return_code
+        self.duration = duration
+        self.output = output or []
+        self.error = error
+
+    @property
+    def failed(self) -> bool:
+        return self.return_code not in (None, 0)
+
+
+@lru_cache(maxsize=None)
+def _lazy_parser_class(parser_class):
+    """
+    Build a parser class that adds its arguments the first time it parses or formats help.
+
+    :param parser_class: Base parser class.
+    :return: Lazy parser class.
+    """
 
-            for method_name, method in methods.items():
-                method(self)
+    class LazyParser(parser_class):
+        lazy_arguments = None
+        _lock = threading.Lock()
 
+        def _load_arguments(self):
+            if self.lazy_arguments is not None:
+                with self._lock:
+                    if self.lazy_arguments is not None:
+                        lazy_arguments, self.lazy_arguments = self.lazy_arguments, None
+                        lazy_arguments()
+
+        def parse_known_args(self, args=None, namespace=None):
+            self._load_arguments()
+            return super(LazyParser, self).parse_known_args(args, namespace)
+
+        def format_usage(self):
+            self._load_arguments()
+            return super(LazyParser, self).format_usage()
+
+        def format_help(self):
+            self._load_arguments()
+            return super(LazyParser, self).format_help()
+
+    LazyParser.__name__ = LazyParser.__qualname__ = "Lazy{}".format(parser_class.__name__)
+    return LazyParser
+
+
+class MainMeta(ABCMeta):
+    def __new__(mcs, name, bases, namespace):  # noqa
         def add_arguments(self, parser, parser_class=None):
             """
             Add command line arguments to parser.
@@ -46,7 +113,14 @@ class MainMeta(ABCMeta):
             if hasattr(self, "add_arguments"):
                 self.add_arguments(parser)
 
-        namespace["inject"] = inject
+        # Gather inject methods once, from bases and current class_dict, keeping the ones defined last
+        injects = OrderedDict()
+        for base in reversed(bases):
+            for klass in reversed(base.__mro__):
+                injects.update((k, v) for k, v in klass.__dict__.items() if k.startswith("inject_"))
+        injects.update((k, v) for k, v in namespace.items() if k.startswith("inject_"))
+
+        namespace["_injects"] = tuple(injects.values())
         namespace["_add_arguments"] = add_arguments
 
         cmds = {}
@@ -55,7 +129,8 @@ class MainMeta(ABCMeta):
                 m, c = command_fqn.rsplit(".", 1)
                 if c not in namespace:
                     getattr(import_module(m), c)
-                    cmds[c] = command.register[c]
+                    # Look up by qualified name to avoid collisions, falling back to alias for reexported commands
+                    cmds[c] = command.register[command_fqn if command_fqn in command.register else c]
             except ValueError:
                 cmds[command_fqn] = command.register[command_fqn]
             except (ImportError, AttributeError):
@@ -69,22 +144,45 @@ class MainMeta(ABCMeta):
 class BaseMain(metaclass=MainMeta):
     commands = []
     description = None
+    output_tail = 20
+    # Options that can be given without a command
+    commandless_options = ("shell", "completion")
+    # Seconds that running steps have to stop after a quit signal is forwarded, and after SIGTERM
+    interrupt_grace = 10.0
+    terminate_grace = 5.0
+    # Record durations of steps, used to estimate them in execution plans
+    record_durations = False
+    # Max size in bytes of cached results of python commands
+    cache_size = 256 * 1024 * 1024
+    # Write variables returned by inject methods into os.environ too, for python commands that read them from there
+    export_environment = False
+    TIMEOUT_CODE = 124
+    # Return code of interrupted commands is this one plus the signal number
+    INTERRUPT_CODE = 128
 
     def __init__(self, args=None, parse_args=True):
         self.args, self.unknown_args = argparse.Namespace(), []
         self.cli = CLI()
+        self.settings = None
+        self._parser = None
+        self._settings = settings
+        self._settings_cache = {}
+        # Variables returned by inject methods, passed to shell steps
+        self.environment = {}
+        self._subparsers = None
+        # State shared by all dispatched copies of this main
+        self._session = {}
+        self._lock = threading.RLock()
+        self.supervisor = Supervisor(self.interrupt_grace, self.terminate_grace)
+        self.results = ResultStore(max_size=self.cache_size)
+        self.cache_stats = Counter()
+        # Quit signal received while running a command, if any
+        self.interrupted = None
         if parse_args:
             self.args, self.unknown_args = self.parse_arguments(args=args)
 
-            # Set logging verbosity
-            if self.args.quiet:
-                self.cli.disable()
-            elif self.args.verbose == 1:
-                self.cli.set_level(logging.INFO)
-            elif self.args.verbose >= 2:
-                self.cli.set_level(logging.DEBUG)
-            else:  # Default log level
-                self.cli.set_level(logging.WARNING)
+            # Set logging format and verbosity
+            self._configure_cli(self.args)
 
             # Inject parameters related to current stage as environment variables
             self.inject()
@@ -92,46 +190,138 @@ class BaseMain(metaclass=MainMeta):
             # Get settings from args or envvar
             self.settings = self.args.settings or os.environ.get("CLINNER_SETTINGS")
 
-            # Load settings
-            settings.build_from_module(self.settings)
+            # Load settings, reusing the ones already built if their sources have not changed, and keep a copy, so
+            # settings of this main do not change if other main builds global settings again
+            self._settings = settings.load(self.settings)
+            self.cli.print_settings([layer["source"] for layer in self._settings.layers], self._settings.load_time)
+
+    def _configure_cli(self, args: argparse.Namespace):
+        """
+        Set logging format and verbosity of the CLI of this main from output options.
+
+        :param args: Parsed arguments.
+        """
+        self.cli.set_format(getattr(args, "log_format", "text"))
+        if args.quiet:
+            self.cli.disable()
+        elif args.verbose == 1:
+            self.cli.set_level(logging.INFO)
+        elif args.verbose >= 2:
+            self.cli.set_level(logging.DEBUG)
+        else:  # Default log level
+            self.cli.set_level(logging.WARNING)
+
+    def _run_inject(self, method) -> dict:
+        options = getattr(method, "injection", None)
+        variables = options.cached(method) if options is not None else None
+        if variables is None:
+            variables = method(self) or {}
+            if options is not None:
+                options.store(method, variables)
+
+        return {k: str(v) for k, v in variables.items()}
+
+    def inject(self):
+        """
+        Add all environment variables defined in all inject methods. Methods that return a dict of variables, instead
+        of writing them into os.environ, get them added to the environment snapshot of this main, that is passed to
+        shell steps. Independent methods run concurrently, while the rest run one after another in the meantime. Their
+        variables are merged in definition order, so methods defined later override variables of previous ones.
+        """
+        independent = [m for m in self._injects if getattr(getattr(m, "injection", None), "independent", False)]
+        dependent = [m for m in self._injects if m not in independent]
 
-    def _commands_arguments(self, parser: "argparse.ArgumentParser", parser_class=None):
+        results = {}
+        if len(independent) > 1:
+            with ThreadPoolExecutor(max_workers=len(independent)) as executor:
+                futures = {m: executor.submit(self._run_inject, m) for m in independent}
+                for method in dependent:
+                    results[method] = self._run_inject(method)
+                for method, future in futures.items():
+                    results[method] = future.result()
+        else:
+            for method in self._injects:
+                results[method] = self._run_inject(method)
+
+        environment = {}
+        for method in self._injects:
+            environment.update(results[method])
+
+        self.environment = environment
+        if self.export_environment:
+            os.environ.update(environment)
+
+    def _commands_arguments(self, parser: "argparse.ArgumentParser", parser_class=None, lazy=False):
         """
         Add arguments for each command to parser.
 
         :param parser: Parser
+        :param parser_class: Parser class used for commands.
+        :param lazy: Add the arguments of each command only when its parser is used, so building the parser does not
+        depend on the number of commands and their arguments.
         """
         # Create subparser for each command
-        subparsers_kwargs = {"parser_class": lambda **kwargs: parser_class(self, **kwargs)} if parser_class else {}
+        factory = (lambda **kwargs: parser_class(self, **kwargs)) if parser_class else None
+        if lazy:
+            lazy_class = _lazy_parser_class(parser_class or argparse.ArgumentParser)
+            factory = (lambda **kwargs: lazy_class(self, **kwargs)) if parser_class else lazy_class
+
+        subparsers_kwargs = {"parser_class": factory} if factory else {}
         subparsers = parser.add_subparsers(title="Commands", dest="command", **subparsers_kwargs)
         subparsers.required = True
+        self._subparsers = subparsers
 
         cmds = self._commands if self._commands is not None else command.register
         for cmd_name, cmd in cmds.items():
-            subparser_opts = cmd["parser"]
-            if cmd["type"] == Type.SHELL:
+            subparser_opts = dict(cmd.parser)
+            if cmd.type == Type.SHELL:
                 subparser_opts["add_help"] = False
 
             p = subparsers.add_parser(cmd_name, **subparser_opts)
-            if callable(cmd["arguments"]):
-                cmd["arguments"](p)
+            if lazy:
+                p.lazy_arguments = partial(self._command_arguments, p, cmd)
             else:
-                for argument in cmd["arguments"]:
-                    try:
-                        if len(argument) == 2:
-                            args, kwargs = argument
-                        elif len(argument) == 1:
-                            args = argument[0]
-                            kwargs = {}
-                        else:
-                            args, kwargs = None, None
-
-                        assert isinstance(args, (tuple, list))
-                        assert isinstance(kwargs, dict)
-                    except AssertionError:
-                        raise CommandArgParseError(str(argument))
+                self._command_arguments(p, cmd)
+
+    @staticmethod
+    def _command_arguments(parser: "argparse.ArgumentParser", cmd: CommandSpec):
+        """
+        Add arguments of a command to its parser.
+
+        :param parser: Command parser.
+        :param cmd: Command spec.
+        """
+        if callable(cmd.arguments):
+            cmd.arguments(parser)
+        else:
+            for argument in cmd.arguments:
+                try:
+                    if len(argument) == 2:
+                        args, kwargs = argument
+                    elif len(argument) == 1:
+                        args = argument[0]
+                        kwargs = {}
                     else:
-                        p.add_argument(*args, **kwargs)
+                        args, kwargs = None, None
+
+                    assert isinstance(args, (tuple, list))
+                    assert isinstance(kwargs, dict)
+                except AssertionError:
+                    raise CommandArgParseError(str(argument))
+                else:
+                    parser.add_argument(*args, **kwargs)
+
+    def get_command(self, name: str) -> CommandSpec:
+        """
+        Get a command available for this main, either an explicit command of this class or a registered one.
+
+        :param name: Command name.
+        :return: Command spec.
+        """
+        if self._commands is not None and name in self._commands:
+            return self._commands[name]
+
+        return command.register[name]
 
     @abstractmethod
     def add_arguments(self, parser: "argparse.ArgumentParser"):
@@ -142,10 +332,45 @@ class BaseMain(metaclass=MainMeta):
         """
         pass
 
+    @property
+    def parser(self) -> argparse.ArgumentParser:
+        """
+        Argument parser of this main, built once and reused to parse any number of command lines.
+        """
+        if self._parser is None:
+            with self._lock:
+                if self._parser is None:
+                    parser = argparse.ArgumentParser(description=self.description, conflict_handler="resolve")
+                    self._add_arguments(parser)
+                    # Command is checked after parsing, so it can be omitted when running a shell
+                    self._subparsers.required = False
+                    self._parser = parser
+
+        return self._parser
+
+    @property
+    def command_parsers(self) -> dict:
+        """
+        Parser of each command of this main, by command name.
+        """
+        return self.parser and self._subparsers.choices
+
+    def _parse_known_args(self, args=None):
+        namespace, unknown = self.parser.parse_known_args(args=args)
+        if getattr(namespace, "command", None) is None and not any(
+            getattr(namespace, option, None) for option in self.commandless_options
+        ):
+            self.parser.error("the following arguments are required: command")
+
+        return namespace, unknown
+
     def parse_arguments(self, args=None, parser=None, parser_class=None):
         """
         command Line application arguments.
         """
+        if parser is None and parser_class is None:
+            return self._parse_known_args(args=args)
+
         if parser is None:
             parser = argparse.ArgumentParser(description=self.description, conflict_handler="resolve")
 
@@ -154,95 +379,662 @@ class BaseMain(metaclass=MainMeta):
 
         return parser.parse_known_args(args=args)
 
+    def _get_settings(self, path: Optional[str]) -> Settings:
+        """
+        Get settings for given path. Settings of this main are used if no path is given or if it is the one loaded by
+        this main, otherwise settings are loaded once into a settings object of this main, leaving global settings
+        intact. Settings are refreshed before returning them, so they are built again if their sources have changed.
+
+        :param path: Settings path.
+        :return: Settings.
+        """
+        if not path or path == self.settings:
+            s = self._settings
+        else:
+            try:
+                s = self._settings_cache[path]
+            except KeyError:
+                s = self._settings_cache.setdefault(path, Settings(path))
+
+        s.refresh()
+        return s
+
+    def dispatch(self, argv: List[str], **kwargs) -> int:
+        """
+        Run a command from given command line, reusing this main. The command line is parsed using the parser built once
+        for this main into a namespace of its own, and it is run by a shallow copy of this main, so calls do not share
+        arguments. Settings given through command line are loaded without modifying global settings. Output options
+        given through command line, *-q*, *-v* and *--log-format*, apply to that command only, using a CLI of its own,
+        otherwise output options are the ones this main was created with. Variables of inject methods are gathered
+        again for each command, reusing the ones still cached, so expired variables are not passed to its steps.
+        Commands can be dispatched concurrently from several threads.
+
+        :param argv: Command line arguments, e.g: ``["-s", "settings.toml", "pytest", "-x"]``.
+        :param kwargs: Dict of kwargs passed to run.
+        :return: Command return code.
+        """
+        # Variables are gathered into this main, so each copy keeps the snapshot taken for its command
+        with self._lock:
+            self.inject()
+            main = copy.copy(self)
+
+        main.args, main.unknown_args = self._parse_known_args(args=argv)
+        main._settings = self._get_settings(getattr(main.args, "settings", None))
+
+        output_options = (
+            getattr(main.args, "quiet", False),
+            getattr(main.args, "verbose", 0),
+            getattr(main.args, "log_format", "text") != "text",
+        )
+        if any(output_options):
+            main.cli = CLI()
+            main._configure_cli(main.args)
+
+        try:
+            return main.run(**kwargs)
+        finally:
+            if main.cli is not self.cli:
+                main.cli.close()
+
+    def run_commandless(self) -> Optional[int]:
+        """
+        Run the action requested by an option given without command, such as *--shell* or *--completion*.
+
+        :return: Action return code, or None if no one was requested.
+        """
+        if getattr(self.args, "completion", None):
+            return self.completion(self.args.completion)
+
+        if getattr(self.args, "shell", False):
+            return self.shell()
+
+        return None
+
+    def completion(self, shell: str) -> int:
+        """
+        Write the completion manifest of this main to the user cache and print the completion script for given shell.
+
+        :param shell: Shell name, one of bash, zsh or fish.
+        :return: Return code.
+        """
+        path = completion.manifest_path(self.parser.prog)
+        completion.write_manifest(completion.build_manifest(self.parser, self.command_parsers), path)
+        sys.stdout.write(completion.script(shell, self.parser.prog, path))
+        sys.stdout.flush()
+
+        return 0
+
+    def shell(self) -> int:
+        """
+        Run an interactive shell that dispatches command lines through this main, reusing the same process.
+
+        :return: Return code of the last command.
+        """
+        from clinner.run.shell import Shell
+
+        if self._session.get("shell"):
+            self.cli.logger.error("Shell is already running")
+            return 1
+
+        self._session["shell"] = True
+        try:
+            shell = Shell(self)
+            shell.cmdloop()
+        finally:
+            self._session["shell"] = False
+
+        return shell.return_code
+
+    @property
+    def _main_options(self) -> set:
+        """
+        Destinations of the options of this main, that are not arguments of any command.
+        """
+        return {action.dest for action in self.parser._actions if action.dest != "command"}
+
+    def _cache_key(self, cmd, name: str, *args, **kwargs) -> Optional[str]:
+        """
+        Key of the cached result of a python command, from its own arguments and input files, or None if its results
+        are not cached.
+        """
+        cache = getattr(cmd.func, "cache", None)
+        if cache is None:
+            return None
+
+        kwargs = dict(cmd.keywords, **kwargs)
+        options = self._main_options
+        return cache.key(name, cmd.args + args, {k: v for k, v in kwargs.items() if k not in options})
+
+    def _count_cache(self, hit: bool):
+        with self._lock:
+            self.cache_stats["hits" if hit else "misses"] += 1
+
     def run_python(self, cmd, *args, **kwargs):
         """
-        Run a python command in a different process.
+        Run a python command in a different process. Results of commands with a cache policy are reused while their
+        arguments and input files do not change, unless *--no-cache* is given, restoring their output files. Failed
+        results are not cached.
 
         :param cmd: Python command.
         :param args: List of args passed to Process.
         :param kwargs: Dict of kwargs passed to Process.
         :return: Command return code.
         """
-        self.cli.logger.debug("- [python] %s.%s", str(cmd.__module__), str(cmd.__qualname__))
+        name = self._describe_step(cmd, Type.PYTHON)
+        self.cli.print_step(name, Type.PYTHON)
 
         result = 0
 
         if not getattr(self.args, "dry_run", False):
+            key = self._cache_key(cmd, name, *args, **kwargs)
+            if key is not None:
+                result = MISSING if getattr(self.args, "no_cache", False) else self.results.get(key)
+                self._count_cache(result is not MISSING)
+                if result is not MISSING:
+                    self.cli.print_cached(name)
+                    return result
+
             # Run command
             if asyncio.iscoroutinefunction(cmd.func.func):
-                result = asyncio.get_event_loop().run_until_complete(cmd(*args, **kwargs))
+                # A new loop for each command, as threads other than the main one have no current loop
+                loop = asyncio.new_event_loop()
+                try:
+                    result = loop.run_until_complete(cmd(*args, **kwargs))
+                finally:
+                    loop.close()
             else:
                 result = cmd(*args, **kwargs)
 
+            if key is not None and result in (None, 0):
+                self.results.put(key, result, files=cmd.func.cache.output_files())
+
         return result
 
-    def run_shell(self, cmd, *args, **kwargs):
+    @staticmethod
+    def _read_output(process, capture, echo):
+        """
+        Read process output line by line, storing it in capture and writing it to stdout if echo is enabled.
+        """
+        for line in process.stdout:
+            line = line.decode(errors="replace")
+            capture.append(line)
+            if echo:
+                sys.stdout.write(line)
+                sys.stdout.flush()
+
+    def run_shell(self, cmd, *args, capture=None, echo=True, timeout: float = None, group=False, **kwargs):
         """
-        Run a shell command in a different process.
+        Run a shell command in a different process, tracked by the supervisor of this main. Output files of steps with
+        a cache policy are restored instead of running them again while their command, allowed environment variables
+        and input files do not change, unless *--no-cache* is given. The process gets the environment snapshot of this
+        main, unless an explicit *env* is given.
 
         :param cmd: Shell command.
         :param args: List of args passed to Popen.
+        :param capture: List or deque where command output lines will be appended. Output is not captured if None.
+        :param echo: Write captured output to stdout while reading it.
+        :param timeout: Seconds after which the process and its group are killed, returning 124 as return code.
+        :param group: Run the process in a process group of its own, that only receives signals through supervisor.
         :param kwargs: Dict of kwargs passed to Popen.
         :return: Command return code.
         """
-        self.cli.logger.info("[shell] %s", " ".join(cmd))
+        name = self._describe_step(cmd, Type.SHELL)
+        self.cli.print_step(name, Type.SHELL)
 
         result = 0
 
         if not getattr(self.args, "dry_run", False):
+            if self.environment and "env" not in kwargs:
+                kwargs["env"] = dict(os.environ, **self.environment)
+
+            key, hit = self._step_cache(cmd, name, kwargs.get("env"))
+            if hit:
+                return 0
+
+            if capture is not None:
+                kwargs.update(stdout=PIPE, stderr=STDOUT)
+            # Timed processes run in a group of their own, so grandchildren are killed too when time expires
+            group = group or bool(timeout)
+            kwargs.update(self.supervisor.popen_kwargs(group))
+
             # Run command
             p = Popen(args=cmd, *args, **kwargs)
-            while p.returncode is None:  # pragma: no cover
-                try:
-                    p.wait()
-                except KeyboardInterrupt:
-                    self.cli.logger.info("Soft quit signal received, waiting the process to stop")
-                    p.send_signal(signal.SIGINT)
-                    try:
-                        p.wait()
-                    except KeyboardInterrupt:
-                        self.cli.logger.info("Hard quit signal received, killing the process immediately")
-                        p.send_signal(signal.SIGKILL)
-                        p.wait(timeout=3)
-
-            result = p.returncode
+
+            with self.supervisor.track(p, name=name, group=group) as child:
+                result = self._wait_process(p, child, capture, echo, timeout)
+
+            if key is not None and result == 0:
+                self.results.put(key, result, files=cmd.cache.output_files())
 
         return result
 
+    def _step_cache(self, cmd, name: str, env: Optional[dict]) -> Tuple[Optional[str], bool]:
+        """
+        Key of the cached output files of a shell step and whether they have been restored, or None if they are not
+        cached.
+        """
+        cache = getattr(cmd, "cache", None)
+        if cache is None:
+            return None, False
+
+        key = cache.key(Type.SHELL.value, list(cmd), {}, env)
+        hit = not getattr(self.args, "no_cache", False) and self.results.get(key) is not MISSING
+        self._count_cache(hit)
+        if hit:
+            self.cli.print_cached(name)
+
+        return key, hit
+
+    def _wait_process(self, process, child, capture, echo: bool, timeout: Optional[float]) -> int:
+        """
+        Wait for a process to finish, reading its output if captured and killing it if timeout expires.
+        """
+        expired = threading.Event()
+        timer = None
+        if timeout:
+            timer = threading.Timer(timeout, lambda: (expired.set(), child.send_signal(signal.SIGKILL)))
+            timer.daemon = True
+            timer.start()
+
+        while process.returncode is None:  # pragma: no cover
+            try:
+                if capture is not None:
+                    self._read_output(process, capture, echo)
+                process.wait()
+            except KeyboardInterrupt:
+                self.interrupt(signal.SIGINT)
+
+        if timer is not None:
+            timer.cancel()
+            if expired.is_set():
+                self.cli.print_timeout(timeout)
+                return self.TIMEOUT_CODE
+
+        return process.returncode
+
+    def interrupt(self, signum: int):
+        """
+        Stop all running steps, forwarding a quit signal to them through the supervisor, and report interrupted steps.
+        The signal is kept, so no more steps of the running command are started, even in keep going mode.
+
+        :param signum: Signal forwarded to running steps.
+        """
+        self.interrupted = signum
+        self.cli.logger.info("Quit signal received, waiting the running steps to stop")
+        self.cli.print_interrupted(self.supervisor.interrupt(signum))
+
+    def run_step(self, cmd, command_type: Type, retry: Retry = None, **kwargs):
+        """
+        Run a single step of a command, retrying it using given policy if it fails.
+
+        :param cmd: Step to run.
+        :param command_type: Command type.
+        :param retry: Retry policy.
+        :param kwargs: Dict of kwargs passed to run_shell.
+        :return: Step return code.
+        """
+        attempt = 1
+        while True:
+            try:
+                if command_type == Type.PYTHON:
+                    return_code = self.run_python(cmd)
+                elif command_type in (Type.SHELL, Type.SHELL_WITH_HELP):
+                    return_code = self.run_shell(cmd, **kwargs)
+                else:  # pragma: no cover
+                    raise CommandTypeError(command_type)
+            except Exception as e:
+                if retry is None or attempt >= retry.attempts or not retry.retry_exception(e):
+                    raise
+
+                reason = repr(e)
+            else:
+                if retry is None or attempt >= retry.attempts or not retry.retry_code(return_code):
+                    return return_code
+
+                reason = "return code {}".format(return_code)
+
+            delay = retry.delay(attempt)
+            self.cli.print_retry(reason, attempt, retry.attempts, delay)
+            time.sleep(delay)
+            attempt += 1
+
+    @staticmethod
+    def _describe_step(cmd, command_type: Type) -> str:
+        if command_type == Type.PYTHON:
+            return "{}.{}".format(str(cmd.__module__), str(cmd.__qualname__))
+
+        return getattr(cmd, "name", None) or " ".join(cmd)
+
+    @staticmethod
+    def _step_groups(commands):
+        """
+        Split steps into groups that can be run together. Consecutive steps marked as independent are grouped to be run
+        concurrently, any other step is a group by itself.
+        """
+        group = []
+        for c in commands:
+            if getattr(c, "independent", False):
+                group.append(c)
+            else:
+                if group:
+                    yield group
+                    group = []
+
+                yield [c]
+
+        if group:
+            yield group
+
+    def run_timed_step(
+        self, cmd, command_type: Type, retry: Retry = None, keep_going=False, echo=True, timeout: float = None
+    ) -> StepResult:
+        """
+        Run a single step of a command measuring its duration. If keep going mode is enabled the output of shell
+        steps is captured and exceptions raised by python steps are stored in the result.
+
+        :param cmd: Step to run.
+        :param command_type: Command type.
+        :param retry: Retry policy.
+        :param keep_going: Keep going mode.
+        :param echo: Write captured output to stdout while running the step.
+        :param timeout: Seconds after which a shell step is killed.
+        :return: Step result.
+        """
+        kwargs = {}
+        capture = None
+        if command_type != Type.PYTHON:
+            if keep_going or not echo:
+                capture = deque(maxlen=self.output_tail) if echo else []
+                kwargs = {"capture": capture, "echo": echo}
+            if timeout:
+                kwargs["timeout"] = timeout
+            if not echo:
+                kwargs["group"] = True
+
+        error = None
+        start = time.perf_counter()
+        try:
+            return_code = self.run_step(cmd, command_type, retry=retry, **kwargs)
+        except Exception as e:
+            if not keep_going:
+                raise
+
+            self.cli.logger.exception("Step raised an exception")
+            return_code, error = 1, repr(e)
+
+        return StepResult(
+            step=self._describe_step(cmd, command_type),
+            return_code=return_code,
+            duration=time.perf_counter() - start,
+            output=list(capture) if capture is not None else None,
+            error=error,
+        )
+
+    def run_concurrent_steps(
+        self,
+        commands,
+        command_type: Type,
+        retry: Retry = None,
+        keep_going=False,
+        jobs: int = None,
+        timeout: float = None,
+    ) -> List[StepResult]:
+        """
+        Run a group of independent steps concurrently. Output of each step is captured and written once the step
+        finishes to avoid interleaving it.
+
+        :param commands: Steps to run.
+        :param command_type: Command type.
+        :param retry: Command retry policy.
+        :param keep_going: Keep going mode.
+        :param jobs: Max number of steps running at the same time.
+        :param timeout: Seconds after which a shell step is killed.
+        :return: Steps results, in the same order than given steps.
+        """
+
+        def run_step(c, *args, **kwargs):
+            # Steps waiting for a free worker are not started once the command is interrupted
+            if self.interrupted is not None:
+                return StepResult(
+                    step=self._describe_step(c, command_type),
+                    return_code=self.INTERRUPT_CODE + self.interrupted,
+                    duration=0.0,
+                    error="Interrupted before starting",
+                )
+
+            # Worker threads do not inherit context, so settings of this main are bound again
+            with use_settings(self._settings):
+                return self.run_timed_step(c, *args, **kwargs)
+
+        results = [None] * len(commands)
+        with ThreadPoolExecutor(max_workers=jobs or os.cpu_count() or 1) as executor:
+            futures = {
+                executor.submit(
+                    run_step,
+                    c,
+                    command_type,
+                    retry=getattr(c, "retry", None) or retry,
+                    keep_going=keep_going,
+                    echo=False,
+                    timeout=timeout,
+                ): i
+                for i, c in enumerate(commands)
+            }
+            try:
+                for future in as_completed(futures):
+                    results[futures[future]] = self._step_result(future)
+            except KeyboardInterrupt:
+                # Steps run in their own process groups, so they only stop when the signal is forwarded
+                self.interrupt(signal.SIGINT)
+                for future, i in futures.items():
+                    if results[i] is None:
+                        results[i] = self._step_result(future)
+
+        return results
+
+    def _step_result(self, future) -> StepResult:
+        result = future.result()
+        if result.output:
+            sys.stdout.write("".join(result.output))
+            sys.stdout.flush()
+            tail = -self.output_tail
+            result.output = result.output[tail:]
+
+        return result
+
+    @staticmethod
+    def _makespan(durations: List[float], jobs: int) -> float:
+        """
+        Wall time of running steps with given durations using a number of workers, each step taken by the first free
+        worker, longest steps first.
+        """
+        workers = [0.0] * min(jobs, len(durations))
+        for duration in sorted(durations, reverse=True):
+            heapq.heappush(workers, heapq.heappop(workers) + duration)
+
+        return max(workers, default=0.0)
+
+    def plan_command(self, input_command, commands, command_type: Type, jobs: int = None) -> dict:
+        """
+        Build the execution plan of a command, with its steps, their dependencies and their expected durations, taken
+        from durations recorded in previous runs. Each group of steps depends on every step of the previous group,
+        and expected durations of groups and the whole command account for the steps running concurrently. Steps
+        without a recorded duration are not included in estimations.
+
+        :param input_command: Command name.
+        :param commands: Built steps.
+        :param command_type: Command type.
+        :param jobs: Max number of steps running at the same time.
+        :return: Execution plan.
+        """
+        jobs = jobs or os.cpu_count() or 1
+        names = [self._describe_step(c, command_type) for c in commands]
+        recorded = DurationStore().get(self._durations_scope(input_command), names)
+        # Expected duration of each step, so repeated steps are estimated once per step
+        durations = [recorded.get(n) for n in names]
+
+        steps, groups, previous = [], [], []
+        for group in self._step_groups(commands):
+            ids = list(range(len(steps), len(steps) + len(group)))
+            for i, c in zip(ids, group):
+                steps.append(
+                    {
+                        "id": i,
+                        "name": names[i],
+                        "args": list(c) if command_type != Type.PYTHON else None,
+                        "group": len(groups),
+                        "depends_on": previous,
+                        "retry": getattr(getattr(c, "retry", None), "attempts", None),
+                        "expected_duration": durations[i],
+                    }
+                )
+
+            known = [durations[i] for i in ids if durations[i] is not None]
+            groups.append(
+                {
+                    "steps": ids,
+                    "parallelism": min(len(group), jobs) if len(group) > 1 else 1,
+                    "expected_duration": self._makespan(known, jobs if len(group) > 1 else 1),
+                }
+            )
+            previous = ids
+
+        return {
+            "command": input_command,
+            "type": command_type.value,
+            "jobs": jobs,
+            "steps": steps,
+            "groups": groups,
+            "parallelism": max((g["parallelism"] for g in groups), default=0),
+            "expected_duration": sum(g["expected_duration"] for g in groups),
+            "serial_duration": sum(d for d in durations if d is not None),
+            "estimated_steps": sum(1 for d in durations if d is not None),
+        }
+
+    def _run_groups(
+        self, commands, command_type: Type, retry: Retry, command_settings: CommandSettings, keep_going: bool
+    ):
+        """
+        Run groups of steps of a command, one after another, until one of them fails unless keep going mode is enabled,
+        or until the command is interrupted.
+
+        :param commands: Built steps.
+        :param command_type: Command type.
+        :param retry: Command retry policy.
+        :param command_settings: Command settings.
+        :param keep_going: Keep going mode.
+        :return: Steps results and whether any group was run concurrently.
+        """
+        concurrent = False
+        results = []
+        for group in self._step_groups(commands):
+            if self.interrupted is not None:
+                break
+
+            if len(group) > 1:
+                concurrent = True
+                group_results = self.run_concurrent_steps(
+                    group,
+                    command_type,
+                    retry=retry,
+                    keep_going=keep_going,
+                    jobs=command_settings.jobs,
+                    timeout=command_settings.timeout,
+                )
+            else:
+                c = group[0]
+                step_retry = getattr(c, "retry", None) or retry
+                group_results = [
+                    self.run_timed_step(
+                        c, command_type, retry=step_retry, keep_going=keep_going, timeout=command_settings.timeout
+                    )
+                ]
+
+            for result in group_results:
+                self.cli.print_return(result.return_code, result.duration)
+
+            results += group_results
+
+            # Break on non-zero exit code unless keep going mode is enabled.
+            if not keep_going and any(r.failed for r in group_results):
+                break
+
+        return results, concurrent
+
+    @staticmethod
+    def _durations_scope(input_command) -> str:
+        return "steps.{}".format(input_command)
+
     def run_command(self, input_command, *args, **kwargs):
         """
-        Run the given command, building it with arguments.
+        Run the given command, building it with arguments. Timeout, jobs and retry policy are taken from command
+        settings, where *--timeout* and *--jobs* options of this main take precedence. The retry policy of
+        the command decorator is only overridden by a retry policy given for this command, not by a global one. Jobs
+        bound the number of independent steps running concurrently. Settings of this main are bound to the context
+        while running it, so commands looking up global settings get them. A SIGTERM received while running it is
+        forwarded to all running steps, and no more steps are started once it is interrupted, returning 128 plus the
+        signal number. Commands that cannot be built, raising CommandBuildError, are reported and return 1.
 
         :param input_command: Command to execute.
         :param args: List of args passed to run_<type> command.
         :param kwargs: Dict of kwargs passed to run_<type> command.
         :return: Command return code.
         """
-        # Print header
-        self.cli.print_header(input_command, **kwargs)
+        with use_settings(self._settings), self.supervisor.handle_signals(self.interrupt):
+            self.cache_stats = Counter()
+            self.interrupted = None
 
-        # Get list of commands
-        commands, command_type = Builder.build_command(input_command, *args, **kwargs)
+            # Print header
+            self.cli.print_header(input_command, **kwargs)
 
-        # Print command list
-        self.cli.print_commands_list(commands, command_type)
+            # Get list of commands
+            spec = self.get_command(input_command)
+            try:
+                commands, command_type = Builder.build_command(
+                    input_command, *args, spec=spec, default_args=self._settings.default_args, **kwargs
+                )
+            except CommandBuildError as e:
+                self.cli.print_build_error(input_command, str(e))
+                return 1
 
-        return_code = 0
-        for c in commands:
-            if command_type == Type.PYTHON:
-                return_code = self.run_python(c)
-            elif command_type in (Type.SHELL, Type.SHELL_WITH_HELP):
-                return_code = self.run_shell(c)
-            else:  # pragma: no cover
-                raise CommandTypeError(command_type)
+            # Print command list
+            self.cli.print_commands_list(commands, command_type)
+
+            # Command settings and retry policy, that can be overridden by each step
+            # Options of this main are read from its own destinations, so arguments of the command are never taken
+            command_settings = self._settings.command(
+                input_command,
+                defaults={"retry": spec.retry},
+                jobs=getattr(self.args, "step_jobs", None),
+                timeout=getattr(self.args, "step_timeout", None),
+            )
+            retry = command_settings.retry
+
+            # Write execution plan instead of running the command
+            if getattr(self.args, "plan", False):
+                plan = self.plan_command(input_command, commands, command_type, jobs=command_settings.jobs)
+                sys.stdout.write(json.dumps(plan, indent=2) + "\n")
+                sys.stdout.flush()
+                return 0
+
+            keep_going = getattr(self.args, "keep_going", False)
+            results, concurrent = self._run_groups(commands, command_type, retry, command_settings, keep_going)
+
+            if keep_going or concurrent or self.interrupted is not None:
+                self.cli.print_report(results)
+
+            if self.cache_stats:
+                self.cli.print_cache_stats(self.cache_stats["hits"], self.cache_stats["misses"])
 
-            self.cli.print_return(return_code)
+            # Record durations of successful steps
+            durations = {r.step: r.duration for r in results if not r.failed}
+            if self.record_durations and durations and not getattr(self.args, "dry_run", False):
+                DurationStore().record(self._durations_scope(input_command), durations)
 
-            # Break on non-zero exit code.
-            if return_code != 0:
-                return return_code
+            if self.interrupted is not None:
+                return self.INTERRUPT_CODE + self.interrupted
 
-        return return_code
+            return next((r.return_code for r in results if r.failed), results[-1].return_code if results else 0)
 
     @abstractmethod
     def run(self, *args, **kwargs):
@@ -0,0 +1,145 @@
+"""
+Helpers for describing built distribution artifacts in a manifest with their SHA256 digests and publishing them into
+a repository.
+
+Both actions are exposed as a command line tool to be used as shell steps:
+``python -m clinner.run.commands.artifacts manifest dist``
+``python -m clinner.run.commands.artifacts publish --repository /srv/packages dist``
+"""
+import json
+import os
+import shutil
+import sys
+from typing import Dict, List
+from urllib.parse import unquote, urlparse
+
+from clinner.cache import file_digest
+from clinner.exceptions import CommandArgParseError
+from clinner.run.commands.helpers import Action, run_tool
+
+__all__ = ["MANIFEST", "write_manifest", "read_manifest", "local_repository", "publish"]
+
+MANIFEST = "manifest.json"
+
+
+def write_manifest(dist_dir: str, manifest: str = MANIFEST) -> List[Dict]:
+    """
+    Write a manifest listing every artifact in a directory along with its size and SHA256 digest.
+
+    :param dist_dir: Artifacts directory.
+    :param manifest: Manifest file name, placed into artifacts directory.
+    :return: Artifacts listed.
+    """
+    artifacts = [
+        {"name": name, "size": os.path.getsize(path), "sha256": file_digest(path)}
+        for name, path in ((n, os.path.join(dist_dir, n)) for n in sorted(os.listdir(dist_dir)))
+        if name != manifest and os.path.isfile(path)
+    ]
+
+    with open(os.path.join(dist_dir, manifest), "w") as f:
+        json.dump({"artifacts": artifacts}, f, indent=2, sort_keys=True)
+
+    return artifacts
+
+
+def read_manifest(dist_dir: str, manifest: str = MANIFEST) -> List[Dict]:
+    """
+    Read artifacts listed in a manifest.
+
+    :param dist_dir: Artifacts directory.
+    :param manifest: Manifest file name, placed into artifacts directory.
+    :return: Artifacts listed.
+    """
+    with open(os.path.join(dist_dir, manifest)) as f:
+        return json.load(f)["artifacts"]
+
+
+def local_repository(repository: str) -> str:
+    """
+    Local directory of a file based repository, given either as a path or as a file:// URL.
+
+    :param repository: Repository path or URL.
+    :return: Directory path or None if repository is not local.
+    """
+    url = urlparse(repository)
+    if url.scheme == "file":
+        return unquote(url.path)
+
+    if not url.scheme and (os.path.isdir(repository) or repository.startswith((os.sep, ".", "~"))):
+        return os.path.expanduser(repository)
+
+    return None
+
+
+def publish(dist_dir: str, repository: str, manifest: str = MANIFEST) -> int:
+    """
+    Copy artifacts listed in manifest into a local repository, verifying that their digests match both before and
+    after copying them. Artifacts are copied to a temporary name and renamed once verified, so a failed publication
+    never leaves partial files in the repository.
+
+    :param dist_dir: Artifacts directory.
+    :param repository: Repository directory.
+    :param manifest: Manifest file name, placed into artifacts directory.
+    :return: 0 if all artifacts were published, 1 otherwise.
+    """
+    os.makedirs(repository, exist_ok=True)
+
+    for artifact in read_manifest(dist_dir, manifest):
+        source = os.path.join(dist_dir, artifact["name"])
+        target = os.path.join(repository, artifact["name"])
+        partial = target + ".partial"
+
+        if file_digest(source) != artifact["sha256"]:
+            print("Digest mismatch for '{}', it changed after manifest was written".format(source), file=sys.stderr)
+            return 1
+
+        shutil.copyfile(source, partial)
+        if file_digest(partial) != artifact["sha256"]:
+            os.remove(partial)
+            print("Digest mismatch for '{}' after copying it".format(target), file=sys.stderr)
+            return 1
+
+        os.replace(partial, target)
+
+    shutil.copyfile(os.path.join(dist_dir, manifest), os.path.join(repository, manifest))
+    return 0
+
+
+def _write_manifest(args):
+    write_manifest(args.dist_dir)
+
+
+def _publish(args) -> int:
+    repository = local_repository(args.repository)
+    if repository is None:
+        raise CommandArgParseError("Repository '{}' is not local".format(args.repository))
+
+    return publish(args.dist_dir, repository)
+
+
+def main(argv=None):
+    return run_tool(
+        "Distribution artifacts helpers",
+        (
+            Action(
+                "manifest",
+                "Write artifacts manifest",
+                ((("dist_dir",), {"help": "Artifacts directory"}),),
+                _write_manifest,
+            ),
+            Action(
+                "publish",
+                "Copy artifacts into a local repository",
+                (
+                    (("--repository",), {"required": True, "help": "Repository path or file:// URL"}),
+                    (("dist_dir",), {"help": "Artifacts directory"}),
+                ),
+                _publish,
+            ),
+        ),
+        argv,
+    )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,13 +1,32 @@
-import shlex
-
 from clinner.command import Type, command
+from clinner.run.commands.changed import CHANGED_ARGUMENTS, tool_steps
+from clinner.run.commands.helpers import value_options
+from clinner.template import CommandTemplate
 
 __all__ = ["black"]
 
+BLACK = CommandTemplate("black")
+BLACK_VALUE_OPTIONS = value_options(
+    "-c",
+    "-l",
+    "-t",
+    "-W",
+    "--code",
+    "--config",
+    "--exclude",
+    "--extend-exclude",
+    "--force-exclude",
+    "--include",
+    "--line-length",
+    "--required-version",
+    "--target-version",
+    "--workers",
+)
+
 
-@command(command_type=Type.SHELL, parser_opts={"help": "Run black"})
+@command(command_type=Type.SHELL, args=CHANGED_ARGUMENTS, parser_opts={"help": "Run black"})
 def black(*args, **kwargs):
     """
-    Run prospector lint.
+    Run black formatter.
     """
-    return [shlex.split("black") + list(args)]
+    return tool_steps(BLACK, args, kwargs, BLACK_VALUE_OPTIONS)
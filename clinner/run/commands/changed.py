@@ -0,0 +1,278 @@
+"""
+Helpers for running lint and format tools only over files changed since a git ref, skipping files already checked by
+the same tool and options without changes since then.
+
+Tools are run through a wrapper that marks files as clean when the tool succeeds:
+``python -m clinner.run.commands.changed run --key KEY --files 2 -- flake8 foo.py bar.py``
+"""
+import hashlib
+import os
+import sqlite3
+import subprocess
+import sys
+from contextlib import closing
+from typing import Iterable, List
+
+from clinner.cache import file_digest
+from clinner.command import Step
+from clinner.exceptions import CommandBuildError
+from clinner.run.commands.helpers import COMMAND_ARGUMENT, Action, run_tool, split_args
+from clinner.template import CommandTemplate
+
+__all__ = ["CHANGED_ARGUMENTS", "changed_files", "CleanCache", "chunk_files", "changed_steps", "tool_steps"]
+
+CACHE_PATH = os.path.join(".clinner", "clean.db")
+EXTENSIONS = (".py",)
+ARG_MAX_MARGIN = 4096
+# Tool configuration files, whose content is part of clean cache keys
+CONFIG_FILES = (
+    "setup.cfg",
+    "tox.ini",
+    "pyproject.toml",
+    ".flake8",
+    ".isort.cfg",
+    ".prospector.yaml",
+    ".prospector.yml",
+    ".pylintrc",
+)
+
+#: Command line arguments of tools that can run only over changed files.
+CHANGED_ARGUMENTS = (
+    (
+        ("--changed",),
+        {"action": "store_true", "help": "Run only over files changed since a git ref that are not clean yet"},
+    ),
+    (
+        ("--changed-since",),
+        {"metavar": "REF", "help": "Git ref to compare changed files to (HEAD by default), implies --changed"},
+    ),
+)
+
+
+def _git(*args) -> List[str]:
+    try:
+        output = subprocess.check_output(("git",) + args, universal_newlines=True, stderr=subprocess.PIPE)
+    except subprocess.CalledProcessError as e:
+        raise CommandBuildError("git {} failed: {}".format(args[0], (e.stderr or "").strip() or e.returncode))
+    except OSError as e:
+        raise CommandBuildError("git cannot be run: {}".format(e))
+
+    return [line for line in output.splitlines() if line]
+
+
+def changed_files(base: str = "HEAD", extensions: Iterable[str] = EXTENSIONS) -> List[str]:
+    """
+    Files changed in working tree against given git ref, including untracked files that are not ignored.
+
+    :param base: Git ref to compare to.
+    :param extensions: File extensions to include.
+    :return: Sorted list of existing changed files.
+    :raise CommandBuildError: If git fails, e.g: outside a git repository or if the ref does not exist.
+    """
+    files = set(_git("diff", "--name-only", "--diff-filter=ACMR", "--relative", base))
+    files.update(_git("ls-files", "--others", "--exclude-standard"))
+
+    return sorted(f for f in files if f.endswith(tuple(extensions)) and os.path.isfile(f))
+
+
+class CleanCache:
+    """
+    Cache of files that passed a tool, identified by a key built from the tool command and its configuration, along
+    with their content digest at that moment. A file is clean while neither its content nor the tool configuration
+    change.
+    """
+
+    def __init__(self, path: str = CACHE_PATH):
+        self.path = path
+
+    @staticmethod
+    def key(command: List[str], config_files: Iterable[str] = CONFIG_FILES) -> str:
+        """
+        Cache key for a tool command, including its options and the content of its configuration files, that are the
+        given ones and any file passed as an option value.
+
+        :param command: Tool command and options.
+        :param config_files: Configuration files read by the tool.
+        :return: Cache key.
+        """
+        digest = hashlib.sha256("\0".join(command).encode())
+        files = list(config_files) + [arg.partition("=")[2] or arg for arg in command[1:]]
+        for path in sorted({f for f in files if os.path.isfile(f)}):
+            digest.update("\0{}\0{}".format(path, file_digest(path)).encode())
+
+        return digest.hexdigest()
+
+    def _connect(self) -> sqlite3.Connection:
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS clean ("
+            "key TEXT NOT NULL, path TEXT NOT NULL, digest TEXT NOT NULL, PRIMARY KEY (key, path)) WITHOUT ROWID"
+        )
+        return connection
+
+    def dirty(self, key: str, files: Iterable[str]) -> List[str]:
+        """
+        Filter files that are not clean for given key.
+
+        :param key: Cache key.
+        :param files: Files to check.
+        :return: Files that have changed since they were marked as clean, or that were never marked.
+        """
+        files = list(files)
+        if not os.path.exists(self.path):
+            return files
+
+        with closing(self._connect()) as connection:
+            clean = dict(connection.execute("SELECT path, digest FROM clean WHERE key = ?", (key,)))
+
+        return [f for f in files if f not in clean or clean[f] != file_digest(f)]
+
+    def mark(self, key: str, files: Iterable[str]):
+        """
+        Mark files as clean for given key, using their current content.
+
+        :param key: Cache key.
+        :param files: Clean files.
+        """
+        with closing(self._connect()) as connection, connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO clean (key, path, digest) VALUES (?, ?, ?)",
+                [(key, f, file_digest(f)) for f in files if os.path.isfile(f)],
+            )
+
+
+def arg_max() -> int:
+    """
+    Max size in bytes of command line arguments, discounting environment size and a safety margin.
+    """
+    try:
+        limit = os.sysconf("SC_ARG_MAX")
+    except (AttributeError, ValueError, OSError):  # pragma: no cover
+        limit = 32768
+
+    environ = sum(len(k) + len(v) + 2 for k, v in os.environ.items())
+    return max(limit - environ - ARG_MAX_MARGIN, 1024)
+
+
+def _arg_size(arg: str) -> int:
+    # Argument bytes, its null terminator and its pointer in argv
+    return len(os.fsencode(arg)) + 1 + 8
+
+
+def chunk_files(files: List[str], command: List[str], limit: int = None) -> List[List[str]]:
+    """
+    Split files into chunks that can be appended to given command without exceeding arguments size limit.
+
+    :param files: Files.
+    :param command: Command that will receive the files.
+    :param limit: Max size of arguments. Calculated from system limits if not given.
+    :return: List of chunks of files.
+    """
+    available = (limit or arg_max()) - sum(_arg_size(a) for a in command)
+    chunks, chunk, size = [], [], 0
+    for f in files:
+        if chunk and size + _arg_size(f) > available:
+            chunks.append(chunk)
+            chunk, size = [], 0
+
+        chunk.append(f)
+        size += _arg_size(f)
+
+    if chunk:
+        chunks.append(chunk)
+
+    return chunks
+
+
+def _within(path: str, paths: List[str]) -> bool:
+    path = os.path.normpath(path)
+    return any(p == os.curdir or path == p or path.startswith(p + os.sep) for p in paths)
+
+
+def changed_steps(
+    command: List[str], base: str = "HEAD", cache: CleanCache = None, paths: Iterable[str] = ()
+) -> List[List[str]]:
+    """
+    Build the steps for running a tool over changed files that are not clean. Files are split into chunks that
+    respect arguments size limit, each one run as an independent step that marks its files as clean if succeeds.
+
+    :param command: Tool command and options, without paths.
+    :param base: Git ref to compare to.
+    :param cache: Clean files cache.
+    :param paths: Paths that limit changed files, all of them are used if not given.
+    :return: List of steps. Empty if there are no dirty files.
+    """
+    cache = cache or CleanCache()
+    key = cache.key(command)
+    paths = [os.path.normpath(p) for p in paths]
+    files = cache.dirty(key, [f for f in changed_files(base) if not paths or _within(f, paths)])
+    wrapper = [sys.executable, "-m", "clinner.run.commands.changed", "run", "--key", key, "--cache", cache.path]
+
+    steps = []
+    for chunk in chunk_files(files, wrapper + ["--files", str(len(files)), "--"] + command):
+        steps.append(Step(wrapper + ["--files", str(len(chunk)), "--"] + command + chunk, independent=True))
+
+    return steps
+
+
+def tool_steps(template: CommandTemplate, args: Iterable[str], kwargs: dict, value_options=()) -> List[List[str]]:
+    """
+    Build the steps for running a tool. If changed mode is enabled through CHANGED_ARGUMENTS, paths given in args are
+    removed from the tool command and used to limit the changed files the tool runs over.
+
+    :param template: Tool command template.
+    :param args: Tool args.
+    :param kwargs: Command kwargs.
+    :param value_options: Value options of the tool, built using value_options.
+    :return: List of steps.
+    """
+    if not kwargs.get("changed") and not kwargs.get("changed_since"):
+        return [template.render(*args)]
+
+    paths, options, _ = split_args(args, (), value_options)
+    return changed_steps(template.render(*options), base=kwargs.get("changed_since") or "HEAD", paths=paths)
+
+
+def run_marking(command: List[str], files: int, key: str, cache: CleanCache) -> int:
+    """
+    Run a tool and mark the files given as its last arguments as clean if it succeeds.
+
+    :param command: Tool command, options and files.
+    :param files: Number of files at the end of command.
+    :param key: Cache key.
+    :param cache: Clean files cache.
+    :return: Tool return code.
+    """
+    return_code = subprocess.call(command)
+
+    if return_code == 0 and files:
+        cache.mark(key, command[-files:])
+
+    return return_code
+
+
+def main(argv=None):
+    return run_tool(
+        "Changed files helpers",
+        (
+            Action(
+                "run",
+                "Run a tool marking its files as clean if it succeeds",
+                (
+                    (("--key",), {"required": True, "help": "Cache key"}),
+                    (("--cache",), {"default": CACHE_PATH, "help": "Cache path"}),
+                    (("--files",), {"type": int, "required": True, "help": "Number of files at the end of command"}),
+                    COMMAND_ARGUMENT,
+                ),
+                lambda args: run_marking(args.cmd, args.files, args.key, CleanCache(args.cache)),
+            ),
+        ),
+        argv,
+    )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
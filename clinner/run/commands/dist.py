@@ -1,23 +1,90 @@
-import shlex
+import os
+import sys
+from urllib.parse import urlparse
 
-from clinner.command import Type, command
+from clinner.command import Step, Type, command
+from clinner.run.commands.artifacts import local_repository
 
 __all__ = ["dist"]
 
 VERSION_CHOICES = ("patch", "minor", "major")
+DIST_DIR = "dist"
+BUILD_DIR = os.path.join(".clinner", "dist")
+
+
+def _upload(dist_dir: str, repository: str):
+    if local_repository(repository) is not None:
+        return [sys.executable, "-m", "clinner.run.commands.artifacts", "publish", "--repository", repository, dist_dir]
+
+    upload = ["twine", "upload"]
+    if urlparse(repository).scheme:
+        upload += ["--repository-url", repository]
+    else:
+        upload += ["--repository", repository]
+
+    return upload + [os.path.join(dist_dir, "*.tar.gz"), os.path.join(dist_dir, "*.whl")]
 
 
 @command(
     command_type=Type.SHELL_WITH_HELP,
-    args=((("version",), {"help": "Bump version", "choices": VERSION_CHOICES}),),
+    args=(
+        (("version",), {"help": "Bump version", "choices": VERSION_CHOICES}),
+        (("--dist-dir",), {"help": "Artifacts directory", "default": DIST_DIR}),
+        (
+            ("--upload",),
+            {
+                "help": "Upload artifacts to given repository, either a local path, a file:// URL, a repository URL or "
+                "a repository name from pypirc",
+                "nargs": "?",
+                "const": "pypi",
+                "metavar": "REPOSITORY",
+            },
+        ),
+    ),
     parser_opts={"help": "Bump version, create package and upload it"},
 )
 def dist(*args, **kwargs):
     """
     Bump version, create package and upload it.
+
+    Source distribution and wheel are built concurrently, each one in its own process with its own egg-info and build
+    directories, and a manifest with the SHA256 digest of each artifact is written afterwards. Upload is only done if
+    a repository is given.
     """
-    clean = shlex.split("rm -rf dist")
-    bumpversion = shlex.split("bumpversion %s" % kwargs["version"])
-    package = shlex.split("python setup.py sdist bdist_wheel")
-    upload = shlex.split("twine upload dist/*")
-    return [clean, bumpversion, package, upload]
+    dist_dir = kwargs.get("dist_dir") or DIST_DIR
+    sdist_dir, wheel_dir = os.path.join(BUILD_DIR, "sdist"), os.path.join(BUILD_DIR, "wheel")
+
+    clean = ["rm", "-rf", dist_dir, BUILD_DIR]
+    build_dirs = ["mkdir", "-p", dist_dir, sdist_dir, wheel_dir]
+    bumpversion = ["bumpversion", kwargs["version"]]
+    sdist = Step(
+        ["python", "setup.py", "egg_info", "--egg-base", sdist_dir, "sdist", "--dist-dir", dist_dir],
+        independent=True,
+        name="sdist",
+    )
+    wheel = Step(
+        [
+            "python",
+            "setup.py",
+            "egg_info",
+            "--egg-base",
+            wheel_dir,
+            "build",
+            "--build-base",
+            os.path.join(wheel_dir, "build"),
+            "bdist_wheel",
+            "--bdist-dir",
+            os.path.join(wheel_dir, "bdist"),
+            "--dist-dir",
+            dist_dir,
+        ],
+        independent=True,
+        name="bdist_wheel",
+    )
+    manifest = [sys.executable, "-m", "clinner.run.commands.artifacts", "manifest", dist_dir]
+
+    steps = [clean, build_dirs, bumpversion, sdist, wheel, manifest]
+    if kwargs.get("upload"):
+        steps.append(_upload(dist_dir, kwargs["upload"]))
+
+    return steps
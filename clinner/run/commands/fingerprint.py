@@ -0,0 +1,119 @@
+"""
+Helpers for skipping steps whose inputs have not changed since their last successful run. Inputs are identified by a
+fingerprint of file trees, built from paths, sizes and modification times, that is stored in a stamp file once the
+step succeeds.
+
+Steps are run through a wrapper that writes the stamp when they succeed:
+``python -m clinner.run.commands.fingerprint run --stamp STAMP --fingerprint FINGERPRINT -- sphinx-build ...``
+"""
+import hashlib
+import os
+import subprocess
+import sys
+from typing import Iterable, List
+
+from clinner.run.commands.helpers import COMMAND_ARGUMENT, Action, run_tool
+
+__all__ = ["tree_fingerprint", "is_fresh", "stamped"]
+
+
+def _tree_files(path: str) -> List[str]:
+    if os.path.isfile(path):
+        return [path]
+
+    files = []
+    for root, dirs, filenames in os.walk(path):
+        dirs[:] = [d for d in dirs if not d.startswith(".")]
+        files += [os.path.join(root, f) for f in filenames]
+
+    return sorted(files)
+
+
+def tree_fingerprint(paths: Iterable[str]) -> str:
+    """
+    Fingerprint of given files and directories, that changes when any file is added, removed or modified. Hidden
+    directories are ignored.
+
+    :param paths: Files or directories.
+    :return: Hex digest.
+    """
+    digest = hashlib.sha256()
+    for path in paths:
+        for f in _tree_files(path):
+            stat = os.stat(f)
+            digest.update("{}\0{}\0{}\0".format(f, stat.st_size, stat.st_mtime_ns).encode())
+
+    return digest.hexdigest()
+
+
+def is_fresh(stamp: str, fingerprint: str) -> bool:
+    """
+    Check if the fingerprint stored in a stamp file matches given one.
+
+    :param stamp: Stamp file path.
+    :param fingerprint: Current fingerprint.
+    :return: True if stamp exists and matches.
+    """
+    try:
+        with open(stamp) as f:
+            return f.read().strip() == fingerprint
+    except OSError:
+        return False
+
+
+def stamped(command: List[str], stamp: str, fingerprint: str) -> List[str]:
+    """
+    Wrap a command to write given fingerprint into a stamp file when it succeeds.
+
+    :param command: Command to run.
+    :param stamp: Stamp file path.
+    :param fingerprint: Fingerprint of command inputs.
+    :return: Wrapped command.
+    """
+    wrapper = [sys.executable, "-m", "clinner.run.commands.fingerprint", "run", "--stamp", stamp]
+    return wrapper + ["--fingerprint", fingerprint, "--"] + list(command)
+
+
+def run_stamped(command: List[str], stamp: str, fingerprint: str) -> int:
+    """
+    Run a command and write given fingerprint into a stamp file if it succeeds, removing it otherwise.
+
+    :param command: Command to run.
+    :param stamp: Stamp file path.
+    :param fingerprint: Fingerprint of command inputs.
+    :return: Command return code.
+    """
+    return_code = subprocess.call(command)
+
+    if return_code == 0:
+        if os.path.dirname(stamp):
+            os.makedirs(os.path.dirname(stamp), exist_ok=True)
+        with open(stamp, "w") as f:
+            f.write(fingerprint)
+    elif os.path.exists(stamp):
+        os.remove(stamp)
+
+    return return_code
+
+
+def main(argv=None):
+    return run_tool(
+        "Fingerprint helpers",
+        (
+            Action(
+                "run",
+                "Run a command writing a stamp file if it succeeds",
+                (
+                    (("--stamp",), {"required": True, "help": "Stamp file path"}),
+                    (("--fingerprint",), {"required": True, "help": "Fingerprint of command inputs"}),
+                    COMMAND_ARGUMENT,
+                ),
+                lambda args: run_stamped(args.cmd, args.stamp, args.fingerprint),
+            ),
+        ),
+        argv,
+    )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
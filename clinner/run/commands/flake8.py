@@ -1,13 +1,35 @@
-import shlex
-
 from clinner.command import Type, command
+from clinner.run.commands.changed import CHANGED_ARGUMENTS, tool_steps
+from clinner.run.commands.helpers import value_options
+from clinner.template import CommandTemplate
 
 __all__ = ["flake8"]
 
+FLAKE8 = CommandTemplate("flake8")
+FLAKE8_VALUE_OPTIONS = value_options(
+    "-j",
+    "--append-config",
+    "--config",
+    "--exclude",
+    "--extend-exclude",
+    "--extend-ignore",
+    "--extend-select",
+    "--filename",
+    "--format",
+    "--ignore",
+    "--jobs",
+    "--max-complexity",
+    "--max-doc-length",
+    "--max-line-length",
+    "--output-file",
+    "--per-file-ignores",
+    "--select",
+)
+
 
-@command(command_type=Type.SHELL, parser_opts={"help": "Run flake8"})
+@command(command_type=Type.SHELL, args=CHANGED_ARGUMENTS, parser_opts={"help": "Run flake8"})
 def flake8(*args, **kwargs):
     """
-    Run prospector lint.
+    Run flake8 lint.
     """
-    return [shlex.split("flake8") + list(args)]
+    return tool_steps(FLAKE8, args, kwargs, FLAKE8_VALUE_OPTIONS)
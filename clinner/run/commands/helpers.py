@@ -0,0 +1,98 @@
+"""
+Helpers shared by commands, for splitting the args of a tool into paths and options, and for running the command line
+tools that helper modules expose to be used as shell steps, e.g: ``python -m clinner.run.commands.sharding run -- ls``.
+"""
+import argparse
+import os
+from collections import namedtuple
+from typing import FrozenSet, Iterable, List, Optional, Tuple
+
+from clinner.exceptions import CommandArgParseError
+
+__all__ = ["value_options", "split_args", "COMMAND_ARGUMENT", "Action", "run_tool"]
+
+#: Argument of actions that run a command, given as the remaining args, optionally after ``--``.
+COMMAND_ARGUMENT = (("cmd",), {"nargs": argparse.REMAINDER, "help": "Command to run"})
+
+Action = namedtuple("Action", ("name", "help", "arguments", "handler"))
+Action.__doc__ = "Action of a helpers command line tool, with its arguments and the handler called with parsed args."
+
+
+def value_options(*options: str) -> FrozenSet[str]:
+    """
+    Options of a tool that take a value as the next arg, so that value is not mistaken for a path when the args of the
+    tool are split.
+
+    :param options: Option names.
+    :return: Option names.
+    """
+    return frozenset(options)
+
+
+def split_args(
+    args: Iterable[str], junit_options: Tuple[str, ...], value_options: Iterable[str] = ()
+) -> Tuple[List[str], List[str], Optional[str]]:
+    """
+    Split tool args into paths, options and junit report path given by user. An arg is a path if it exists and it is
+    not the value of the previous option, or if it is given after ``--``.
+
+    :param args: Tool args.
+    :param junit_options: Option names used by tool to specify junit report path.
+    :param value_options: Value options of the tool, built using value_options.
+    :return: Paths, options and junit report.
+    """
+    paths, options, junit = [], [], None
+    args = list(args)
+    while args:
+        arg = args.pop(0)
+        name, _, value = arg.partition("=")
+        if arg == "--":
+            paths += args
+            break
+        elif name in junit_options:
+            junit = value or (args.pop(0) if args else None)
+        elif arg in value_options:
+            options.append(arg)
+            if args:
+                options.append(args.pop(0))
+        elif not arg.startswith("-") and os.path.exists(arg):
+            paths.append(arg)
+        else:
+            options.append(arg)
+
+    return paths, options, junit
+
+
+def run_tool(description: str, actions: Iterable[Action], argv: List[str] = None) -> int:
+    """
+    Run the command line tool of a helpers module, that has a subcommand for each action. A command given through
+    COMMAND_ARGUMENT is passed to the handler without the ``--`` separator. Handlers return the return code, where None
+    means success, and raise CommandArgParseError to report wrong arguments.
+
+    :param description: Tool description.
+    :param actions: Actions of the tool.
+    :param argv: Command line arguments. System arguments if not given.
+    :return: Return code.
+    """
+    parser = argparse.ArgumentParser(description=description)
+    subparsers = parser.add_subparsers(dest="action")
+    subparsers.required = True
+
+    handlers = {}
+    for action in actions:
+        subparser = subparsers.add_parser(action.name, help=action.help)
+        for names, kwargs in action.arguments:
+            subparser.add_argument(*names, **kwargs)
+        handlers[action.name] = action.handler
+
+    args = parser.parse_args(argv)
+    cmd = getattr(args, "cmd", None)
+    if cmd and cmd[0] == "--":
+        args.cmd = cmd[1:]
+
+    try:
+        return_code = handlers[args.action](args)
+    except CommandArgParseError as e:
+        parser.error(str(e))
+
+    return return_code or 0
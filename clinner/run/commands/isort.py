@@ -1,13 +1,38 @@
-import shlex
-
 from clinner.command import Type, command
+from clinner.run.commands.changed import CHANGED_ARGUMENTS, tool_steps
+from clinner.run.commands.helpers import value_options
+from clinner.template import CommandTemplate
 
 __all__ = ["isort"]
 
+ISORT = CommandTemplate("isort")
+ISORT_VALUE_OPTIONS = value_options(
+    "-a",
+    "-b",
+    "-j",
+    "-l",
+    "-m",
+    "-o",
+    "-p",
+    "-s",
+    "--add-import",
+    "--builtin",
+    "--jobs",
+    "--line-length",
+    "--multi-line",
+    "--profile",
+    "--project",
+    "--settings-path",
+    "--skip",
+    "--skip-glob",
+    "--src",
+    "--thirdparty",
+)
+
 
-@command(command_type=Type.SHELL, parser_opts={"help": "Run isort"})
+@command(command_type=Type.SHELL, args=CHANGED_ARGUMENTS, parser_opts={"help": "Run isort"})
 def isort(*args, **kwargs):
     """
-    Run prospector lint.
+    Run isort imports formatter.
     """
-    return [shlex.split("isort") + list(args)]
+    return tool_steps(ISORT, args, kwargs, ISORT_VALUE_OPTIONS)
@@ -1,22 +1,66 @@
-import shlex
-
 from clinner.command import Type, command
+from clinner.run.commands.helpers import value_options
+from clinner.run.commands.sharding import shard_steps, suite_steps
+from clinner.template import CommandTemplate
 
 __all__ = ["nose"]
 
+COVERAGE_ERASE = CommandTemplate("coverage erase")
+NOSETESTS = CommandTemplate("nosetests")
+NOSE_VALUE_OPTIONS = value_options(
+    "-a",
+    "-A",
+    "-c",
+    "-e",
+    "-i",
+    "-m",
+    "-w",
+    "--attr",
+    "--config",
+    "--cover-package",
+    "--eval-attr",
+    "--exclude",
+    "--include",
+    "--match",
+    "--processes",
+    "--where",
+)
+
 
 @command(
     command_type=Type.SHELL,
-    args=((("test_module",), {"nargs": "*", "default": ["."], "help": "Module to test"}),),
+    args=(
+        (("test_module",), {"nargs": "*", "default": ["."], "help": "Module to test"}),
+        (
+            ("--shards",),
+            {"type": int, "default": 1, "help": "Split test files across given number of concurrent processes"},
+        ),
+    ),
     parser_opts={"help": "Run unit tests"},
 )
 def nose(*args, **kwargs):
     """
-    Run unit tests using Nose.
+    Run unit tests using Nose. Tests can be split by file into shards that run concurrently, balanced using the
+    durations recorded in previous runs, merging their coverage data and junit reports at the end.
     """
-    coverage_erase = shlex.split("coverage erase")
+    coverage_erase = COVERAGE_ERASE.render()
 
-    tests = shlex.split("nosetests")
-    tests += args
+    if kwargs.get("shards", 1) > 1:
+        return [coverage_erase] + shard_steps(
+            runner=NOSETESTS.render(),
+            args=args,
+            shards=kwargs["shards"],
+            scope="nose",
+            junit=lambda path: ["--with-xunit", "--xunit-file={}".format(path)],
+            junit_options=("--xunit-file",),
+            default_paths=kwargs.get("test_module") or ["."],
+            value_options=NOSE_VALUE_OPTIONS,
+        )
 
-    return [coverage_erase, tests]
+    return [coverage_erase] + suite_steps(
+        runner=NOSETESTS.render(),
+        args=args,
+        scope="nose",
+        junit=lambda path: ["--with-xunit", "--xunit-file={}".format(path)],
+        junit_options=("--xunit-file",),
+    )
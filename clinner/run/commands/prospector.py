@@ -1,13 +1,36 @@
-import shlex
-
 from clinner.command import Type, command
+from clinner.run.commands.changed import CHANGED_ARGUMENTS, tool_steps
+from clinner.run.commands.helpers import value_options
+from clinner.template import CommandTemplate
 
 __all__ = ["prospector"]
 
+PROSPECTOR = CommandTemplate("prospector")
+PROSPECTOR_VALUE_OPTIONS = value_options(
+    "-i",
+    "-I",
+    "-o",
+    "-P",
+    "-s",
+    "-t",
+    "-w",
+    "-W",
+    "--ignore-paths",
+    "--ignore-patterns",
+    "--max-line-length",
+    "--output-format",
+    "--profile",
+    "--profile-path",
+    "--strictness",
+    "--tool",
+    "--with-tool",
+    "--without-tool",
+)
+
 
-@command(command_type=Type.SHELL, parser_opts={"help": "Run prospector lint"})
+@command(command_type=Type.SHELL, args=CHANGED_ARGUMENTS, parser_opts={"help": "Run prospector lint"})
 def prospector(*args, **kwargs):
     """
     Run prospector lint.
     """
-    return [shlex.split("prospector") + list(args)]
+    return tool_steps(PROSPECTOR, args, kwargs, PROSPECTOR_VALUE_OPTIONS)
@@ -1,18 +1,68 @@
-import shlex
-
 from clinner.command import Type, command
+from clinner.run.commands.helpers import value_options
+from clinner.run.commands.sharding import shard_steps, suite_steps
+from clinner.template import CommandTemplate
 
 __all__ = ["pytest"]
 
+COVERAGE_ERASE = CommandTemplate("coverage erase")
+PYTEST = CommandTemplate("pytest")
+PYTEST_VALUE_OPTIONS = value_options(
+    "-c",
+    "-k",
+    "-m",
+    "-o",
+    "-p",
+    "-r",
+    "-W",
+    "--basetemp",
+    "--confcutdir",
+    "--cov",
+    "--cov-config",
+    "--cov-report",
+    "--deselect",
+    "--durations",
+    "--ignore",
+    "--ignore-glob",
+    "--maxfail",
+    "--override-ini",
+    "--rootdir",
+    "--tb",
+)
+
 
-@command(command_type=Type.SHELL, parser_opts={"help": "Run unit tests"})
+@command(
+    command_type=Type.SHELL,
+    args=(
+        (
+            ("--shards",),
+            {"type": int, "default": 1, "help": "Split test files across given number of concurrent processes"},
+        ),
+    ),
+    parser_opts={"help": "Run unit tests"},
+)
 def pytest(*args, **kwargs):
     """
-    Run unit tests using pytest.
+    Run unit tests using pytest. Tests can be split by file into shards that run concurrently, balanced using the
+    durations recorded in previous runs, merging their coverage data and junit reports at the end.
     """
-    coverage_erase = shlex.split("coverage erase")
+    coverage_erase = COVERAGE_ERASE.render()
 
-    tests = shlex.split("pytest")
-    tests += args
+    if kwargs.get("shards", 1) > 1:
+        return [coverage_erase] + shard_steps(
+            runner=PYTEST.render(),
+            args=args,
+            shards=kwargs["shards"],
+            scope="pytest",
+            junit=lambda path: ["--junitxml={}".format(path)],
+            junit_options=("--junitxml", "--junit-xml"),
+            value_options=PYTEST_VALUE_OPTIONS,
+        )
 
-    return [coverage_erase, tests]
+    return [coverage_erase] + suite_steps(
+        runner=PYTEST.render(),
+        args=args,
+        scope="pytest",
+        junit=lambda path: ["--junitxml={}".format(path)],
+        junit_options=("--junitxml", "--junit-xml"),
+    )
@@ -0,0 +1,327 @@
+"""
+Helpers for splitting a test suite into shards that run concurrently, balancing them using the durations recorded in
+previous runs and merging their reports afterwards.
+
+Recording and merging are exposed as a command line tool to be used as shell steps:
+``python -m clinner.run.commands.sharding run --scope pytest --junit report.xml -- pytest --junitxml=report.xml``
+``python -m clinner.run.commands.sharding merge-junit -o report.xml shard-0.xml shard-1.xml``
+``python -m clinner.run.commands.sharding combine-coverage``
+"""
+import glob
+import heapq
+import os
+import re
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from xml.etree import ElementTree
+
+from clinner.command import Step
+from clinner.history import DurationStore
+from clinner.run.commands.helpers import COMMAND_ARGUMENT, Action, run_tool, split_args
+
+__all__ = [
+    "discover_test_files",
+    "read_junit_durations",
+    "split_shards",
+    "recorded",
+    "suite_steps",
+    "shard_steps",
+    "merge_junit",
+    "combine_coverage",
+]
+
+SHARDS_DIR = os.path.join(".clinner", "shards")
+JUNIT_REPORT = os.path.join(SHARDS_DIR, "junit.xml")
+TEST_FILE_PATTERN = re.compile(r"^(test_.*|.*_test)\.py$")
+EXCLUDED_DIRS = {"build", "dist", "node_modules", "__pycache__"}
+JUNIT_COUNTERS = ("tests", "failures", "errors", "skipped")
+
+
+def discover_test_files(paths: Iterable[str]) -> List[str]:
+    """
+    Find test files in given paths, that can be either files or directories.
+
+    :param paths: Paths to look up.
+    :return: Sorted list of test files.
+    """
+    files = set()
+    for path in paths:
+        if os.path.isfile(path):
+            files.add(os.path.normpath(path))
+            continue
+
+        for root, dirs, filenames in os.walk(path):
+            dirs[:] = [d for d in dirs if not d.startswith(".") and d not in EXCLUDED_DIRS]
+            files.update(os.path.normpath(os.path.join(root, f)) for f in filenames if TEST_FILE_PATTERN.match(f))
+
+    return sorted(files)
+
+
+def _classname_file(classname: str, cache: Dict[str, Optional[str]]) -> Optional[str]:
+    """
+    Find the file that defines a test given its junit classname, e.g: ``tests.test_foo.TestCaseFoo``.
+    """
+    if classname not in cache:
+        parts = classname.split(".")
+        cache[classname] = next(
+            (
+                os.path.normpath(os.path.join(*parts[:i]) + ".py")
+                for i in range(len(parts), 0, -1)
+                if os.path.isfile(os.path.join(*parts[:i]) + ".py")
+            ),
+            None,
+        )
+
+    return cache[classname]
+
+
+def read_junit_durations(path: str) -> Dict[str, float]:
+    """
+    Read durations of each test file from a junit report.
+
+    :param path: Junit report path.
+    :return: Dict of test file and its duration in seconds. Empty if report does not exist or it is not valid.
+    """
+    try:
+        root = ElementTree.parse(path).getroot()
+    except (OSError, ElementTree.ParseError):
+        return {}
+
+    durations, cache = {}, {}
+    for testcase in root.iter("testcase"):
+        test_file = testcase.get("file") or _classname_file(testcase.get("classname", ""), cache)
+        if test_file:
+            test_file = os.path.normpath(test_file)
+            durations[test_file] = durations.get(test_file, 0.0) + float(testcase.get("time") or 0.0)
+
+    return durations
+
+
+def split_shards(files: List[str], shards: int, durations: Dict[str, float] = None) -> List[List[str]]:
+    """
+    Split test files into shards with similar durations using longest processing time first scheduling: files are
+    assigned from the slowest to the fastest to the shard with less accumulated duration. Files without a known
+    duration are considered as slow as the average.
+
+    :param files: Test files.
+    :param shards: Number of shards.
+    :param durations: Known durations of test files.
+    :return: List of shards, each one a list of test files. Empty shards are discarded.
+    """
+    durations = durations or {}
+    known = [durations[f] for f in files if f in durations]
+    default = sum(known) / len(known) if known else 1.0
+
+    groups = [[] for _ in range(max(shards, 1))]
+    loads = [(0.0, i) for i in range(len(groups))]
+    for f in sorted(files, key=lambda x: (-durations.get(x, default), x)):
+        load, i = heapq.heappop(loads)
+        groups[i].append(f)
+        heapq.heappush(loads, (load + durations.get(f, default), i))
+
+    return [sorted(g) for g in groups if g]
+
+
+def recorded(command: List[str], scope: str, junit: str = None, key: str = None) -> List[str]:
+    """
+    Wrap a command to record its durations in the durations store once it finishes, whatever its result.
+
+    :param command: Command to run.
+    :param scope: Durations scope.
+    :param junit: Junit report written by the command, whose per file durations will be recorded.
+    :param key: Key used to record the duration of the whole command.
+    :return: Wrapped command.
+    """
+    wrapper = [sys.executable, "-m", "clinner.run.commands.sharding", "run", "--scope", scope]
+    if junit:
+        wrapper += ["--junit", junit]
+    if key:
+        wrapper += ["--key", key]
+
+    return wrapper + ["--"] + list(command)
+
+
+def suite_steps(
+    runner: List[str],
+    args: Iterable[str],
+    scope: str,
+    junit: Callable[[str], List[str]],
+    junit_options: Tuple[str, ...],
+) -> List[List[str]]:
+    """
+    Build the step for running a test suite in a single process, recording the durations of its test files.
+
+    :param runner: Test runner command.
+    :param args: Test runner args.
+    :param scope: Durations scope.
+    :param junit: Function that returns the runner options for writing a junit report to given path.
+    :param junit_options: Option names used by runner to specify junit report path.
+    :return: List of steps.
+    """
+    args = list(args)
+    _, _, user_junit = split_args(args, junit_options)
+    report = user_junit or JUNIT_REPORT
+    options = [] if user_junit else junit(report)
+
+    return [recorded(runner + args + options, scope, junit=report)]
+
+
+def shard_steps(
+    runner: List[str],
+    args: Iterable[str],
+    shards: int,
+    scope: str,
+    junit: Callable[[str], List[str]],
+    junit_options: Tuple[str, ...],
+    default_paths: Iterable[str] = (".",),
+    value_options: Iterable[str] = (),
+) -> List[List[str]]:
+    """
+    Build the steps for running a test suite split into shards. Each shard runs as an independent step with its own
+    coverage data file and junit report, recording the durations of its test files. Shards are followed by steps that
+    combine coverage data, if any shard wrote it, and merge junit reports.
+
+    :param runner: Test runner command.
+    :param args: Test runner args, including test paths.
+    :param shards: Number of shards.
+    :param scope: Durations scope.
+    :param junit: Function that returns the runner options for writing a junit report to given path.
+    :param junit_options: Option names used by runner to specify junit report path.
+    :param default_paths: Test paths used if no one is given in args.
+    :param value_options: Value options of the runner, built using value_options.
+    :return: List of steps.
+    """
+    paths, options, user_junit = split_args(args, junit_options, value_options)
+    files = discover_test_files(paths or default_paths)
+    groups = split_shards(files, shards, DurationStore().get(scope, files))
+
+    reports = [os.path.join(SHARDS_DIR, "junit-{}.xml".format(i)) for i in range(len(groups))]
+    steps = [
+        Step(
+            recorded(
+                ["env", "COVERAGE_FILE=.coverage.shard{}".format(i)] + runner + options + junit(report) + group,
+                scope,
+                junit=report,
+            ),
+            independent=True,
+        )
+        for i, (group, report) in enumerate(zip(groups, reports))
+    ]
+
+    steps.append([sys.executable, "-m", "clinner.run.commands.sharding", "combine-coverage"])
+    if user_junit:
+        steps.append([sys.executable, "-m", "clinner.run.commands.sharding", "merge-junit", "-o", user_junit] + reports)
+
+    return steps
+
+
+def run_recorded(command: List[str], scope: str, junit: str = None, key: str = None) -> int:
+    """
+    Run a command and record its durations in the durations store.
+
+    :param command: Command to run.
+    :param scope: Durations scope.
+    :param junit: Junit report written by the command, whose per file durations will be recorded.
+    :param key: Key used to record the duration of the whole command.
+    :return: Command return code.
+    """
+    if junit and os.path.exists(junit):
+        os.remove(junit)
+    elif junit and os.path.dirname(junit):
+        os.makedirs(os.path.dirname(junit), exist_ok=True)
+
+    start = time.perf_counter()
+    process = subprocess.Popen(command)
+    try:
+        return_code = process.wait()
+    except KeyboardInterrupt:
+        return_code = process.wait()
+
+    durations = read_junit_durations(junit) if junit else {}
+    if key:
+        durations[key] = time.perf_counter() - start
+
+    if durations:
+        DurationStore().record(scope, durations)
+
+    return return_code
+
+
+def merge_junit(outputs: Iterable[str], inputs: Iterable[str]):
+    """
+    Merge junit reports into a single one.
+
+    :param outputs: Paths of merged report.
+    :param inputs: Paths of reports to merge. Missing reports are ignored.
+    """
+    root = ElementTree.Element("testsuites")
+    totals = dict.fromkeys(JUNIT_COUNTERS, 0)
+    time = 0.0
+    for path in inputs:
+        try:
+            report = ElementTree.parse(path).getroot()
+        except (OSError, ElementTree.ParseError):
+            continue
+
+        for suite in [report] if report.tag == "testsuite" else report.iter("testsuite"):
+            root.append(suite)
+            for counter in JUNIT_COUNTERS:
+                totals[counter] += int(suite.get(counter) or 0)
+            time += float(suite.get("time") or 0.0)
+
+    root.attrib.update({k: str(v) for k, v in totals.items()}, time="{:.3f}".format(time))
+
+    for output in outputs:
+        if os.path.dirname(output):
+            os.makedirs(os.path.dirname(output), exist_ok=True)
+        ElementTree.ElementTree(root).write(output, encoding="utf-8", xml_declaration=True)
+
+
+def combine_coverage(path: str = ".") -> int:
+    """
+    Combine coverage data files written by shards, if any. Nothing is done if no shard wrote coverage data, e.g: if
+    tests run without coverage plugin.
+
+    :param path: Directory of coverage data files.
+    :return: Return code of coverage combine.
+    """
+    if not glob.glob(os.path.join(path, ".coverage.*")):
+        return 0
+
+    return subprocess.call(["coverage", "combine"], cwd=path)
+
+
+def main(argv=None):
+    return run_tool(
+        "Test sharding helpers",
+        (
+            Action(
+                "run",
+                "Run a command recording its durations",
+                (
+                    (("--scope",), {"required": True, "help": "Durations scope"}),
+                    (("--junit",), {"help": "Junit report written by the command"}),
+                    (("--key",), {"help": "Key used to record the duration of the whole command"}),
+                    COMMAND_ARGUMENT,
+                ),
+                lambda args: run_recorded(args.cmd, args.scope, junit=args.junit, key=args.key),
+            ),
+            Action(
+                "merge-junit",
+                "Merge junit reports",
+                (
+                    (("-o", "--output"), {"action": "append", "required": True, "help": "Merged report path"}),
+                    (("inputs",), {"nargs": "+", "help": "Reports to merge"}),
+                ),
+                lambda args: merge_junit(args.output, args.inputs),
+            ),
+            Action("combine-coverage", "Combine coverage data of shards, if any", (), lambda args: combine_coverage()),
+        ),
+        argv,
+    )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
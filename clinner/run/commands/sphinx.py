@@ -1,21 +1,45 @@
-import shlex
+import os
 
-from clinner.command import Type, command
+from clinner.command import Step, Type, command
+from clinner.run.commands.fingerprint import is_fresh, stamped, tree_fingerprint
+from clinner.template import CommandTemplate
 
 __all__ = ["sphinx"]
 
+SPHINX_BUILD = CommandTemplate("sphinx-build -M {builder} {source} {build} -j {parallel}")
+
 
 @command(
     command_type=Type.SHELL,
     args=(
-        (("sphinx_command",), {"help": "Sphinx command"}),
+        (("sphinx_command",), {"nargs": "+", "help": "Sphinx command, multiple builders can be given"}),
         (("--source",), {"help": "Sources dir", "default": "doc/source"}),
         (("--build",), {"help": "Build dir", "default": "doc/build"}),
+        (("-j", "--jobs"), {"dest": "parallel", "default": "auto", "help": "Sphinx parallel jobs for each builder"}),
+        (
+            ("--watch",),
+            {"action": "append", "default": [], "help": "Additional path whose changes trigger a rebuild"},
+        ),
+        (("--force",), {"action": "store_true", "help": "Build even if sources have not changed"}),
     ),
     parser_opts={"help": "Sphinx doc"},
 )
 def sphinx(*args, **kwargs):
     """
-    Run an sphinx command.
+    Run an sphinx command. Multiple builders share the doctrees cache: the first one runs alone to populate it and the
+    rest run concurrently afterwards. Builders are skipped if sources have not changed since their last build.
     """
-    return [shlex.split("sphinx-build -M %s %s %s" % (kwargs["sphinx_command"], kwargs["source"], kwargs["build"]))]
+    source, build = kwargs["source"], kwargs["build"]
+    fingerprint = tree_fingerprint([source] + kwargs.get("watch", []))
+
+    steps = []
+    for builder in kwargs["sphinx_command"]:
+        stamp = os.path.join(build, ".fingerprint-{}".format(builder))
+        if kwargs.get("force") or not is_fresh(stamp, fingerprint):
+            cmd = SPHINX_BUILD.render(
+                *args, builder=builder, source=source, build=build, parallel=kwargs.get("parallel", "auto")
+            )
+            step = stamped(cmd, stamp, fingerprint)
+            steps.append(Step(step, independent=bool(steps), name=" ".join(cmd[:3])))
+
+    return steps
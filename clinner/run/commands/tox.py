@@ -1,13 +1,57 @@
-import shlex
+import subprocess
+from itertools import takewhile
+from typing import List
 
-from clinner.command import Type, command
+from clinner.command import Step, Type, command
+from clinner.history import DurationStore
+from clinner.run.commands.sharding import recorded
+from clinner.template import CommandTemplate
 
 __all__ = ["tox"]
 
+TOX = CommandTemplate("tox")
+TOX_LIST = CommandTemplate("tox -l")
+TOX_ENV = CommandTemplate("tox -e {env}")
+
+
+def _explicit_envs(args) -> bool:
+    return any(a.startswith(("-e", "--env")) for a in args)
+
+
+def _envs(args) -> List[str]:
+    """
+    Environments listed by tox using given options, that are the args before positional args separator. No environment
+    is returned if they cannot be listed.
+    """
+    options = list(takewhile(lambda a: a != "--", args))
+    try:
+        output = subprocess.check_output(TOX_LIST.render(*options), universal_newlines=True, stderr=subprocess.DEVNULL)
+    except (OSError, subprocess.CalledProcessError):
+        return []
+
+    return [line.strip() for line in output.splitlines() if line.strip()]
+
 
 @command(command_type=Type.SHELL, parser_opts={"help": "Run tox"})
 def tox(*args, **kwargs):
     """
-    Run tests using tox.
+    Run tests using tox. Environments are run concurrently, each one in its own process with its output captured,
+    unless specific environments are given or the main runs a single job at a time. The duration of each environment
+    is recorded and used to start the slowest ones first. A single tox step is run if environments cannot be listed,
+    and when running in dry run or plan mode, so tox is not called while building the command.
     """
-    return [shlex.split("tox") + list(args)]
+    tests = TOX.render(*args)
+
+    fan_out = not _explicit_envs(args) and kwargs.get("step_jobs") != 1
+    envs = _envs(args) if fan_out and not kwargs.get("dry_run") and not kwargs.get("plan") else []
+    if len(envs) <= 1:
+        return [recorded(tests, "tox", key=" ".join(tests))]
+
+    durations = DurationStore().get("tox", envs)
+    envs = sorted(envs, key=lambda x: -durations.get(x, 0.0))
+    steps = []
+    for env in envs:
+        env_tests = TOX_ENV.render(*args, env=env)
+        steps.append(Step(recorded(env_tests, "tox", key=env), independent=True, name=" ".join(env_tests)))
+
+    return steps
@@ -12,6 +12,9 @@ __all__ = ["DjangoCommand"]
 class DjangoCommand(BaseCommand):
     """
     Wrapper that makes a Django command from a Main class, including parsers only for commands.
+
+    The main is created the first time it is needed and the arguments of each command are added only when that
+    command is parsed, so loading the Django command stays fast whatever the number of commands.
     """
 
     main_class = None
@@ -19,11 +22,21 @@ class DjangoCommand(BaseCommand):
     def __init__(self, *args, **kwargs):
         self.help = self.main_class.description
         super(DjangoCommand, self).__init__(*args, **kwargs)
-        self.command = self.main_class(parse_args=False)
-        self.command.cli.disable()
+        self._command = None
+
+    @property
+    def command(self):
+        """
+        Main instance, created on first access.
+        """
+        if self._command is None:
+            self._command = self.main_class(parse_args=False)
+            self._command.cli.disable()
+
+        return self._command
 
     def add_arguments(self, parser):
-        self.command._commands_arguments(parser=parser, parser_class=CommandParser)
+        self.command._commands_arguments(parser=parser, parser_class=CommandParser, lazy=True)
 
     def handle(self, *args, **options):
         self.command.run(**options)
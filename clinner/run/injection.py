@@ -0,0 +1,92 @@
+"""
+Options of inject methods of mains, that add environment variables before running commands.
+"""
+import threading
+import time
+from typing import Callable, Dict, Optional, Union
+
+__all__ = ["injection"]
+
+# Variables returned by cached inject methods, along with their expiration time, by method
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+class Injection:
+    """
+    Options of an inject method.
+    """
+
+    __slots__ = ("cache", "independent")
+
+    def __init__(self, cache: Union[None, bool, float] = None, independent: bool = False):
+        """
+        Inject method options.
+
+        :param cache: Cache variables returned by the method, once per process if True or during given seconds.
+        :param independent: Method does not depend on variables of other methods, so it can run concurrently.
+        """
+        self.cache = cache
+        self.independent = independent
+
+    @staticmethod
+    def _key(method: Callable) -> str:
+        return "{}.{}".format(method.__module__, method.__qualname__)
+
+    def cached(self, method: Callable) -> Optional[Dict[str, str]]:
+        """
+        Variables cached for a method, if any and not expired.
+
+        :param method: Inject method.
+        :return: Variables or None.
+        """
+        if not self.cache:
+            return None
+
+        with _cache_lock:
+            expiration, variables = _cache.get(self._key(method), (0.0, None))
+
+        return variables if expiration is None or expiration > time.monotonic() else None
+
+    def store(self, method: Callable, variables: Dict[str, str]):
+        """
+        Cache variables returned by a method.
+
+        :param method: Inject method.
+        :param variables: Variables.
+        """
+        if self.cache:
+            expiration = None if self.cache is True else time.monotonic() + self.cache
+            with _cache_lock:
+                _cache[self._key(method)] = (expiration, dict(variables))
+
+
+def injection(func: Callable = None, cache: Union[None, bool, float] = None, independent: bool = False):
+    """
+    Declare options of an inject method. Methods returning a dict of variables, instead of writing them into
+    environment, can be cached, once per process or during some seconds, and can be marked as independent to run them
+    concurrently with other inject methods:
+
+    @injection(cache=300, independent=True)
+    def inject_version(self):
+        return {'VERSION': subprocess.check_output(['git', 'describe']).decode().strip()}
+
+    :param func: Inject method.
+    :param cache: Cache variables returned by the method, once per process if True or during given seconds.
+    :param independent: Method does not depend on variables of other methods, so it can run concurrently.
+    :return: Decorated method.
+    """
+
+    def decorator(f):
+        f.injection = Injection(cache=cache, independent=independent)
+        return f
+
+    return decorator(func) if func is not None else decorator
+
+
+def clear_cache():
+    """
+    Clear cached variables of all inject methods.
+    """
+    with _cache_lock:
+        _cache.clear()
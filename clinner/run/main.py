@@ -1,5 +1,6 @@
 import argparse  # noqa
 
+from clinner import completion
 from clinner.exceptions import NotCommandError
 from clinner.run.base import BaseMain
 from clinner.run.mixins import HealthCheckMixin
@@ -15,7 +16,10 @@ class Main(BaseMain):
         :param parser: Argument parser.
         """
         parser.add_argument(
-            "-s", "--settings", help='Module or object with Clinner settings in format "package.module[:Object]"'
+            "-s",
+            "--settings",
+            help='Module or object with Clinner settings in format "package.module[:Object]", or a TOML, JSON or INI '
+            "settings file",
         )
         verbose_group = parser.add_mutually_exclusive_group()
         verbose_group.add_argument(
@@ -24,12 +28,56 @@ class Main(BaseMain):
         verbose_group.add_argument(
             "-v", "--verbose", action="count", default=0, help="Verbose level (This option is additive)"
         )
+        parser.add_argument(
+            "--log-format",
+            choices=("text", "json"),
+            default="text",
+            help="Log format. JSON format writes a JSON object per event, useful for log collectors",
+        )
+        parser.add_argument(
+            "--shell",
+            action="store_true",
+            help="Interactive shell that runs commands in the same process, keeping modules and connections loaded",
+        )
+        parser.add_argument(
+            "--completion",
+            choices=completion.SHELLS,
+            help="Print completion script for given shell, caching the commands manifest used to answer completions",
+        )
         parser.add_argument(
             "--dry-run",
             action="store_true",
             help="Dry run. Skip commands execution, useful to check which commands will be executed "
             "and execution order",
         )
+        parser.add_argument(
+            "--plan",
+            action="store_true",
+            help="Write the execution plan of the command as JSON, with its steps and their expected durations, "
+            "instead of running it",
+        )
+        parser.add_argument(
+            "--timeout",
+            dest="step_timeout",
+            type=float,
+            help="Seconds after which each step of the command is killed, overriding timeout from settings",
+        )
+        parser.add_argument(
+            "--jobs",
+            dest="step_jobs",
+            type=int,
+            help="Max number of independent steps running concurrently, overriding jobs from settings",
+        )
+        parser.add_argument(
+            "--no-cache",
+            action="store_true",
+            help="Run python commands and cached shell steps ignoring stored results, that are stored again on success",
+        )
+        parser.add_argument(
+            "--keep-going",
+            action="store_true",
+            help="Keep going when a step fails, running remaining steps and showing a report at the end",
+        )
 
     def run(self, *args, command=None, **kwargs):
         """
@@ -42,9 +90,14 @@ class Main(BaseMain):
 
         :param command: Explicit command. Use that command instead of the one passed by shell arguments.
         """
+        if command is None and getattr(self.args, "command", None) is None:
+            return_code = self.run_commandless()
+            if return_code is not None:
+                return return_code
+
         cmd_args = self.unknown_args if not args else args
 
-        cmd_kwargs = vars(self.args)
+        cmd_kwargs = dict(vars(self.args))
         cmd_kwargs.update(kwargs)
 
         try:
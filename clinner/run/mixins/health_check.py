@@ -12,8 +12,13 @@ class HealthCheckMixin(metaclass=ABCMeta):
 
     This mixin also adds a new parameter ``-r``, ``--retry`` that defines the number of retries done after a failure.
     These retries uses an exponential backoff to calculate timing.
+
+    When running an interactive shell, a successful health check is trusted by the following commands of the session
+    for ``shell_health_check_ttl`` seconds.
     """
 
+    shell_health_check_ttl = 300.0
+
     def add_arguments(self, parser: "argparse.ArgumentParser"):
         parser.add_argument(
             "-r",
@@ -40,6 +45,11 @@ class HealthCheckMixin(metaclass=ABCMeta):
 
         :return: True if health check was successful. False otherwise.
         """
+        shell = self._session.get("shell", False)
+        checked = self._session.get("health_check")
+        if shell and checked is not None and time.monotonic() - checked < self.shell_health_check_ttl:
+            return True
+
         if not self.args.skip_check and self.args.retry:
             health = False
             self.cli.logger.info("Performing healthcheck...")
@@ -56,6 +66,8 @@ class HealthCheckMixin(metaclass=ABCMeta):
 
             if not health:
                 self.cli.logger.error("Retry attempts exceeded, health check failed")
+            elif shell:
+                self._session["health_check"] = time.monotonic()
         else:
             health = True
 
@@ -73,9 +85,14 @@ class HealthCheckMixin(metaclass=ABCMeta):
 
         This method will print a header and the return code.
         """
+        if getattr(self.args, "command", None) is None:
+            return_code = self.run_commandless()
+            if return_code is not None:
+                return return_code
+
         cmd_args = self.unknown_args if not args else args
 
-        cmd_kwargs = vars(self.args)
+        cmd_kwargs = dict(vars(self.args))
         cmd_kwargs.update(kwargs)
 
         command = cmd_kwargs["command"]
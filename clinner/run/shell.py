@@ -0,0 +1,106 @@
+"""
+Interactive shell that runs command lines through a single main, keeping imported modules and state between commands.
+"""
+import argparse
+import cmd
+import shlex
+from typing import List
+
+__all__ = ["Shell"]
+
+
+class Shell(cmd.Cmd):
+    """
+    Interactive shell for a main. Each line is a command line as it would be given to the main, e.g: ``-v pytest -x``,
+    that is dispatched by the main in the same process. Command names and their options are completed using tab.
+    """
+
+    intro = 'Clinner shell. Type "help" to list commands and "exit" to quit.'
+    prompt = "clinner> "
+
+    def __init__(self, main, *args, **kwargs):
+        """
+        Interactive shell.
+
+        :param main: Main used to dispatch commands.
+        :param args: List of args passed to Cmd.
+        :param kwargs: Dict of kwargs passed to Cmd.
+        """
+        super(Shell, self).__init__(*args, **kwargs)
+        self.main = main
+        self.return_code = 0
+
+    @property
+    def _commands(self) -> dict:
+        return self.main.command_parsers
+
+    def emptyline(self):
+        # Do not repeat last command
+        pass
+
+    def default(self, line: str):
+        """
+        Dispatch a command line.
+        """
+        try:
+            argv = shlex.split(line)
+        except ValueError as e:
+            self.main.cli.logger.error("Wrong command line: %s", e)
+            return
+
+        try:
+            self.return_code = self.main.dispatch(argv)
+        except SystemExit as e:
+            # Raised by parser on wrong arguments or help
+            self.return_code = e.code if isinstance(e.code, int) else 1
+        except KeyboardInterrupt:
+            self.main.cli.logger.warning("Command interrupted")
+            self.return_code = 130
+        except Exception:
+            self.main.cli.logger.exception("Command failed")
+            self.return_code = 1
+
+    def do_help(self, arg: str):
+        """
+        List available commands or show help of a command.
+        """
+        if arg:
+            self.default("{} --help".format(arg))
+        else:
+            self.main.parser.print_help(self.stdout)
+
+    def do_exit(self, arg: str):
+        """
+        Exit the shell.
+        """
+        return True
+
+    def do_EOF(self, arg: str):  # noqa
+        self.stdout.write("\n")
+        return True
+
+    def completenames(self, text: str, *ignored) -> List[str]:
+        names = list(self._commands) + ["help", "exit"]
+        return sorted(n for n in names if n.startswith(text))
+
+    def completedefault(self, text: str, line: str, begidx: int, endidx: int) -> List[str]:
+        """
+        Complete options of the command in line, or global options if there is no command yet.
+        """
+        words = line[:begidx].split()
+        command = next((w for w in words if w in self._commands), None)
+        if command is None:
+            parser = self.main.parser
+            if not text.startswith("-"):
+                return self.completenames(text)
+        else:
+            parser = self._commands[command]
+
+        return sorted(o for o in self._options(parser) if o.startswith(text))
+
+    def complete_help(self, text: str, *ignored) -> List[str]:
+        return sorted(n for n in self._commands if n.startswith(text))
+
+    @staticmethod
+    def _options(parser: argparse.ArgumentParser) -> List[str]:
+        return [o for action in parser._actions for o in action.option_strings]
@@ -0,0 +1,207 @@
+"""
+Supervisor of child processes run by a main, that forwards quit signals to all of them and escalates if they do not
+stop in time.
+"""
+import os
+import select
+import signal
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterable, List
+
+__all__ = ["Supervisor"]
+
+
+class Child:
+    """
+    Child process tracked by a supervisor.
+    """
+
+    __slots__ = ("process", "name", "group")
+
+    def __init__(self, process, name: str, group: bool):
+        self.process = process
+        self.name = name
+        self.group = group
+
+    def send_signal(self, signum: int):
+        try:
+            if self.group:
+                os.killpg(self.process.pid, signum)
+            else:
+                self.process.send_signal(signum)
+        except (ProcessLookupError, PermissionError):
+            # Already finished
+            pass
+
+    def finished(self) -> bool:
+        if self.process.returncode is not None:
+            return True
+
+        if hasattr(os, "waitid"):
+            # Check if process exited without reaping it, so the thread waiting for it still gets its return code
+            try:
+                return os.waitid(os.P_PID, self.process.pid, os.WEXITED | os.WNOHANG | os.WNOWAIT) is not None
+            except ChildProcessError:
+                return True
+
+        return self.process.poll() is not None
+
+
+class Supervisor:
+    """
+    Supervisor of child processes. Processes are tracked while they run, and a quit signal is forwarded to all of them,
+    escalating to SIGTERM and SIGKILL after grace periods. Processes started in a process group of their own, such as
+    concurrent steps, only receive signals through the supervisor, and the whole group is signaled so grandchildren
+    are stopped too.
+    """
+
+    def __init__(self, interrupt_grace: float = 10.0, terminate_grace: float = 5.0):
+        """
+        Process supervisor.
+
+        :param interrupt_grace: Seconds to wait for processes to stop after forwarding the quit signal, before sending
+        SIGTERM.
+        :param terminate_grace: Seconds to wait for processes to stop after SIGTERM, before sending SIGKILL.
+        """
+        self.interrupt_grace = interrupt_grace
+        self.terminate_grace = terminate_grace
+        self._children = {}
+        self._lock = threading.Lock()
+
+    @property
+    def children(self) -> List[Child]:
+        with self._lock:
+            return list(self._children.values())
+
+    @staticmethod
+    def popen_kwargs(group: bool) -> dict:
+        """
+        Popen kwargs to start a process in a process group of its own, if supported by the platform.
+
+        :param group: Start the process in its own process group.
+        :return: Popen kwargs.
+        """
+        return {"start_new_session": True} if group and hasattr(os, "killpg") else {}
+
+    @contextmanager
+    def track(self, process, name: str = None, group: bool = False):
+        """
+        Track a process while the block runs.
+
+        :param process: Popen process.
+        :param name: Step name, used to report it if interrupted.
+        :param group: Process was started in a process group of its own.
+        """
+        child = Child(process, name or str(process.pid), group and hasattr(os, "killpg"))
+        with self._lock:
+            self._children[id(process)] = child
+
+        try:
+            yield child
+        finally:
+            with self._lock:
+                self._children.pop(id(process), None)
+
+    @staticmethod
+    def _pidfds(children: Iterable[Child]) -> dict:
+        pidfds = {}
+        if hasattr(os, "pidfd_open"):
+            for child in children:
+                try:
+                    pidfds[os.pidfd_open(child.process.pid)] = child
+                except (OSError, TypeError):
+                    pass
+
+        return pidfds
+
+    def wait(self, children: List[Child], timeout: float) -> List[Child]:
+        """
+        Wait for processes to finish. Process file descriptors are polled where available, so finished processes are
+        detected without checking each of them in a loop. Processes are not reaped, so the threads running them still
+        get their return codes.
+
+        :param children: Children to wait for.
+        :param timeout: Max seconds to wait.
+        :return: Children still running.
+        """
+        deadline = time.monotonic() + timeout
+        pending = [c for c in children if not c.finished()]
+        pidfds = self._pidfds(pending)
+        poller = None
+        if pidfds and hasattr(select, "poll"):
+            poller = select.poll()
+            for fd in pidfds:
+                poller.register(fd, select.POLLIN)
+
+        exited = set()
+        try:
+            while True:
+                pending = [c for c in pending if c not in exited and not c.finished()]
+                remaining = deadline - time.monotonic()
+                if not pending or remaining <= 0:
+                    break
+
+                if poller is not None and all(c in pidfds.values() for c in pending):
+                    # A process file descriptor is readable once the process exits, even if not reaped yet
+                    for fd, _ in poller.poll(remaining * 1000):
+                        poller.unregister(fd)
+                        exited.add(pidfds[fd])
+                else:
+                    time.sleep(min(0.05, remaining))
+        finally:
+            for fd in pidfds:
+                os.close(fd)
+
+        return pending
+
+    def interrupt(self, signum: int = signal.SIGINT) -> List[str]:
+        """
+        Forward a quit signal to all running processes, escalating to SIGTERM and SIGKILL for the ones that do not stop
+        during the grace periods. A keyboard interrupt received while waiting kills the remaining processes immediately.
+
+        :param signum: Signal forwarded first.
+        :return: Names of interrupted steps.
+        """
+        children = self.children
+        escalation = [(signum, self.interrupt_grace)]
+        if signum != signal.SIGTERM:
+            escalation.append((signal.SIGTERM, self.terminate_grace))
+        escalation.append((signal.SIGKILL, None))
+
+        pending = children
+        try:
+            for s, grace in escalation:
+                for child in pending:
+                    child.send_signal(s)
+
+                if grace is not None:
+                    pending = self.wait(pending, grace)
+                    if not pending:
+                        break
+        except KeyboardInterrupt:
+            for child in pending:
+                child.send_signal(signal.SIGKILL)
+
+        return [child.name for child in children]
+
+    @contextmanager
+    def handle_signals(self, handler: Callable[[int], None], signals=(signal.SIGTERM,)):
+        """
+        Call handler when any of given signals is received while the block runs, instead of being killed by them. Signal
+        handlers can only be installed in main thread, so nothing is done in other threads.
+
+        :param handler: Handler called with the signal number.
+        :param signals: Signals handled.
+        """
+        if threading.current_thread() is not threading.main_thread():
+            yield
+            return
+
+        previous = {s: signal.signal(s, lambda signum, frame: handler(signum)) for s in signals}
+        try:
+            yield
+        finally:
+            for s, h in previous.items():
+                signal.signal(s, h)
@@ -1,34 +1,139 @@
 # -*- coding: utf-8 -*-
 """
 Settings.
+
+Settings are resolved from several layers, each one overriding the previous ones: defaults, settings module or object,
+settings file, environment variables and command line arguments.
 """
+import configparser
+import copy
+import json
 import os
-from functools import partial, update_wrapper
+import re
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from functools import lru_cache
 from importlib import import_module
+from types import MappingProxyType
+from typing import Any, Dict, FrozenSet, Tuple
+
+from clinner.exceptions import ImproperlyConfigured
+from clinner.retry import Retry
+from clinner.template import tokenize
+
+try:
+    import tomllib
+except ImportError:  # pragma: no cover
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
+
+try:
+    from contextvars import ContextVar
+except ImportError:  # pragma: no cover
+    ContextVar = None
+
+__all__ = ["settings", "Settings", "CommandSettings", "is_settings_file", "get_settings", "use_settings"]
+
+#: Settings that can be defined globally or for each command.
+COMMAND_SETTINGS = ("timeout", "jobs", "retry")
+#: Settings read from a module or object, prefixed by *clinner_*.
+MODULE_SETTINGS = ("default_args", "commands") + COMMAND_SETTINGS
+
+SETTINGS_FILE_EXTENSIONS = (".toml", ".json", ".ini", ".cfg")
+INI_EXTENSIONS = (".ini", ".cfg")
+INI_SECTION = "clinner"
+
+ENV_PREFIX = "CLINNER_"
+ENV_PATTERN = re.compile(r"^CLINNER_(?:(?P<command>\w+?)_)?(?P<key>TIMEOUT|JOBS|RETRY)$")
+
+
+def _positive_int(value) -> int:
+    value = int(value)
+    if value < 1:
+        raise ValueError(value)
+
+    return value
+
+
+def _retry(value) -> Retry:
+    return Retry.build(int(value) if isinstance(value, str) else value)
+
+
+PARSERS = {"timeout": float, "jobs": _positive_int, "retry": _retry}
+
+CommandSettings = namedtuple("CommandSettings", COMMAND_SETTINGS)
+CommandSettings.__doc__ = "Settings resolved for a command."
+CommandSettings.__new__.__defaults__ = (None,) * len(COMMAND_SETTINGS)
+
+
+def _snapshot(value):
+    """
+    Copy of a settings value that compares equal to the snapshot of another value only if both are equal, including
+    values nested in dicts, lists and retry policies, so values modified in place are detected.
+    """
+    if isinstance(value, (dict, MappingProxyType)):
+        return {k: _snapshot(v) for k, v in value.items()}
 
-__all__ = ["settings"]
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return type(value).__name__, tuple(_snapshot(v) for v in value)
 
+    if isinstance(value, Retry):
+        return Retry, _snapshot(vars(value))
 
-class reset:  # noqa
-    def __init__(self, func, *args, **kwargs):
-        self.func = func
-        update_wrapper(self, func)
+    return value
 
-    def __get__(self, instance, owner=None):
-        self.instance = instance
-        return partial(self, instance)
 
-    def __call__(self, *args, **kwargs):
-        self.instance.reset_default()
-        self.func(*args, **kwargs)
+def _env_name(command: str) -> str:
+    return re.sub(r"\W", "_", command).upper()
+
+
+# Parsed settings file layers by path, modification time and size
+_files_cache = {}
+_files_lock = threading.Lock()
+
+
+def is_settings_file(path) -> bool:
+    """
+    Check if a settings path refers to a data file instead of a module or object.
+
+    :param path: Settings path.
+    :return: True if path is a settings file.
+    """
+    return isinstance(path, str) and path.endswith(SETTINGS_FILE_EXTENSIONS) and os.path.isfile(path)
+
+
+@lru_cache(maxsize=None)
+def _import_settings(path):
+    try:
+        try:
+            m, c = path.rsplit(":", 1)
+            module = import_module(m)
+            s = getattr(module, c)
+        except ValueError:
+            s = import_module(path)
+    except ImportError:
+        raise ImportError("Settings not found '{}'".format(path))
+
+    return s
 
 
 class Settings:
     default_args = {}
 
-    def __init__(self):
+    def __init__(self, module=None):
+        """
+        Settings.
+
+        :param module: Settings module or object, its full path or the path of a settings file. Taken from
+        CLINNER_SETTINGS environment variable if not given.
+        """
+        self._lock = threading.RLock()
         self.reset_default()
-        module_path = os.environ.get("CLINNER_SETTINGS")
+        module_path = module or os.environ.get("CLINNER_SETTINGS")
         if module_path:
             self.build_from_module(module_path)
 
@@ -37,6 +142,11 @@ class Settings:
         Reset settings to default values.
         """
         self.default_args = {}
+        self.layers = ()
+        self.load_time = 0.0
+        self._resolved = {}
+        self._source = None
+        self._signature = None
 
     @staticmethod
     def import_settings(path):
@@ -44,21 +154,12 @@ class Settings:
         Import a settings module that can be a module or an object.
         To import a module, his full path should be specified: *package.settings*.
         To import an object, his full path and object name should be specified: *project.settings:SettingsObject*.
+        Imported settings are cached, so a settings path is only imported once.
 
         :param path: Settings full path.
         :return: Settings module or object.
         """
-        try:
-            try:
-                m, c = path.rsplit(":", 1)
-                module = import_module(m)
-                s = getattr(module, c)
-            except ValueError:
-                s = import_module(path)
-        except ImportError:
-            raise ImportError("Settings not found '{}'".format(path))
-
-        return s
+        return _import_settings(path)
 
     @staticmethod
     def get(s, key, default=None):
@@ -71,21 +172,370 @@ class Settings:
         :param default: Default value.
         :return: Settings value. Default value if key is not found.
         """
-        return getattr(s, key, getattr(s, key.lower(), getattr(s, key.upper(), default)))
+        for k in (key, key.lower(), key.upper()):
+            try:
+                return getattr(s, k)
+            except AttributeError:
+                pass
+
+        return default
+
+    @staticmethod
+    def _layer(source, default_args=None, values=None, commands=None):
+        """
+        Build a settings layer, parsing its values. Default args are tokenized once here.
+
+        :param source: Layer description, used in error messages.
+        :param default_args: Default args for each command, either as a string or as a list.
+        :param values: Global values.
+        :param commands: Values for each command.
+        :return: Settings layer.
+        """
+
+        def parse(section, name):
+            result = {}
+            for key, value in (section or {}).items():
+                if key not in PARSERS:
+                    raise ImproperlyConfigured("Unknown setting '{}' for {} in {}".format(key, name, source))
+                try:
+                    result[key] = PARSERS[key](value) if value is not None else None
+                except (TypeError, ValueError):
+                    raise ImproperlyConfigured("Wrong value '{}' for setting '{}' in {}".format(value, key, source))
+
+            return result
+
+        return {
+            "source": source,
+            "default_args": {k: tokenize(v) for k, v in (default_args or {}).items()},
+            "values": parse(values, "all commands"),
+            "commands": {k: parse(v, "command '{}'".format(k)) for k, v in (commands or {}).items()},
+        }
+
+    def _module_layer(self, module):
+        values = {k: self.get(module, "clinner_{}".format(k)) for k in COMMAND_SETTINGS}
+        return self._layer(
+            "module {}".format(getattr(module, "__name__", module)) if module is not None else "defaults",
+            default_args=self.get(module, "clinner_default_args", {}),
+            values={k: v for k, v in values.items() if v is not None},
+            commands=self.get(module, "clinner_commands", {}),
+        )
+
+    @staticmethod
+    def _read_file(path):
+        """
+        Read a settings file. TOML and JSON settings are read from the top level of the file, or from the
+        *tool.clinner* table of a *pyproject.toml* file. INI settings are read from a *clinner* section and its
+        subsections, e.g: *clinner.default_args* and *clinner.commands.pytest*.
+
+        :param path: File path.
+        :return: Default args, global values and values for each command.
+        """
+        try:
+            if path.endswith(".toml"):
+                if tomllib is None:  # pragma: no cover
+                    raise ImproperlyConfigured("TOML settings file '{}' requires tomli package".format(path))
+
+                with open(path, "rb") as f:
+                    data = tomllib.load(f)
+            elif path.endswith(".json"):
+                with open(path) as f:
+                    data = json.load(f)
+            elif path.endswith(INI_EXTENSIONS):
+                parser = configparser.ConfigParser(interpolation=None)
+                parser.optionxform = str
+                with open(path) as f:
+                    parser.read_file(f)
+
+                sections = {name: dict(parser[name]) for name in parser.sections()}
+                prefix = INI_SECTION + ".commands."
+                data = dict(sections.get(INI_SECTION, {}))
+                data["default_args"] = sections.get(INI_SECTION + ".default_args", {})
+                data["commands"] = {k.split(prefix, 1)[1]: v for k, v in sections.items() if k.startswith(prefix)}
+            else:
+                raise ImproperlyConfigured("Unknown settings file format '{}'".format(path))
+        except (OSError, ValueError, configparser.Error) as e:
+            raise ImproperlyConfigured("Cannot read settings file '{}': {}".format(path, e))
+
+        if os.path.basename(path) == "pyproject.toml":
+            data = data.get("tool", {}).get("clinner", {})
+
+        values = {k: v for k, v in data.items() if k not in ("default_args", "commands")}
+        return data.get("default_args", {}), values, data.get("commands", {})
+
+    def _file_layer(self, path):
+        """
+        Settings layer read from a TOML, JSON or INI file. Parsed layers are cached by file path, modification time
+        and size, so an unchanged file is only read once per process.
+
+        :param path: File path.
+        :return: Settings layer.
+        """
+        try:
+            stat = os.stat(path)
+        except OSError as e:
+            raise ImproperlyConfigured("Cannot read settings file '{}': {}".format(path, e))
+
+        key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+        with _files_lock:
+            layer = _files_cache.get(key)
+
+        if layer is None:
+            default_args, values, commands = self._read_file(path)
+            layer = self._layer("file {}".format(path), default_args=default_args, values=values, commands=commands)
+            with _files_lock:
+                for stale in [k for k in _files_cache if k[0] == key[0] and k != key]:
+                    del _files_cache[stale]
+                layer = _files_cache.setdefault(key, layer)
+
+        return layer
+
+    def _env_layer(self, environ):
+        """
+        Settings layer read from environment variables, either global ones, e.g: *CLINNER_TIMEOUT*, or for a command,
+        e.g: *CLINNER_PYTEST_TIMEOUT*.
+
+        :param environ: Environment variables.
+        :return: Settings layer.
+        """
+        values, commands = {}, {}
+        for name, value in environ.items():
+            match = name.startswith(ENV_PREFIX) and ENV_PATTERN.match(name)
+            if match:
+                section = commands.setdefault(match.group("command"), {}) if match.group("command") else values
+                section[match.group("key").lower()] = value
+
+        return self._layer("environment", values=values, commands=commands)
+
+    def build(self, module=None, path=None, environ=None):
+        """
+        Build settings layers and merge default args. Command settings are resolved lazily and memoized.
+
+        :param module: Settings module or object, or its full path.
+        :param path: Settings file path.
+        :param environ: Environment variables, current ones if not given.
+        """
+        start = time.perf_counter()
+        environ = os.environ if environ is None else environ
+
+        if isinstance(module, str):
+            module = self.import_settings(module)
+
+        layers = [self._module_layer(module)]
+        if path:
+            layers.append(self._file_layer(path))
+        layers.append(self._env_layer(environ))
+
+        default_args = {}
+        for layer in layers:
+            default_args.update(layer["default_args"])
+
+        self.layers = tuple(layers)
+        self.default_args = MappingProxyType(default_args)
+        self._resolved = {}
+        self.load_time = time.perf_counter() - start
+
+    def _resolve(self, command: str) -> Tuple[CommandSettings, FrozenSet[str]]:
+        values, global_keys = {}, set()
+        for layer in reversed(self.layers):
+            section = layer["commands"].get(command) or layer["commands"].get(_env_name(command)) or {}
+            for key in COMMAND_SETTINGS:
+                if key not in values:
+                    if section.get(key) is not None:
+                        values[key] = section[key]
+                    elif layer["values"].get(key) is not None:
+                        values[key] = layer["values"][key]
+                        global_keys.add(key)
+
+        return CommandSettings(**values), frozenset(global_keys)
+
+    def command(self, name: str, defaults: Dict[str, Any] = None, **overrides) -> CommandSettings:
+        """
+        Get settings of a command. Values are taken from the topmost layer that defines them, preferring command
+        values over global values of the same layer.
+
+        :param name: Command name.
+        :param defaults: Values declared by the command itself, e.g: the retry policy of its decorator, that override
+        global values but not values given for this command. None values are ignored.
+        :param overrides: Values given through command line, that override any layer. None values are ignored.
+        :return: Command settings.
+        """
+        try:
+            resolved, global_keys = self._resolved[name]
+        except KeyError:
+            resolved, global_keys = self._resolved.setdefault(name, self._resolve(name))
+
+        defaults = {
+            k: v
+            for k, v in (defaults or {}).items()
+            if v is not None and (k in global_keys or getattr(resolved, k) is None)
+        }
+        if defaults:
+            resolved = resolved._replace(**defaults)
+
+        overrides = {k: v for k, v in overrides.items() if k in PARSERS and v is not None}
+        if overrides:
+            resolved = resolved._replace(**self._layer("command line", values=overrides)["values"])
+
+        return resolved
+
+    def _signature_of(self, module, path):
+        """
+        Signature of settings sources, that changes when the module or object, the value of any of its Clinner
+        settings, even if modified in place, the settings file or Clinner environment variables change. The module is
+        kept along with the snapshot of its values, so it cannot be mistaken for a new one.
+        """
+        module_values = tuple(_snapshot(self.get(module, "clinner_{}".format(k))) for k in MODULE_SETTINGS)
+        try:
+            stat = os.stat(path) if path else None
+            file_key = (path, stat.st_mtime_ns, stat.st_size) if stat else None
+        except OSError:
+            file_key = (path, None, None)
+
+        environ = tuple(sorted((k, v) for k, v in os.environ.items() if k.startswith(ENV_PREFIX)))
+        return module, module_values, file_key, environ
 
-    @reset
     def build_from_django(self):
         from django.conf import settings as django_settings
 
         self.build_from_module(django_settings)
 
-    @reset
     def build_from_module(self, module=None):
+        """
+        Build settings from a module or object, or from a settings file, along with settings file given through
+        environment and environment variables. Settings are only built again if their sources have changed since
+        last build or if they have been invalidated.
+
+        :param module: Settings module or object, its full path or the path of a settings file.
+        """
+        source, path = module, os.environ.get("CLINNER_SETTINGS_FILE")
+        if is_settings_file(module):
+            module, path = None, module
+
         if isinstance(module, str):
             module = self.import_settings(module)
 
-        # Builder args
-        self.default_args = self.get(module, "clinner_default_args", {})
+        with self._lock:
+            signature = self._signature_of(module, path)
+            if signature != self._signature:
+                # Layers are replaced as a whole, so settings are never seen empty while being built again
+                self.build(module, path=path)
+                self._source, self._signature = source, signature
+
+    def refresh(self):
+        """
+        Build settings again from the sources of last build if they have changed, or from defaults and environment if
+        settings have not been built yet.
+        """
+        self.build_from_module(self._source)
+
+    def invalidate(self):
+        """
+        Invalidate built settings and cached settings files and modules, so next build reads them again, e.g: after
+        modifying a settings module on disk.
+        """
+        self._signature = None
+        with _files_lock:
+            _files_cache.clear()
+        _import_settings.cache_clear()
+
+    def load(self, module=None) -> "Settings":
+        """
+        Build settings from a module or object, or refresh them if not given, and copy them atomically, so the copy
+        has the settings built from given sources even if other thread builds these settings again meanwhile.
+
+        :param module: Settings module or object, its full path or the path of a settings file.
+        :return: Settings.
+        """
+        with self._lock:
+            if module:
+                self.build_from_module(module)
+            else:
+                self.refresh()
+
+            return self.copy()
+
+    def copy(self) -> "Settings":
+        """
+        Copy of current settings, that is not modified when these settings are built again.
+
+        :return: Settings.
+        """
+        with self._lock:
+            s = copy.copy(self)
+
+        s._lock = threading.RLock()
+        s._resolved = {}
+        return s
+
+
+class _ThreadLocalVar(threading.local):
+    """
+    Fallback for context variables when contextvars is not available, scoped to current thread.
+    """
+
+    value = None
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        token, self.value = self.value, value
+        return token
+
+    def reset(self, token):
+        self.value = token
+
+
+_current = ContextVar("clinner_settings", default=None) if ContextVar is not None else _ThreadLocalVar()
+_process_settings = Settings()
+
+
+def get_settings() -> Settings:
+    """
+    Settings bound to current context, or process settings if there are no one.
+
+    :return: Settings.
+    """
+    return _current.get() or _process_settings
+
+
+@contextmanager
+def use_settings(s: Settings):
+    """
+    Bind settings to current context, so global settings resolve to them inside the block, e.g: while a main runs a
+    command in a thread. Blocks can be nested.
+
+    :param s: Settings.
+    """
+    if isinstance(s, SettingsProxy):
+        s = get_settings()
+
+    token = _current.set(s)
+    try:
+        yield s
+    finally:
+        _current.reset(token)
+
+
+class SettingsProxy(Settings):
+    """
+    Global settings, that resolve to the settings bound to current context or to process settings otherwise.
+    """
+
+    def __init__(self):
+        pass
+
+    def __getattribute__(self, name):
+        return getattr(get_settings(), name)
+
+    def __setattr__(self, name, value):
+        setattr(get_settings(), name, value)
+
+    def __delattr__(self, name):
+        delattr(get_settings(), name)
+
+    def __repr__(self):
+        return repr(get_settings())
 
 
-settings = Settings()
+settings = SettingsProxy()
@@ -0,0 +1,57 @@
+"""
+Command templates, tokenized once and rendered many times.
+"""
+import shlex
+from typing import Iterable, List, Tuple, Union
+
+__all__ = ["CommandTemplate", "tokenize"]
+
+
+def tokenize(value: Union[str, Iterable[str]]) -> Tuple[str, ...]:
+    """
+    Split a command into tokens. Strings are split using shell syntax while sequences are taken as already split.
+
+    :param value: Command string or sequence of tokens.
+    :return: Tuple of tokens.
+    """
+    if isinstance(value, str):
+        return tuple(shlex.split(value))
+
+    return tuple(str(token) for token in value)
+
+
+class CommandTemplate:
+    """
+    Shell command template. The template is tokenized when created, and each token can contain format fields that are
+    replaced by keyword arguments when rendering it, e.g: ``CommandTemplate("tox -e {env}").render(env="py36")``.
+    Fields are replaced inside tokens, so a value containing spaces or quotes is kept as a single argument and the
+    template is never parsed again.
+    """
+
+    __slots__ = ("tokens", "_fields")
+
+    def __init__(self, template: Union[str, Iterable[str]]):
+        """
+        Command template.
+
+        :param template: Command string or sequence of tokens.
+        """
+        self.tokens = tokenize(template)
+        self._fields = tuple(i for i, token in enumerate(self.tokens) if "{" in token or "}" in token)
+
+    def render(self, *args, **kwargs) -> List[str]:
+        """
+        Render the command.
+
+        :param args: Extra arguments appended to the command.
+        :param kwargs: Values of template fields.
+        :return: Command ready to be executed.
+        """
+        cmd = list(self.tokens)
+        for i in self._fields:
+            cmd[i] = cmd[i].format(**kwargs)
+
+        return cmd + [str(arg) for arg in args]
+
+    def __repr__(self):
+        return "CommandTemplate({!r})".format(" ".join(shlex.quote(token) for token in self.tokens))
@@ -0,0 +1,81 @@
+import hashlib
+import json
+import os
+
+import pytest
+
+from clinner.command import Step
+from clinner.run.commands import artifacts
+from clinner.run.commands.dist import dist
+
+
+@pytest.fixture
+def dist_dir(tmpdir):
+    with tmpdir.as_cwd():
+        tmpdir.join("dist", "foo-1.0.tar.gz").write("sdist", ensure=True)
+        tmpdir.join("dist", "foo-1.0-py3-none-any.whl").write("wheel", ensure=True)
+        yield tmpdir
+
+
+class TestCaseArtifacts:
+    def test_write_manifest(self, dist_dir):
+        result = artifacts.write_manifest("dist")
+
+        expected = [
+            {"name": "foo-1.0-py3-none-any.whl", "size": 5, "sha256": hashlib.sha256(b"wheel").hexdigest()},
+            {"name": "foo-1.0.tar.gz", "size": 5, "sha256": hashlib.sha256(b"sdist").hexdigest()},
+        ]
+        assert result == expected
+        assert artifacts.read_manifest("dist") == expected
+
+    def test_write_manifest_twice(self, dist_dir):
+        artifacts.write_manifest("dist")
+
+        assert [a["name"] for a in artifacts.write_manifest("dist")] == ["foo-1.0-py3-none-any.whl", "foo-1.0.tar.gz"]
+
+    def test_local_repository(self):
+        assert artifacts.local_repository("file:///srv/packages") == "/srv/packages"
+        assert artifacts.local_repository("/srv/packages") == "/srv/packages"
+        assert artifacts.local_repository("./packages") == "./packages"
+        assert artifacts.local_repository("https://upload.pypi.org/legacy/") is None
+        assert artifacts.local_repository("pypi") is None
+
+    def test_publish(self, dist_dir):
+        assert artifacts.main(["manifest", "dist"]) == 0
+
+        return_code = artifacts.main(["publish", "--repository", "file://" + str(dist_dir.join("repo")), "dist"])
+
+        assert return_code == 0
+        assert sorted(os.listdir("repo")) == ["foo-1.0-py3-none-any.whl", "foo-1.0.tar.gz", "manifest.json"]
+        assert dist_dir.join("repo", "foo-1.0.tar.gz").read() == "sdist"
+        with open(os.path.join("repo", "manifest.json")) as f:
+            assert len(json.load(f)["artifacts"]) == 2
+
+    def test_publish_modified(self, dist_dir):
+        artifacts.write_manifest("dist")
+        dist_dir.join("dist", "foo-1.0.tar.gz").write("modified")
+
+        assert artifacts.publish("dist", "repo") == 1
+        assert not dist_dir.join("repo", "foo-1.0.tar.gz").exists()
+
+
+class TestCaseDist:
+    def test_steps(self):
+        steps = dist(version="patch")
+
+        assert steps[0] == ["rm", "-rf", "dist", os.path.join(".clinner", "dist")]
+        assert steps[2] == ["bumpversion", "patch"]
+        assert all(isinstance(s, Step) and s.independent for s in steps[3:5])
+        assert [s.name for s in steps[3:5]] == ["sdist", "bdist_wheel"]
+        assert steps[5][-2:] == ["manifest", "dist"]
+        assert len(steps) == 6
+
+    def test_upload_local(self):
+        steps = dist(version="patch", upload="file:///srv/packages")
+
+        assert steps[-1][-4:] == ["publish", "--repository", "file:///srv/packages", "dist"]
+
+    def test_upload_twine(self):
+        steps = dist(version="patch", upload="pypi", dist_dir="build")
+
+        assert steps[-1] == ["twine", "upload", "--repository", "pypi", "build/*.tar.gz", "build/*.whl"]
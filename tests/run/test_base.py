@@ -1,12 +1,17 @@
 import argparse
+import json
 import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from multiprocessing import Queue
-from unittest.mock import call, patch
+from unittest.mock import MagicMock, call, patch
 
 import pytest
 
 from clinner.command import Type, command
 from clinner.exceptions import NotCommandError
+from clinner.run.injection import clear_cache, injection
 from clinner.run.main import Main
 
 
@@ -39,6 +44,106 @@ class TestCaseBaseMain:
 
         assert getattr(main, "foo", False)
 
+    @patch("clinner.run.base.CLI")
+    def test_main_inject_inherited(self, cli, main_cls):
+        class FooMixin:
+            def inject_foo(self):
+                self.foo = True
+
+        class BarMixin(FooMixin):
+            def inject_bar(self):
+                return {"BAR": 1}
+
+        class BarMain(BarMixin, Main):
+            def inject_baz(self):
+                return {"BAZ": "baz"}
+
+        main = BarMain(["foo"])
+
+        assert [m.__name__ for m in BarMain._injects] == ["inject_foo", "inject_bar", "inject_baz"]
+        assert main.foo
+        assert main.environment == {"BAR": "1", "BAZ": "baz"}
+
+    @patch("clinner.run.base.CLI")
+    def test_main_inject_cached(self, cli, main_cls):
+        calls = []
+
+        class BarMain(Main):
+            @injection(cache=True)
+            def inject_bar(self):
+                calls.append(1)
+                return {"BAR": "bar"}
+
+            @injection(cache=0.0)
+            def inject_baz(self):
+                calls.append(2)
+                return {"BAZ": "baz"}
+
+        clear_cache()
+        try:
+            BarMain(["foo"])
+            main = BarMain(["foo"])
+        finally:
+            clear_cache()
+
+        assert calls == [1, 2, 2]
+        assert main.environment == {"BAR": "bar", "BAZ": "baz"}
+
+    @patch("clinner.run.base.CLI")
+    def test_main_inject_independent(self, cli, main_cls):
+        class BarMain(Main):
+            @injection(independent=True)
+            def inject_bar(self):
+                time.sleep(0.2)
+                return {"BAR": "bar"}
+
+            @injection(independent=True)
+            def inject_baz(self):
+                time.sleep(0.2)
+                return {"BAZ": "baz"}
+
+        start = time.monotonic()
+        main = BarMain(["-q", "foo"])
+
+        assert time.monotonic() - start < 0.4
+        assert main.environment == {"BAR": "bar", "BAZ": "baz"}
+
+    @pytest.mark.parametrize("independent", [(), ("bar",), ("foo", "baz"), ("foo", "bar", "baz")])
+    @patch("clinner.run.base.CLI")
+    def test_main_inject_independent_order(self, cli, main_cls, independent):
+        class BarMain(Main):
+            @injection(independent="foo" in independent)
+            def inject_foo(self):
+                return {"FOO": "foo", "BAR": "foo", "BAZ": "foo"}
+
+            @injection(independent="bar" in independent)
+            def inject_bar(self):
+                return {"BAR": "bar", "BAZ": "bar"}
+
+            @injection(independent="baz" in independent)
+            def inject_baz(self):
+                return {"BAZ": "baz"}
+
+        main = BarMain(["-q", "foo"])
+
+        assert main.environment == {"FOO": "foo", "BAR": "bar", "BAZ": "baz"}
+
+    @patch("clinner.run.base.CLI")
+    def test_main_inject_environment_shell(self, cli, main_cls, monkeypatch):
+        monkeypatch.delenv("BAR", raising=False)
+
+        class BarMain(Main):
+            def inject_bar(self):
+                return {"BAR": "bar"}
+
+        main = BarMain(["bar"])
+        with patch("clinner.run.base.Popen") as popen_mock:
+            popen_mock.return_value.returncode = 0
+            main.run_shell(["env"])
+
+        assert "BAR" not in os.environ
+        assert popen_mock.call_args[1]["env"]["BAR"] == "bar"
+
     @patch("clinner.run.base.CLI")
     def test_main_add_arguments(self, cli, main_cls):
         args = ["-f", "3", "foo"]
@@ -125,6 +230,26 @@ class TestCaseBaseMain:
         assert "foobar" in main._commands
         assert len(main._commands) == 1
 
+    @patch("clinner.run.base.CLI")
+    def test_explicit_commands_collision(self, cli, main_cls):
+        import tests.run.conftest  # noqa
+
+        @command
+        def foobar(*args, **kwargs):
+            kwargs["q"].put(1)
+
+        class BarMain(Main):
+            commands = ("tests.run.conftest.foobar",)
+
+        args = ["foobar"]
+        main = BarMain(args)
+        queue = Queue()
+        main.run(q=queue)
+
+        assert queue.get() == 42
+
+        del command.register["foobar"]
+
     @patch("clinner.run.base.CLI")
     def test_explicit_command_wrong(self, cli, main_cls):
         with pytest.raises(ImportError):
@@ -172,3 +297,151 @@ class TestCaseBaseMain:
 
         with pytest.raises(NotCommandError):
             main.run()
+
+    @patch("clinner.run.base.CLI")
+    def test_dispatch(self, cli, main_cls):
+        main = main_cls(parse_args=False)
+
+        assert main.dispatch(["foo"]) == 42
+        assert main.dispatch(["-f", "3", "foo"]) == 42
+        assert main.foo is True
+
+    @patch("clinner.run.base.CLI")
+    def test_dispatch_inject_cache_expired(self, cli, main_cls):
+        calls = []
+
+        class BarMain(Main):
+            @staticmethod
+            @command(command_type=Type.SHELL)
+            def bar(*args, **kwargs):
+                return [["env"]]
+
+            @injection(cache=0.1)
+            def inject_token(self):
+                calls.append(1)
+                return {"TOKEN": len(calls)}
+
+        clear_cache()
+        try:
+            main = BarMain(parse_args=False)
+            with patch("clinner.run.base.Popen") as popen_mock:
+                popen_mock.return_value.returncode = 0
+                main.dispatch(["bar"])
+                main.dispatch(["bar"])
+                time.sleep(0.2)
+                main.dispatch(["bar"])
+        finally:
+            clear_cache()
+
+        assert [c[1]["env"]["TOKEN"] for c in popen_mock.call_args_list] == ["1", "1", "2"]
+
+    @patch("clinner.run.base.CLI")
+    def test_dispatch_parser_built_once(self, cli, main_cls):
+        main = main_cls(parse_args=False)
+
+        with patch.object(main_cls, "_add_arguments", wraps=main._add_arguments) as add_arguments_mock:
+            main.dispatch(["foo"])
+            main.dispatch(["foo"])
+
+        assert add_arguments_mock.call_count == 1
+
+    @patch("clinner.run.base.CLI")
+    def test_dispatch_output_options(self, cli, main_cls):
+        cli.side_effect = lambda: MagicMock()
+        main = main_cls(["foo"])
+        clis = []
+        with patch.object(main_cls, "run", autospec=True, side_effect=lambda m, **kw: clis.append(m.cli) or 0):
+            main.dispatch(["foo"])
+            main.dispatch(["-q", "foo"])
+            main.dispatch(["-vv", "--log-format", "json", "foo"])
+
+        assert clis[0] is main.cli
+        assert clis[1] is not main.cli and clis[1].disable.call_count == 1
+        assert clis[2].set_level.call_args_list == [call(logging.DEBUG)]
+        assert clis[2].set_format.call_args_list == [call("json")]
+        assert main.cli.disable.call_count == 0
+        assert main.cli.set_level.call_args_list == [call(logging.WARNING)]
+
+    @patch("clinner.run.base.CLI")
+    def test_dispatch_isolated(self, cli, main_cls):
+        main = main_cls(["-f", "1", "foo"])
+        namespaces = []
+        with patch.object(main_cls, "run_command", side_effect=lambda *a, **kw: namespaces.append(kw) or 0):
+            main.dispatch(["-f", "2", "foo"])
+            main.dispatch(["--dry-run", "foo"])
+
+        assert vars(main.args) == vars(main.parse_arguments(["-f", "1", "foo"])[0])
+        assert [(n["foo"], n["dry_run"]) for n in namespaces] == [(2, False), (None, True)]
+
+    @patch("clinner.run.base.CLI")
+    def test_dispatch_settings(self, cli, main_cls, tmpdir):
+        from clinner.settings import settings
+
+        path = tmpdir.join("settings.json")
+        path.write('{"commands": {"bar": {"timeout": 5}}}')
+        main = main_cls(["bar"])
+
+        with patch.object(main_cls, "run_timed_step", wraps=main.run_timed_step) as step_mock, patch(
+            "clinner.run.base.Popen"
+        ):
+            main.dispatch(["-s", str(path), "--dry-run", "bar"])
+
+        assert step_mock.call_args[1]["timeout"] == 5.0
+        assert settings.command("bar").timeout is None
+        assert main.dispatch(["-s", str(path), "--dry-run", "bar"]) == 0
+        assert list(main._settings_cache) == [str(path)]
+
+    @patch("clinner.run.base.CLI")
+    def test_dispatch_settings_modified(self, cli, main_cls, tmpdir):
+        path = tmpdir.join("settings.json")
+        path.write('{"commands": {"bar": {"timeout": 5}}}')
+        main = main_cls(["bar"])
+
+        with patch.object(main_cls, "run_timed_step", wraps=main.run_timed_step) as step_mock, patch(
+            "clinner.run.base.Popen"
+        ):
+            main.dispatch(["-s", str(path), "--dry-run", "bar"])
+            path.write('{"commands": {"bar": {"timeout": 10}}}')
+            os.utime(str(path), ns=(1, 1))
+            main.dispatch(["-s", str(path), "--dry-run", "bar"])
+
+        assert step_mock.call_args[1]["timeout"] == 10.0
+
+    @patch("clinner.run.base.CLI")
+    def test_dispatch_concurrently(self, cli, main_cls, tmpdir):
+        from clinner.settings import settings
+
+        paths = []
+        for i in range(4):
+            path = tmpdir.join("settings_{}.json".format(i))
+            path.write(json.dumps({"default_args": {"baz": str(i)}}))
+            paths.append(str(path))
+
+        @command
+        def baz(*args, **kwargs):
+            time.sleep(0.01)
+            return int(settings.default_args["baz"][0]) + int(args[0])
+
+        main = main_cls(parse_args=False)
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(lambda p: main.dispatch(["-s", p, "baz"]), paths * 5))
+
+        assert results == [2 * i for i in range(4)] * 5
+
+        del command.register["baz"]
+
+    @patch("clinner.run.base.CLI")
+    def test_create_concurrently(self, cli, main_cls, tmpdir):
+        paths = []
+        for i in range(2):
+            path = tmpdir.join("settings_{}.json".format(i))
+            path.write(json.dumps({"default_args": {"foo": str(i)}}))
+            paths.append(str(path))
+
+        def create(path):
+            return path, main_cls(["-s", path, "foo"])._settings.default_args["foo"]
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            results = list(executor.map(create, paths * 100))
+
+        assert all(value == (str(paths.index(path)),) for path, value in results)
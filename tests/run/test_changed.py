@@ -0,0 +1,159 @@
+import subprocess
+import sys
+
+from unittest.mock import call, patch
+
+import pytest
+
+from clinner.command import Step
+from clinner.exceptions import CommandBuildError
+from clinner.run.commands import changed
+from clinner.run.main import Main
+from clinner.template import CommandTemplate
+
+
+@pytest.fixture
+def repository(tmpdir):
+    with tmpdir.as_cwd():
+        subprocess.check_call(["git", "init", "-q"])
+        subprocess.check_call(["git", "config", "user.email", "foo@example.com"])
+        subprocess.check_call(["git", "config", "user.name", "Foo"])
+        tmpdir.join("committed.py").write("a = 1\n")
+        tmpdir.join("modified.py").write("b = 1\n")
+        tmpdir.join("README.md").write("foo\n")
+        subprocess.check_call(["git", "add", "."])
+        subprocess.check_call(["git", "commit", "-q", "-m", "Initial"])
+
+        tmpdir.join("modified.py").write("b = 2\n")
+        tmpdir.join("untracked.py").write("c = 1\n")
+        tmpdir.join("README.md").write("bar\n")
+        yield tmpdir
+
+
+class TestCaseChanged:
+    def test_changed_files(self, repository):
+        assert changed.changed_files() == ["modified.py", "untracked.py"]
+
+    def test_changed_files_wrong_ref(self, repository):
+        with pytest.raises(CommandBuildError, match="git diff failed"):
+            changed.changed_files("wrong-ref")
+
+    def test_changed_files_outside_repository(self, tmpdir):
+        with tmpdir.as_cwd(), pytest.raises(CommandBuildError):
+            changed.changed_files()
+
+    def test_changed_files_without_git(self):
+        with patch("clinner.run.commands.changed.subprocess.check_output", side_effect=FileNotFoundError("git")):
+            with pytest.raises(CommandBuildError, match="git cannot be run"):
+                changed.changed_files()
+
+    @patch("clinner.run.base.CLI")
+    def test_command_wrong_ref(self, cli, repository):
+        class FlakeMain(Main):
+            commands = ("clinner.run.commands.flake8.flake8",)
+
+        main = FlakeMain(["flake8", "--changed-since", "wrong-ref"])
+        with patch("clinner.run.base.Popen") as popen_mock:
+            return_code = main.run()
+
+        assert return_code == 1
+        assert popen_mock.call_count == 0
+        assert main.cli.print_build_error.call_args[0][0] == "flake8"
+
+    def test_clean_cache(self, repository):
+        cache = changed.CleanCache()
+        key = cache.key(["flake8"])
+
+        assert cache.dirty(key, ["modified.py", "untracked.py"]) == ["modified.py", "untracked.py"]
+
+        cache.mark(key, ["modified.py"])
+
+        assert cache.dirty(key, ["modified.py", "untracked.py"]) == ["untracked.py"]
+        assert cache.dirty(cache.key(["flake8", "--strict"]), ["modified.py"]) == ["modified.py"]
+
+        repository.join("modified.py").write("b = 3\n")
+
+        assert cache.dirty(key, ["modified.py", "untracked.py"]) == ["modified.py", "untracked.py"]
+
+    def test_clean_cache_config_files(self, repository):
+        cache = changed.CleanCache()
+        key = cache.key(["flake8", "--config=lint.cfg"])
+
+        repository.join("setup.cfg").write("[flake8]\n")
+        assert cache.key(["flake8", "--config=lint.cfg"]) != key
+
+        key = cache.key(["flake8", "--config=lint.cfg"])
+        repository.join("lint.cfg").write("[flake8]\n")
+        assert cache.key(["flake8", "--config=lint.cfg"]) != key
+
+    def test_chunk_files(self):
+        files = ["foo.py", "bar.py", "foobar.py"]
+
+        assert changed.chunk_files(files, ["tool"], limit=100) == [files]
+        assert changed.chunk_files(files, ["tool"], limit=50) == [["foo.py", "bar.py"], ["foobar.py"]]
+        assert changed.chunk_files(files, ["tool"], limit=1) == [["foo.py"], ["bar.py"], ["foobar.py"]]
+
+    def test_changed_steps(self, repository):
+        steps = changed.changed_steps(["flake8", "-v"])
+
+        assert len(steps) == 1
+        assert isinstance(steps[0], Step)
+        assert steps[0].independent
+        assert steps[0][-5:] == ["--", "flake8", "-v", "modified.py", "untracked.py"]
+
+    def test_changed_steps_paths(self, repository):
+        repository.join("foo", "bar.py").write("d = 1\n", ensure=True)
+
+        steps = changed.changed_steps(["flake8"], paths=["foo/"])
+
+        assert steps[0][-2:] == ["flake8", "foo/bar.py"]
+
+    def test_tool_steps(self, repository):
+        template = CommandTemplate("flake8")
+        repository.join("setup.cfg").write("[flake8]\n")
+
+        assert changed.tool_steps(template, [".", "-v"], {}) == [["flake8", ".", "-v"]]
+
+        steps = changed.tool_steps(template, ["--config", "setup.cfg", "."], {"changed": True}, ("--config",))
+
+        assert steps[0][-6:] == ["--", "flake8", "--config", "setup.cfg", "modified.py", "untracked.py"]
+
+    def test_tool_steps_changed_since(self, repository):
+        with patch("clinner.run.commands.changed.changed_files", return_value=[]) as changed_files_mock:
+            steps = changed.tool_steps(CommandTemplate("flake8"), [], {"changed_since": "origin/master"})
+
+        assert steps == []
+        assert changed_files_mock.call_args == call("origin/master")
+
+    def test_changed_steps_chunked(self, repository, monkeypatch):
+        wrapper = changed.changed_steps(["flake8"])[0][:-2]
+        limit = sum(changed._arg_size(a) for a in wrapper) + changed._arg_size("untracked.py")
+        monkeypatch.setattr(changed, "arg_max", lambda: limit)
+
+        steps = changed.changed_steps(["flake8"])
+
+        assert [s[-1] for s in steps] == ["modified.py", "untracked.py"]
+        assert [s[-3:-1] for s in steps] == [["--", "flake8"]] * 2
+
+    def test_run_marking(self, repository):
+        cache = changed.CleanCache()
+        key = cache.key(["flake8"])
+
+        return_code = changed.main(
+            ["run", "--key", key, "--files", "1", "--", sys.executable, "-c", "pass", "modified.py"]
+        )
+
+        assert return_code == 0
+        assert cache.dirty(key, ["modified.py", "untracked.py"]) == ["untracked.py"]
+        assert changed.changed_steps(["flake8"], cache=changed.CleanCache())[0][-1] == "untracked.py"
+
+    def test_run_marking_failed(self, repository):
+        cache = changed.CleanCache()
+        key = cache.key(["flake8"])
+
+        return_code = changed.main(
+            ["run", "--key", key, "--files", "1", "--", sys.executable, "-c", "exit(1)", "modified.py"]
+        )
+
+        assert return_code == 1
+        assert cache.dirty(key, ["modified.py"]) == ["modified.py"]
@@ -1,8 +1,11 @@
-from unittest.mock import MagicMock, call
+import argparse
+from unittest.mock import MagicMock, call, patch
 
 import pytest
 
+from clinner.command import command
 from clinner.run import DjangoCommand
+from clinner.run.main import Main
 
 
 class FooMain(MagicMock):
@@ -30,3 +33,61 @@ class TestCaseDjangoCommand:
         command.handle(foo="bar")
 
         assert command.command.run.call_args_list == expected_calls
+
+    def test_django_command_main_lazy(self):
+        with patch.object(FooDjangoCommand, "main_class") as main_mock:
+            command = FooDjangoCommand()
+
+            assert main_mock.call_count == 0
+
+            command.command
+            command.command
+
+        assert main_mock.call_count == 1
+
+
+class TestCaseDjangoCommandLazyArguments:
+    @pytest.fixture
+    def main_cls(self):
+        calls = []
+
+        def add_arguments(parser):
+            calls.append(parser)
+            parser.add_argument("--bar", type=int)
+
+        class BarMain(Main):
+            @staticmethod
+            @command(args=add_arguments, parser_opts={"help": "Lazy foo"})
+            def lazy_foo(*args, **kwargs):
+                return kwargs["bar"]
+
+        BarMain.calls = calls
+        yield BarMain
+
+        del command.register["lazy_foo"]
+
+    @patch("clinner.run.base.CLI")
+    def test_arguments_added_on_parse(self, cli, main_cls):
+        django_command = type("BarDjangoCommand", (DjangoCommand,), {"main_class": main_cls})()
+        parser = argparse.ArgumentParser()
+
+        django_command.add_arguments(parser)
+
+        assert main_cls.calls == []
+
+        args = parser.parse_args(["lazy_foo", "--bar", "3"])
+        parser.parse_args(["lazy_foo", "--bar", "4"])
+
+        assert args.bar == 3
+        assert len(main_cls.calls) == 1
+
+    @patch("clinner.run.base.CLI")
+    def test_arguments_added_on_help(self, cli, main_cls):
+        django_command = type("BarDjangoCommand", (DjangoCommand,), {"main_class": main_cls})()
+        parser = argparse.ArgumentParser()
+        django_command.add_arguments(parser)
+
+        assert "Lazy foo" in parser.format_help()
+        assert main_cls.calls == []
+        assert "--bar" in django_command.command._subparsers.choices["lazy_foo"].format_help()
+        assert len(main_cls.calls) == 1
@@ -0,0 +1,63 @@
+import os
+import sys
+
+import pytest
+
+from clinner.run.commands import fingerprint
+
+
+@pytest.fixture
+def tree(tmpdir):
+    with tmpdir.as_cwd():
+        tmpdir.join("source", "index.rst").write("foo", ensure=True)
+        tmpdir.join("source", "conf.py").write("bar", ensure=True)
+        tmpdir.join("source", ".hidden", "foo").write("foo", ensure=True)
+        yield tmpdir
+
+
+class TestCaseFingerprint:
+    def test_tree_fingerprint_stable(self, tree):
+        assert fingerprint.tree_fingerprint(["source"]) == fingerprint.tree_fingerprint(["source"])
+
+    def test_tree_fingerprint_modified(self, tree):
+        before = fingerprint.tree_fingerprint(["source"])
+        tree.join("source", "index.rst").write("foobar", ensure=True)
+
+        assert fingerprint.tree_fingerprint(["source"]) != before
+
+    def test_tree_fingerprint_added(self, tree):
+        before = fingerprint.tree_fingerprint(["source"])
+        tree.join("source", "new.rst").write("", ensure=True)
+
+        assert fingerprint.tree_fingerprint(["source"]) != before
+
+    def test_tree_fingerprint_hidden(self, tree):
+        before = fingerprint.tree_fingerprint(["source"])
+        tree.join("source", ".hidden", "bar").write("", ensure=True)
+
+        assert fingerprint.tree_fingerprint(["source"]) == before
+
+    def test_tree_fingerprint_file(self, tree):
+        assert fingerprint.tree_fingerprint(["source/conf.py"]) != fingerprint.tree_fingerprint(["source"])
+
+    def test_is_fresh_missing(self, tree):
+        assert not fingerprint.is_fresh("stamp", "foo")
+
+    def test_run_stamped(self, tree):
+        cmd = fingerprint.stamped([sys.executable, "-c", "pass"], os.path.join("build", "stamp"), "foo")
+
+        return_code = fingerprint.main(cmd[3:])
+
+        assert return_code == 0
+        assert fingerprint.is_fresh(os.path.join("build", "stamp"), "foo")
+        assert not fingerprint.is_fresh(os.path.join("build", "stamp"), "bar")
+
+    def test_run_stamped_failed(self, tree):
+        tree.join("stamp").write("foo", ensure=True)
+
+        return_code = fingerprint.main(
+            ["run", "--stamp", "stamp", "--fingerprint", "foo", "--", sys.executable, "-c", "exit(2)"]
+        )
+
+        assert return_code == 2
+        assert not fingerprint.is_fresh("stamp", "foo")
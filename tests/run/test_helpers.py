@@ -0,0 +1,37 @@
+import pytest
+
+from clinner.exceptions import CommandArgParseError
+from clinner.run.commands.helpers import COMMAND_ARGUMENT, Action, run_tool, split_args, value_options
+
+
+class TestCaseHelpers:
+    def test_value_options(self, tmpdir):
+        tmpdir.join("setup.cfg").write("")
+        options = value_options("-c", "--config")
+
+        with tmpdir.as_cwd():
+            paths, args, _ = split_args(["-c", "setup.cfg", "setup.cfg", "--config=setup.cfg"], (), options)
+
+        assert paths == ["setup.cfg"]
+        assert args == ["-c", "setup.cfg", "--config=setup.cfg"]
+
+    def test_run_tool(self):
+        calls = []
+        actions = (
+            Action("run", "Run", ((("--key",), {}), COMMAND_ARGUMENT), lambda args: calls.append(args) or 3),
+            Action("noop", "Nothing", (), lambda args: None),
+        )
+
+        assert run_tool("Tool", actions, ["run", "--key", "foo", "--", "ls", "-l"]) == 3
+        assert run_tool("Tool", actions, ["noop"]) == 0
+        assert (calls[0].key, calls[0].cmd) == ("foo", ["ls", "-l"])
+
+    def test_run_tool_wrong_arguments(self, capsys):
+        def fail(args):
+            raise CommandArgParseError("Wrong foo")
+
+        with pytest.raises(SystemExit) as exc_info:
+            run_tool("Tool", (Action("fail", "Fail", (), fail),), ["fail"])
+
+        assert exc_info.value.code == 2
+        assert "Wrong foo" in capsys.readouterr().err
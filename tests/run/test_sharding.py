@@ -0,0 +1,205 @@
+import os
+import sys
+from unittest.mock import patch
+from xml.etree import ElementTree
+
+import pytest
+
+from clinner.command import Step
+from clinner.history import DurationStore
+from clinner.run.commands import sharding
+
+
+@pytest.fixture
+def project(tmpdir):
+    with tmpdir.as_cwd():
+        for path in ("tests/test_foo.py", "tests/test_bar.py", "tests/unit/baz_test.py", "tests/conftest.py"):
+            tmpdir.join(path).ensure()
+        tmpdir.join(".tox/test_hidden.py").ensure()
+        yield tmpdir
+
+
+def junit(path, testcases, **attrs):
+    suite = ElementTree.Element("testsuite", tests=str(len(testcases)), **attrs)
+    for classname, time in testcases:
+        ElementTree.SubElement(suite, "testcase", classname=classname, name="test", time=str(time))
+    ElementTree.ElementTree(suite).write(path)
+
+
+class TestCaseSharding:
+    def test_discover_test_files(self, project):
+        files = sharding.discover_test_files(["."])
+
+        assert files == [
+            os.path.join("tests", "test_bar.py"),
+            os.path.join("tests", "test_foo.py"),
+            os.path.join("tests", "unit", "baz_test.py"),
+        ]
+
+    def test_discover_test_files_explicit_file(self, project):
+        assert sharding.discover_test_files(["tests/conftest.py"]) == [os.path.join("tests", "conftest.py")]
+
+    def test_read_junit_durations(self, project):
+        junit("report.xml", [("tests.test_foo.TestCaseFoo", 1.5), ("tests.test_foo", 0.5), ("tests.unit.baz_test", 2)])
+
+        durations = sharding.read_junit_durations("report.xml")
+
+        assert durations == {
+            os.path.join("tests", "test_foo.py"): 2.0,
+            os.path.join("tests", "unit", "baz_test.py"): 2.0,
+        }
+
+    def test_read_junit_durations_missing(self, project):
+        assert sharding.read_junit_durations("report.xml") == {}
+
+    def test_split_shards_balanced(self):
+        durations = {"a": 10.0, "b": 6.0, "c": 5.0, "d": 1.0}
+
+        shards = sharding.split_shards(["a", "b", "c", "d"], 2, durations)
+
+        assert shards == [["a", "d"], ["b", "c"]]
+
+    def test_split_shards_unknown_durations(self):
+        shards = sharding.split_shards(["a", "b", "c", "d"], 2)
+
+        assert sorted(len(s) for s in shards) == [2, 2]
+        assert sorted(f for s in shards for f in s) == ["a", "b", "c", "d"]
+
+    def test_split_shards_more_shards_than_files(self):
+        assert sharding.split_shards(["a"], 4) == [["a"]]
+
+    def test_split_args(self, project):
+        paths, options, junit_path = sharding.split_args(
+            ["-x", "tests/test_foo.py", "--junitxml", "out.xml", "-k", "foo"], ("--junitxml",)
+        )
+
+        assert paths == ["tests/test_foo.py"]
+        assert options == ["-x", "-k", "foo"]
+        assert junit_path == "out.xml"
+
+    def test_split_args_option_values(self, project):
+        project.join("setup.cfg").ensure()
+
+        paths, options, _ = sharding.split_args(
+            ["--cov", "tests", "-c", "setup.cfg", "tests/test_foo.py"], ("--junitxml",), ("-c", "--cov")
+        )
+
+        assert paths == ["tests/test_foo.py"]
+        assert options == ["--cov", "tests", "-c", "setup.cfg"]
+
+    def test_split_args_paths_separator(self, project):
+        paths, options, _ = sharding.split_args(["-x", "--", "tests/test_foo.py", "missing"], ("--junitxml",))
+
+        assert paths == ["tests/test_foo.py", "missing"]
+        assert options == ["-x"]
+
+    def test_shard_steps(self, project):
+        DurationStore().record(
+            "pytest", {os.path.join("tests", "test_foo.py"): 10.0, os.path.join("tests", "test_bar.py"): 1.0}
+        )
+
+        steps = sharding.shard_steps(
+            runner=["pytest"],
+            args=["-x", "tests", "--junitxml=out.xml"],
+            shards=2,
+            scope="pytest",
+            junit=lambda path: ["--junitxml={}".format(path)],
+            junit_options=("--junitxml",),
+        )
+
+        shards = [s for s in steps if isinstance(s, Step)]
+        assert len(shards) == 2
+        assert all(s.independent for s in shards)
+        assert shards[0][:8] == [sys.executable, "-m", "clinner.run.commands.sharding", "run", "--scope", "pytest"] + [
+            "--junit",
+            os.path.join(sharding.SHARDS_DIR, "junit-0.xml"),
+        ]
+        assert shards[0][8:13] == ["--", "env", "COVERAGE_FILE=.coverage.shard0", "pytest", "-x"]
+        assert [s[14:] for s in shards] == [
+            [os.path.join("tests", "test_foo.py")],
+            [os.path.join("tests", "test_bar.py"), os.path.join("tests", "unit", "baz_test.py")],
+        ]
+        assert steps[-2] == [sys.executable, "-m", "clinner.run.commands.sharding", "combine-coverage"]
+        assert steps[-1][3:6] == ["merge-junit", "-o", "out.xml"]
+        assert steps[-1][6:] == [shards[0][7], shards[1][7]]
+
+    def test_shard_steps_without_junit(self, project):
+        steps = sharding.shard_steps(
+            runner=["pytest"],
+            args=[],
+            shards=2,
+            scope="pytest",
+            junit=lambda path: ["--junitxml={}".format(path)],
+            junit_options=("--junitxml",),
+        )
+
+        assert steps[-1][3:] == ["combine-coverage"]
+
+    def test_suite_steps(self, project):
+        steps = sharding.suite_steps(
+            runner=["pytest"],
+            args=["-x"],
+            scope="pytest",
+            junit=lambda path: ["--junitxml={}".format(path)],
+            junit_options=("--junitxml",),
+        )
+
+        report = sharding.JUNIT_REPORT
+        assert steps == [sharding.recorded(["pytest", "-x", "--junitxml=" + report], "pytest", junit=report)]
+
+    def test_suite_steps_user_junit(self, project):
+        steps = sharding.suite_steps(
+            runner=["pytest"],
+            args=["--junitxml", "out.xml"],
+            scope="pytest",
+            junit=lambda path: ["--junitxml={}".format(path)],
+            junit_options=("--junitxml",),
+        )
+
+        assert steps == [sharding.recorded(["pytest", "--junitxml", "out.xml"], "pytest", junit="out.xml")]
+
+    def test_run_recorded_junit(self, project):
+        code = "import shutil, sys; shutil.copy('source.xml', 'reports/report.xml'); sys.exit(3)"
+        junit("source.xml", [("tests.test_foo", 1.5)])
+
+        return_code = sharding.main(
+            ["run", "--scope", "pytest", "--junit", "reports/report.xml", "--", sys.executable, "-c", code]
+        )
+
+        assert return_code == 3
+        assert DurationStore().get("pytest") == {os.path.join("tests", "test_foo.py"): 1.5}
+
+    def test_run_recorded_key(self, project):
+        return_code = sharding.main(["run", "--scope", "tox", "--key", "tox", "--", sys.executable, "-c", "pass"])
+
+        assert return_code == 0
+        assert list(DurationStore().get("tox")) == ["tox"]
+
+    def test_combine_coverage_without_data(self, project):
+        with patch("clinner.run.commands.sharding.subprocess.call") as call_mock:
+            return_code = sharding.main(["combine-coverage"])
+
+        assert return_code == 0
+        assert call_mock.call_count == 0
+
+    def test_combine_coverage(self, project):
+        project.join(".coverage.shard0").ensure()
+
+        with patch("clinner.run.commands.sharding.subprocess.call", return_value=0) as call_mock:
+            return_code = sharding.main(["combine-coverage"])
+
+        assert return_code == 0
+        assert call_mock.call_args[0][0] == ["coverage", "combine"]
+
+    def test_merge_junit(self, project):
+        junit("shard-0.xml", [("tests.test_foo", 1)], failures="1", time="1.0")
+        junit("shard-1.xml", [("tests.test_bar", 2), ("tests.test_bar", 3)], time="5.0")
+
+        sharding.main(["merge-junit", "-o", "reports/merged.xml", "shard-0.xml", "shard-1.xml", "missing.xml"])
+
+        root = ElementTree.parse("reports/merged.xml").getroot()
+        assert root.tag == "testsuites"
+        assert root.get("tests") == "3"
+        assert root.get("failures") == "1"
+        assert root.get("time") == "6.000"
+        assert len(root.findall("testsuite")) == 2
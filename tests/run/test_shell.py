@@ -0,0 +1,127 @@
+import io
+from unittest.mock import patch
+
+import pytest
+
+from clinner.command import Type, command
+from clinner.run import HealthCheckMixin
+from clinner.run.main import Main
+from clinner.run.shell import Shell
+
+
+class FooMain(Main):
+    @staticmethod
+    @command(args=((("--bar",), {"type": int}),))
+    def shell_foo(*args, **kwargs):
+        return kwargs["bar"] or 0
+
+    @staticmethod
+    @command(command_type=Type.PYTHON)
+    def shell_fail(*args, **kwargs):
+        raise ValueError
+
+
+class BarMain(HealthCheckMixin, FooMain):
+    checks = 0
+
+    def health_check(self):
+        BarMain.checks += 1
+        return True
+
+
+def run_shell(main, lines):
+    stdout = io.StringIO()
+    shell = Shell(main, stdin=io.StringIO("\n".join(lines) + "\n"), stdout=stdout)
+    shell.use_rawinput = False
+    shell.cmdloop()
+    return shell, stdout.getvalue()
+
+
+class TestCaseShell:
+    @patch("clinner.run.base.CLI")
+    def test_main_shell_without_command(self, cli):
+        main = FooMain(["--shell"])
+
+        assert main.args.shell
+        assert main.args.command is None
+
+    @patch("clinner.run.base.CLI")
+    def test_main_without_command(self, cli):
+        with pytest.raises(SystemExit):
+            FooMain([])
+
+    @patch("clinner.run.base.CLI")
+    def test_main_run_shell(self, cli):
+        main = FooMain(["--shell"])
+        with patch("clinner.run.base.BaseMain.shell", return_value=0) as shell_mock:
+            main.run()
+
+        assert shell_mock.call_count == 1
+
+    @patch("clinner.run.base.CLI")
+    def test_dispatch(self, cli):
+        main = FooMain(parse_args=False)
+
+        shell, _ = run_shell(main, ["shell_foo --bar 3", "", "exit", "shell_foo --bar 4"])
+
+        assert shell.return_code == 3
+
+    @patch("clinner.run.base.CLI")
+    def test_wrong_arguments(self, cli):
+        main = FooMain(parse_args=False)
+
+        with patch("sys.stderr"):
+            shell, _ = run_shell(main, ["shell_foo --bar foo"])
+
+        assert shell.return_code == 2
+
+    @patch("clinner.run.base.CLI")
+    def test_command_exception(self, cli):
+        main = FooMain(parse_args=False)
+
+        shell, _ = run_shell(main, ["shell_fail", 'shell_foo "bar'])
+
+        assert shell.return_code == 1
+        assert main.cli.logger.exception.call_count == 1
+        assert main.cli.logger.error.call_count == 1
+
+    @patch("clinner.run.base.CLI")
+    def test_help(self, cli):
+        main = FooMain(parse_args=False)
+
+        _, output = run_shell(main, ["help"])
+
+        assert "--shell" in output
+
+    @patch("clinner.run.base.CLI")
+    def test_nested_shell(self, cli):
+        main = FooMain(parse_args=False)
+
+        shell, _ = run_shell(main, ["shell_foo --bar 2", "--shell"])
+
+        assert shell.return_code == 1
+
+    @patch("clinner.run.base.CLI")
+    def test_complete_commands(self, cli):
+        shell = Shell(FooMain(parse_args=False))
+
+        assert shell.completenames("shell_f") == ["shell_fail", "shell_foo"]
+        assert shell.completenames("ex") == ["exit"]
+        assert shell.complete_help("shell_fa") == ["shell_fail"]
+
+    @patch("clinner.run.base.CLI")
+    def test_complete_options(self, cli):
+        shell = Shell(FooMain(parse_args=False))
+
+        assert shell.completedefault("--b", "shell_foo --b", 10, 13) == ["--bar"]
+        assert shell.completedefault("--sh", "-v --sh", 3, 7) == ["--shell"]
+        assert shell.completedefault("shell_fo", "-v shell_fo", 3, 11) == ["shell_foo"]
+
+    @patch("clinner.run.base.CLI")
+    def test_health_check_reused(self, cli):
+        main = BarMain(parse_args=False)
+
+        with patch("clinner.run.shell.Shell.cmdloop", lambda shell: [shell.default("shell_foo") for _ in range(2)]):
+            main.shell()
+
+        assert BarMain.checks == 1
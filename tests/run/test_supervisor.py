@@ -0,0 +1,141 @@
+import os
+import signal
+import sys
+import threading
+from subprocess import PIPE, Popen
+from unittest.mock import patch
+
+import pytest
+
+from clinner.command import Type, command
+from clinner.run.main import Main
+from clinner.run.supervisor import Supervisor
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "killpg"), reason="Process groups not supported")
+
+SLEEP = "import time; print('ready', flush=True); time.sleep(10)"
+IGNORE = (
+    "import signal, time; signal.signal(signal.SIGINT, signal.SIG_IGN); signal.signal(signal.SIGTERM, signal.SIG_IGN); "
+    "print('ready', flush=True); time.sleep(10)"
+)
+
+
+def start(supervisor, code, group=True):
+    p = Popen([sys.executable, "-c", code], stdout=PIPE, **supervisor.popen_kwargs(group))
+    p.stdout.readline()
+    return p
+
+
+class TestCaseSupervisor:
+    def test_interrupt(self):
+        supervisor = Supervisor(interrupt_grace=5.0)
+        p = start(supervisor, SLEEP)
+
+        with supervisor.track(p, name="sleep", group=True):
+            assert supervisor.interrupt(signal.SIGINT) == ["sleep"]
+
+        assert p.wait(timeout=5) == -signal.SIGINT
+        assert supervisor.children == []
+
+    def test_escalate(self):
+        supervisor = Supervisor(interrupt_grace=0.1, terminate_grace=0.1)
+        processes = [start(supervisor, IGNORE), start(supervisor, SLEEP)]
+
+        with supervisor.track(processes[0], name="ignore", group=True), supervisor.track(processes[1], name="sleep"):
+            assert sorted(supervisor.interrupt(signal.SIGINT)) == ["ignore", "sleep"]
+
+        assert [p.wait(timeout=5) for p in processes] == [-signal.SIGKILL, -signal.SIGINT]
+
+    def test_wait_without_reaping(self):
+        supervisor = Supervisor()
+        p = Popen([sys.executable, "-c", "pass"])
+
+        with supervisor.track(p) as child:
+            assert supervisor.wait([child], timeout=5) == []
+
+        assert p.returncode is None
+        assert p.wait() == 0
+
+    def test_wait_timeout(self):
+        supervisor = Supervisor()
+        p = start(supervisor, SLEEP)
+
+        with supervisor.track(p, group=True) as child:
+            assert supervisor.wait([child], timeout=0.1) == [child]
+            child.send_signal(signal.SIGKILL)
+
+        p.wait()
+
+    def test_handle_signals(self):
+        received = []
+        previous = signal.getsignal(signal.SIGTERM)
+
+        with Supervisor().handle_signals(received.append):
+            os.kill(os.getpid(), signal.SIGTERM)
+
+        assert received == [signal.SIGTERM]
+        assert signal.getsignal(signal.SIGTERM) is previous
+
+
+class TestCaseMainSupervisor:
+    @patch("clinner.run.base.CLI")
+    def test_forward_sigterm(self, cli):
+        @command(command_type=Type.SHELL)
+        def supervisor_foo(*args, **kwargs):
+            return [[sys.executable, "-c", "import time; time.sleep(10)"]]
+
+        timer = threading.Timer(0.5, lambda: os.kill(os.getpid(), signal.SIGTERM))
+        timer.start()
+        main = Main(["supervisor_foo"])
+        return_code = main.run()
+
+        assert return_code == 128 + signal.SIGTERM
+        assert main.cli.print_interrupted.call_args[0][0] == [" ".join(supervisor_foo()[0])]
+
+        del command.register["supervisor_foo"]
+
+    @patch("clinner.run.base.CLI")
+    def test_forward_sigterm_keep_going(self, cli):
+        @command(command_type=Type.SHELL)
+        def supervisor_foo(*args, **kwargs):
+            return [[sys.executable, "-c", "import time; time.sleep(10)"]] * 3
+
+        timer = threading.Timer(0.5, lambda: os.kill(os.getpid(), signal.SIGTERM))
+        timer.start()
+        main = Main(["--keep-going", "supervisor_foo"])
+        return_code = main.run()
+
+        assert return_code == 128 + signal.SIGTERM
+        assert [r.return_code for r in main.cli.print_report.call_args[0][0]] == [-signal.SIGTERM]
+
+        del command.register["supervisor_foo"]
+
+    @patch("clinner.run.base.CLI")
+    def test_interrupt_concurrent_steps(self, cli):
+        main = Main(parse_args=False)
+        main.supervisor.interrupt_grace = 5.0
+
+        def interrupted(futures):
+            while len(main.supervisor.children) < 2:
+                threading.Event().wait(0.01)
+            raise KeyboardInterrupt
+
+        steps = [[sys.executable, "-c", "import time; time.sleep(10)"]] * 2
+        with patch("clinner.run.base.as_completed", side_effect=interrupted):
+            results = main.run_concurrent_steps(steps, Type.SHELL, jobs=2)
+
+        # Interpreters may be interrupted while starting, exiting with 1 instead of SIGINT
+        assert all(r.return_code in (1, -signal.SIGINT) for r in results)
+        assert len(main.cli.print_interrupted.call_args[0][0]) == 2
+
+    @patch("clinner.run.base.CLI")
+    def test_interrupted_concurrent_steps_not_started(self, cli):
+        main = Main(parse_args=False)
+        main.interrupted = signal.SIGINT
+
+        steps = [[sys.executable, "-c", "pass"]] * 2
+        with patch("clinner.run.base.Popen") as popen_mock:
+            results = main.run_concurrent_steps(steps, Type.SHELL, jobs=2)
+
+        assert popen_mock.call_count == 0
+        assert [r.return_code for r in results] == [128 + signal.SIGINT] * 2
@@ -0,0 +1,55 @@
+import subprocess
+from unittest.mock import patch
+
+import pytest
+
+from clinner.command import Step
+from clinner.history import DurationStore
+from clinner.run.commands.tox import _explicit_envs, tox
+
+
+@pytest.fixture(autouse=True)
+def history(tmpdir, monkeypatch):
+    monkeypatch.setenv("CLINNER_HISTORY", str(tmpdir.join("history.db")))
+
+
+class TestCaseTox:
+    @pytest.mark.parametrize(
+        "args,expected",
+        [([], False), (["-r"], False), (["-e", "py36"], True), (["-epy36"], True), (["--env=py36"], True)],
+    )
+    def test_explicit_envs(self, args, expected):
+        assert _explicit_envs(args) is expected
+
+    def test_envs_concurrently(self):
+        DurationStore().record("tox", {"py36": 1.0, "py37": 10.0})
+
+        with patch("clinner.run.commands.tox.subprocess.check_output", return_value="py36\npy37\n") as check_mock:
+            steps = tox("-c", "other.ini", "--", "-x")
+
+        assert check_mock.call_args[0][0] == ["tox", "-l", "-c", "other.ini"]
+        assert all(isinstance(s, Step) and s.independent for s in steps)
+        assert [s.name for s in steps] == ["tox -e py37 -c other.ini -- -x", "tox -e py36 -c other.ini -- -x"]
+
+    @pytest.mark.parametrize("error", [FileNotFoundError(), subprocess.CalledProcessError(1, "tox")])
+    def test_envs_cannot_be_listed(self, error):
+        with patch("clinner.run.commands.tox.subprocess.check_output", side_effect=error):
+            steps = tox()
+
+        assert len(steps) == 1
+        assert steps[0][-2:] == ["--", "tox"]
+
+    @pytest.mark.parametrize("kwargs", [{"dry_run": True}, {"plan": True}, {"step_jobs": 1}])
+    def test_envs_not_listed(self, kwargs):
+        with patch("clinner.run.commands.tox.subprocess.check_output") as check_mock:
+            steps = tox(**kwargs)
+
+        assert check_mock.call_count == 0
+        assert steps[0][-2:] == ["--", "tox"]
+
+    def test_explicit_env(self):
+        with patch("clinner.run.commands.tox.subprocess.check_output") as check_mock:
+            steps = tox("-e", "py36")
+
+        assert check_mock.call_count == 0
+        assert steps[0][-3:] == ["tox", "-e", "py36"]
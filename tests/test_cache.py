@@ -0,0 +1,130 @@
+import time
+
+import pytest
+
+from clinner.cache import MISSING, Cache, ResultStore, file_digest
+
+
+class TestCaseCache:
+    def test_build(self):
+        assert Cache.build(None) is None
+        assert Cache.build(False) is None
+        assert Cache.build(True).inputs == ()
+        assert Cache.build(["*.json"]).inputs == ("*.json",)
+        assert Cache.build({"inputs": ["a"], "outputs": ["b"]}).outputs == ("b",)
+
+        cache = Cache()
+        assert Cache.build(cache) is cache
+
+    def test_build_wrong(self):
+        with pytest.raises(TypeError):
+            Cache.build(3)
+
+    def test_key_arguments(self):
+        cache = Cache()
+
+        assert cache.key("foo", ["a"], {"b": 1, "c": 2}) == cache.key("foo", ["a"], {"c": 2, "b": 1})
+        assert cache.key("foo", ["a"], {"b": 1}) != cache.key("foo", ["a"], {"b": 2})
+        assert cache.key("foo", ["a"], {}) != cache.key("bar", ["a"], {})
+
+    def test_key_inputs(self, tmpdir):
+        tmpdir.join("schemas", "a.json").write("{}", ensure=True)
+        cache = Cache(inputs=[str(tmpdir.join("schemas"))])
+        key = cache.key("foo", [], {})
+
+        assert cache.key("foo", [], {}) == key
+
+        tmpdir.join("schemas", "a.json").write('{"a": 1}')
+        changed = cache.key("foo", [], {})
+        tmpdir.join("schemas", "b.json").write("{}")
+
+        assert len({key, changed, cache.key("foo", [], {})}) == 3
+
+    def test_key_environment(self, monkeypatch):
+        cache = Cache(env=["FOO"])
+        monkeypatch.setenv("FOO", "1")
+        monkeypatch.setenv("BAR", "1")
+        key = cache.key("foo", [], {})
+        monkeypatch.setenv("BAR", "2")
+
+        assert cache.key("foo", [], {}) == key
+
+        monkeypatch.setenv("FOO", "2")
+
+        assert cache.key("foo", [], {}) != key
+
+    def test_output_files(self, tmpdir):
+        tmpdir.join("gen", "a.py").write("", ensure=True)
+        tmpdir.join("gen", "sub", "b.py").write("", ensure=True)
+
+        files = Cache(outputs=[str(tmpdir.join("gen")), str(tmpdir.join("missing"))]).output_files()
+
+        assert files == [str(tmpdir.join("gen", "a.py")), str(tmpdir.join("gen", "sub", "b.py"))]
+
+
+class TestCaseResultStore:
+    @pytest.fixture
+    def store(self, tmpdir):
+        return ResultStore(path=str(tmpdir.join("cache")))
+
+    def test_path_from_environ(self, monkeypatch):
+        monkeypatch.setenv("CLINNER_CACHE", "foo")
+
+        assert ResultStore().path == "foo"
+
+    def test_put_get(self, store):
+        assert store.get("abc") is MISSING
+
+        assert store.put("abc", {"a": [1, 2]})
+        assert store.get("abc") == {"a": [1, 2]}
+
+    def test_put_not_serializable(self, store):
+        assert store.put("abc", lambda: None) is False
+        assert store.get("abc") is MISSING
+
+    def test_get_not_json(self, store, tmpdir):
+        tmpdir.join("cache", "ab", "abc").write(b"\x80\x04K\x01.", mode="wb", ensure=True)
+
+        assert store.get("abc") is MISSING
+
+    def test_evict_least_recently_used(self, store):
+        store.max_size = 300
+        store.put("aa", "x" * 100)
+        time.sleep(0.01)
+        store.put("bb", "x" * 100)
+        time.sleep(0.01)
+        store.get("aa")
+        time.sleep(0.01)
+        store.put("cc", "x" * 100)
+
+        assert store.get("bb") is MISSING
+        assert store.get("aa") == "x" * 100
+        assert store.get("cc") == "x" * 100
+
+    def test_clear(self, store):
+        store.put("abc", 1)
+        store.clear()
+
+        assert store.get("abc") is MISSING
+
+    def test_put_restore_files(self, store, tmpdir):
+        output = tmpdir.join("gen", "out.txt")
+        output.write("foo", ensure=True)
+        tmpdir.join("gen", "copy.txt").write("foo")
+
+        assert store.put("abc", 0, files=[str(output), str(tmpdir.join("gen", "copy.txt"))])
+        assert len(list(tmpdir.join("cache").visit("*", lambda p: p.check(file=1)))) == 2
+
+        tmpdir.join("gen").remove()
+
+        assert store.get("abc") == 0
+        assert output.read() == "foo"
+        assert store.get("missing") is MISSING
+
+    def test_restore_evicted_files(self, store, tmpdir):
+        output = tmpdir.join("out.txt")
+        output.write("foo")
+        store.put("abc", None, files=[str(output)])
+        tmpdir.join("cache", file_digest(str(output))[:2]).remove()
+
+        assert store.get("abc") is MISSING
@@ -1,10 +1,12 @@
+import json
 import logging
 from unittest.mock import MagicMock, call, patch
 
 import pytest
 
-from clinner.cli import CLI
+from clinner.cli import CLI, JSONFormatter
 from clinner.command import Type, command
+from clinner.run.base import StepResult
 
 
 class TestCaseCLI:
@@ -15,18 +17,94 @@ class TestCaseCLI:
         return cli
 
     def test_init_with_colorlog(self):
-        with patch("clinner.cli._colorlog", True), patch("colorlog.StreamHandler") as handler_mock:
+        with patch.dict("clinner.cli._handlers", clear=True), patch("clinner.cli.logging.getLogger"), patch(
+            "clinner.cli._colorlog", True
+        ), patch("colorlog.StreamHandler") as handler_mock:
+            CLI()
             CLI()
 
             assert handler_mock.call_count == 1
             assert handler_mock.return_value.setFormatter.call_count == 1
 
     def test_init_without_colorlog(self):
-        with patch("clinner.cli._colorlog", False), patch("clinner.cli.logging.StreamHandler") as handler_mock:
+        with patch.dict("clinner.cli._handlers", clear=True), patch("clinner.cli.logging.getLogger"), patch(
+            "clinner.cli._colorlog", False
+        ), patch("clinner.cli.logging.StreamHandler") as handler_mock:
+            CLI()
             CLI()
 
             assert handler_mock.call_count == 1
 
+    def test_handler_shared(self):
+        first, second = CLI(), CLI()
+
+        assert first.handler is second.handler
+        assert logging.getLogger("cli").handlers.count(first.handler) == 1
+
+    def test_instances_isolated(self):
+        first, second = CLI(level=logging.DEBUG), CLI(level=logging.DEBUG)
+        records = []
+        with patch.object(first.handler, "emit", side_effect=records.append):
+            second.set_level(logging.ERROR)
+            second.logger.info("second")
+            first.logger.info("first")
+            first.disable()
+            first.logger.info("disabled")
+
+        assert [r.getMessage() for r in records] == ["first"]
+        assert first.is_enabled_for(logging.INFO) is False
+        assert second.is_enabled_for(logging.ERROR) is True
+
+    def test_set_format_json(self):
+        cli = CLI()
+        try:
+            cli.set_format("json")
+
+            assert isinstance(cli.handler, logging.handlers.QueueHandler)
+            assert cli.listener is not None
+            assert isinstance(cli.listener.handlers[0].formatter, JSONFormatter)
+        finally:
+            cli.close()
+            cli.disable()
+
+        assert cli.listener is None
+
+    def test_set_format_text(self):
+        cli = CLI()
+        handler = cli.handler
+        cli.set_format("text")
+        cli.disable()
+
+        assert cli.handler is handler
+        assert cli.listener is None
+
+    def test_set_format_wrong(self, cli):
+        with pytest.raises(ValueError):
+            cli.set_format("foo")
+
+    def test_print_step(self, cli):
+        cli.print_step("ls -la", Type.SHELL)
+        assert cli.logger.log.call_args_list == [
+            call(
+                logging.INFO,
+                "[%s] %s",
+                "shell",
+                "ls -la",
+                extra={"event": "step", "data": {"step": "ls -la", "type": "shell"}},
+            )
+        ]
+
+    def test_print_retry(self, cli):
+        cli.print_retry("return code 1", 1, 3, 0.5)
+        level, *_ = cli.logger.log.call_args[0]
+        assert level == logging.WARNING
+        assert cli.logger.log.call_args[1]["extra"]["data"] == {
+            "reason": "return code 1",
+            "attempt": 1,
+            "attempts": 3,
+            "delay": 0.5,
+        }
+
     def test_disable(self, cli):
         cli.disable()
         assert cli.logger.removeHandler.call_count == 1
@@ -41,32 +119,97 @@ class TestCaseCLI:
 
     def test_print_return_ok(self, cli):
         cli.print_return(0)
-        expected_calls = [call(logging.DEBUG, "Return code: %d", 0)]
+        expected_calls = [
+            call(
+                logging.DEBUG,
+                "Return code: %d",
+                0,
+                extra={"event": "return", "data": {"return_code": 0, "duration": None}},
+            )
+        ]
         assert cli.logger.log.call_args_list == expected_calls
 
     def test_print_return_none(self, cli):
         cli.print_return(None)
-        expected_calls = [call(logging.DEBUG, "Return code: %d", 0)]
+        expected_calls = [
+            call(
+                logging.DEBUG,
+                "Return code: %d",
+                0,
+                extra={"event": "return", "data": {"return_code": 0, "duration": None}},
+            )
+        ]
         assert cli.logger.log.call_args_list == expected_calls
 
     def test_print_return_error(self, cli):
-        cli.print_return(1)
-        expected_calls = [call(logging.ERROR, "Return code: %d", 1)]
+        cli.print_return(1, 0.5)
+        expected_calls = [
+            call(
+                logging.ERROR,
+                "Return code: %d",
+                1,
+                extra={"event": "return", "data": {"return_code": 1, "duration": 0.5}},
+            )
+        ]
         assert cli.logger.log.call_args_list == expected_calls
 
     def test_print_header(self, cli):
         cli.print_header(command="foobar", foo=True, bar=1)
-        command_msg = cli.logger.info.call_args[0][0]
+        (header_level, command_msg), header_kwargs = cli.logger.log.call_args_list[0]
+        assert header_level == logging.INFO
         assert "foobar" in command_msg
-        args_msg = cli.logger.debug.call_args[0][0]
+        assert header_kwargs["extra"]["data"] == {"command": "foobar"}
+        (args_level, args_msg), args_kwargs = cli.logger.log.call_args_list[1]
+        assert args_level == logging.DEBUG
         assert "foo: True" in args_msg
         assert "bar: 1" in args_msg
+        assert args_kwargs["extra"]["data"] == {"arguments": {"bar": 1, "foo": True}}
+
+    def test_print_header_without_arguments(self, cli):
+        cli.print_header(command="foobar")
+        assert cli.logger.log.call_args[1]["extra"]["data"] == {"arguments": {}}
+
+    def test_print_header_disabled(self, cli):
+        cli.logger.isEnabledFor.return_value = False
+        cli.print_header(command="foobar", foo=True, bar=1)
+        assert cli.logger.log.call_count == 0
+
+    def test_print_header_debug_disabled(self, cli):
+        cli.logger.isEnabledFor.side_effect = lambda level: level >= logging.INFO
+        with patch("clinner.cli.OrderedDict") as ordered_dict_mock:
+            cli.print_header(command="foobar", foo=True, bar=1)
+
+        assert cli.logger.log.call_count == 1
+        assert ordered_dict_mock.call_count == 0
+
+    def test_print_header_without_handlers(self, cli):
+        cli.logger.handlers = []
+        cli.print_header(command="foobar", foo=True, bar=1)
+        assert cli.logger.log.call_count == 0
+
+    def test_print_commands_list_disabled(self, cli):
+        cli.logger.isEnabledFor.return_value = False
+        commands = MagicMock()
+        cli.print_commands_list(commands=commands, commands_type=Type.SHELL)
+        assert cli.logger.log.call_count == 0
+        assert commands.__getitem__.call_count == 0
+
+    def test_print_commands_list_truncated(self, cli):
+        cli.MAX_COMMANDS = 2
+        cli.print_commands_list(commands=[["foo"], ["bar"], ["foobar"], ["barfoo"]], commands_type=Type.SHELL)
+        msg = cli.logger.log.call_args[0][1]
+        assert "[shell] bar" in msg
+        assert "foobar" not in msg
+        assert "... 2 more commands" in msg
+        assert cli.logger.log.call_args[1]["extra"]["data"]["commands"] == ["foo", "bar"]
+        assert cli.logger.log.call_args[1]["extra"]["data"]["total"] == 4
 
     def test_print_commands_list_shell(self, cli):
         cli.print_commands_list(commands=[["ls", "-la"], ["echo", "foo"]], commands_type=Type.SHELL)
-        msg = cli.logger.debug.call_args[0][0]
+        msg = cli.logger.log.call_args[0][1]
         assert "[shell] ls -la" in msg
         assert "[shell] echo foo" in msg
+        assert cli.logger.log.call_args[1]["extra"]["data"]["commands"] == ["ls -la", "echo foo"]
 
     def test_print_commands_list_python(self, cli):
         @command
@@ -74,5 +217,58 @@ class TestCaseCLI:
             pass
 
         cli.print_commands_list(commands=[test_print_commands], commands_type=Type.PYTHON)
-        msg = cli.logger.debug.call_args[0][0]
+        msg = cli.logger.log.call_args[0][1]
         assert "[python] tests.test_cli.TestCaseCLI.test_print_commands_list_python.<locals>.test_print_commands" in msg
+
+    def test_print_report(self, cli):
+        results = [
+            StepResult(step="foo", return_code=0, duration=1.0, output=["foo output\n"]),
+            StepResult(step="bar", return_code=2, duration=0.5, output=["bar output\n"]),
+        ]
+        cli.print_report(results)
+        level, msg = cli.logger.log.call_args[0]
+        assert level == logging.ERROR
+        assert cli.logger.log.call_args[1]["extra"]["data"]["failed"] == 1
+        assert "[ok] 1.00s foo" in msg
+        assert "foo output" not in msg
+        assert "[failed: 2] 0.50s bar" in msg
+        assert "   | bar output" in msg
+        assert "2 steps, 1 failed" in msg
+
+    def test_print_report_ok(self, cli):
+        cli.print_report([StepResult(step="foo", return_code=None, duration=1.0)])
+        level, msg = cli.logger.log.call_args[0]
+        assert level == logging.INFO
+        assert "1 steps, 0 failed" in msg
+
+
+class TestCaseJSONFormatter:
+    def test_format(self):
+        record = logging.LogRecord("cli", logging.INFO, __file__, 1, "Return code: %d", (1,), None)
+        record.event = "return"
+        record.data = {"return_code": 1, "duration": 0.5}
+
+        event = json.loads(JSONFormatter().format(record))
+
+        assert event["level"] == "INFO"
+        assert event["event"] == "return"
+        assert event["message"] == "Return code: 1"
+        assert event["return_code"] == 1
+        assert event["duration"] == 0.5
+
+    def test_format_plain_record(self):
+        record = logging.LogRecord("cli", logging.WARNING, __file__, 1, "foo", (), None)
+
+        event = json.loads(JSONFormatter().format(record))
+
+        assert event["event"] == "message"
+        assert event["message"] == "foo"
+
+    def test_format_not_serializable(self):
+        record = logging.LogRecord("cli", logging.DEBUG, __file__, 1, "foo", (), None)
+        record.event = "arguments"
+        record.data = {"arguments": {"foo": object}}
+
+        event = json.loads(JSONFormatter().format(record))
+
+        assert event["arguments"] == {"foo": str(object)}
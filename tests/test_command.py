@@ -1,11 +1,27 @@
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 from multiprocessing import Queue
-from unittest.mock import patch
+from unittest.mock import MagicMock, call, patch
 
 import pytest
 
-from clinner.command import Type, command
+from clinner.command import Step, Type, command
 from clinner.exceptions import CommandArgParseError, CommandTypeError, WrongCommandError
+from clinner.history import DurationStore
+from clinner.retry import Retry
 from clinner.run.main import Main
+from clinner.settings import settings
+
+
+def process(returncode=0, stdout=None):
+    """
+    Mock of a Popen process whose return code is set after waiting for it.
+    """
+    p = MagicMock(returncode=None, stdout=stdout or [])
+    p.wait.side_effect = lambda: setattr(p, "returncode", returncode)
+    return p
 
 
 class TestCaseCommandRegister:
@@ -26,6 +42,124 @@ class TestCaseCommandRegister:
         with pytest.raises(WrongCommandError):
             command.register["wrong_command"]
 
+    def test_qualified_name(self):
+        spec = command.register["foo"]
+
+        qualified_name = "tests.test_command.TestCaseCommandRegister.create_command.<locals>.foo"
+        assert spec.qualified_name == qualified_name
+        assert command.register[qualified_name] is spec
+        assert qualified_name in command.register
+
+    def test_qualified_name_methods(self):
+        class A:
+            @staticmethod
+            @command
+            def run(*args, **kwargs):
+                return "a"
+
+        class B:
+            @staticmethod
+            @command
+            def run(*args, **kwargs):
+                return "b"
+
+        names = [s.qualified_name for s in command.register.by_module("tests.test_command") if s.name == "run"]
+
+        assert len(names) == 2
+        assert [command.register[n].callable() for n in names] == ["a", "b"]
+
+        del command.register["run"]
+        del command.register["run"]
+
+        assert "run" not in command.register
+
+    def test_spec(self):
+        spec = command.register["foo"]
+
+        assert spec.name == "foo"
+        assert spec.module == "tests.test_command"
+        assert spec.type == Type.PYTHON
+        assert spec["type"] == Type.PYTHON
+        assert spec.callable() == 42
+
+    def test_spec_wrong_key(self):
+        with pytest.raises(KeyError):
+            command.register["foo"]["wrong_key"]
+
+    def test_spec_immutable(self):
+        spec = command.register["foo"]
+
+        with pytest.raises(AttributeError):
+            spec.type = Type.SHELL
+
+        with pytest.raises(AttributeError):
+            del spec.type
+
+        with pytest.raises(TypeError):
+            spec.parser["add_help"] = False
+
+    def test_spec_slots(self):
+        assert not hasattr(command.register["foo"], "__dict__")
+
+    def test_alias_collision(self):
+        spec = command.register["foo"]
+
+        def foo(*args, **kwargs):
+            pass
+
+        foo.__module__ = "tests.other"
+        command.register.register(foo, Type.SHELL, (), {})
+
+        assert command.register["foo"].module == "tests.other"
+        assert command.register[spec.qualified_name] is spec
+
+        del command.register["foo"]
+
+        assert command.register["foo"] is spec
+        assert "tests.other.{}".format(foo.__qualname__) not in command.register
+
+    def test_index_by_type(self):
+        @command(command_type=Type.SHELL)
+        def bar(*args, **kwargs):
+            pass
+
+        qualified_name = command.register["bar"].qualified_name
+        assert qualified_name in [s.qualified_name for s in command.register.by_type(Type.SHELL)]
+        assert qualified_name not in [s.qualified_name for s in command.register.by_type(Type.PYTHON)]
+
+        del command.register["bar"]
+
+        assert qualified_name not in [s.qualified_name for s in command.register.by_type(Type.SHELL)]
+
+    def test_index_by_tag(self):
+        @command(tags=("lint", "ci"))
+        def bar(*args, **kwargs):
+            pass
+
+        assert [s.name for s in command.register.by_tag("lint")] == ["bar"]
+        assert [s.name for s in command.register.by_tag("ci")] == ["bar"]
+        assert command.register.by_tag("wrong_tag") == []
+
+        del command.register["bar"]
+
+        assert command.register.by_tag("lint") == []
+
+    def test_index_by_module(self):
+        assert "foo" in [s.name for s in command.register.by_module("tests.test_command")]
+
+    def test_register_concurrently(self):
+        def register(i):
+            spec = command.register.register(lambda: None, Type.PYTHON, (), {}, tags=("concurrent",))
+            return spec.qualified_name, [name for name, _ in command.register.items()]
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(register, range(50)))
+
+        assert all("foo" in names for _, names in results)
+        assert len(command.register.by_tag("concurrent")) == 1
+
+        del command.register["<lambda>"]
+
 
 class TestCaseCommand:
     @patch("clinner.run.base.CLI")
@@ -70,6 +204,20 @@ class TestCaseCommand:
 
         del command.register["foo"]
 
+    @patch("clinner.run.base.CLI")
+    def test_command_python_async_thread(self, cli):
+        @command(command_type=Type.PYTHON)
+        async def foo(*args, **kwargs):
+            return 42
+
+        main = Main(["foo"])
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            return_code = executor.submit(main.run).result()
+
+        assert return_code == 42
+
+        del command.register["foo"]
+
     @patch("clinner.run.base.CLI")
     def test_command_with_args(self, cli):
         @command(command_type=Type.PYTHON, args=((("-b", "--bar"),),))  # args
@@ -206,3 +354,488 @@ class TestCaseCommand:
             Main(args).run(args)
 
         del command.register["foo"]
+
+    @patch("clinner.run.base.time.sleep")
+    @patch("clinner.run.base.CLI")
+    def test_command_shell_retry(self, cli, sleep):
+        @command(command_type=Type.SHELL, retry=Retry(attempts=3, jitter=False))
+        def foo(*args, **kwargs):
+            return [["foo"]]
+
+        args = ["foo"]
+        main = Main(args)
+        with patch("clinner.run.base.Popen") as popen_mock:
+            popen_mock.return_value.returncode = 1
+            return_code = main.run()
+
+        assert return_code == 1
+        assert popen_mock.call_count == 3
+        assert sleep.call_count == 2
+        assert main.cli.print_retry.call_count == 2
+
+        del command.register["foo"]
+
+    @patch("clinner.run.base.time.sleep")
+    @patch("clinner.run.base.CLI")
+    def test_command_shell_retry_code_not_retried(self, cli, sleep):
+        @command(command_type=Type.SHELL, retry=Retry(attempts=3, codes=(2,)))
+        def foo(*args, **kwargs):
+            return [["foo"]]
+
+        args = ["foo"]
+        main = Main(args)
+        with patch("clinner.run.base.Popen") as popen_mock:
+            popen_mock.return_value.returncode = 1
+            main.run()
+
+        assert popen_mock.call_count == 1
+        assert sleep.call_count == 0
+
+        del command.register["foo"]
+
+    @patch("clinner.run.base.time.sleep")
+    @patch("clinner.run.base.CLI")
+    def test_command_shell_step_retry(self, cli, sleep):
+        @command(command_type=Type.SHELL)
+        def foo(*args, **kwargs):
+            return [["foo"], Step(["bar"], retry=2)]
+
+        args = ["foo"]
+        main = Main(args)
+        with patch("clinner.run.base.Popen") as popen_mock:
+            popen_mock.side_effect = [MagicMock(returncode=0), MagicMock(returncode=1), MagicMock(returncode=1)]
+            return_code = main.run()
+
+        assert return_code == 1
+        assert popen_mock.call_count == 3
+        assert popen_mock.call_args_list[2][1]["args"] == ["bar"]
+
+        del command.register["foo"]
+
+    @patch("clinner.run.base.time.sleep")
+    @patch("clinner.run.base.CLI")
+    def test_command_python_retry_exception(self, cli, sleep):
+        calls = []
+
+        @command(retry=Retry(attempts=3, exceptions=(ConnectionError,)))
+        def foo(*args, **kwargs):
+            calls.append(1)
+            if len(calls) < 3:
+                raise ConnectionError
+            return 0
+
+        args = ["foo"]
+        return_code = Main(args).run()
+
+        assert return_code == 0
+        assert len(calls) == 3
+
+        del command.register["foo"]
+
+    @patch("clinner.run.base.time.sleep")
+    @patch("clinner.run.base.CLI")
+    def test_command_python_retry_exception_exceeded(self, cli, sleep):
+        @command(retry=Retry(attempts=2, exceptions=(ConnectionError,)))
+        def foo(*args, **kwargs):
+            raise ConnectionError
+
+        args = ["foo"]
+        with pytest.raises(ConnectionError):
+            Main(args).run()
+
+        assert sleep.call_count == 1
+
+        del command.register["foo"]
+
+    @patch("clinner.run.base.CLI")
+    def test_command_keep_going(self, cli):
+        @command(command_type=Type.SHELL)
+        def foo(*args, **kwargs):
+            return [["foo"], ["bar"], ["foobar"]]
+
+        args = ["--keep-going", "foo"]
+        main = Main(args)
+        with patch("clinner.run.base.Popen") as popen_mock:
+            popen_mock.side_effect = [process(0), process(2), process(3)]
+            return_code = main.run()
+
+        assert return_code == 2
+        assert popen_mock.call_count == 3
+        assert main.cli.print_report.call_count == 1
+        results = main.cli.print_report.call_args[0][0]
+        assert [r.return_code for r in results] == [0, 2, 3]
+        assert [r.step for r in results] == ["foo", "bar", "foobar"]
+
+        del command.register["foo"]
+
+    @patch("clinner.run.base.CLI")
+    def test_command_keep_going_output_tail(self, cli):
+        @command(command_type=Type.SHELL)
+        def foo(*args, **kwargs):
+            return [["foo"]]
+
+        args = ["--keep-going", "foo"]
+        main = Main(args)
+        main.output_tail = 2
+        with patch("clinner.run.base.Popen") as popen_mock, patch("clinner.run.base.sys.stdout") as stdout_mock:
+            popen_mock.return_value = process(1, [b"foo\n", b"bar\n", b"foobar\n"])
+            main.run()
+
+        results = main.cli.print_report.call_args[0][0]
+        assert results[0].output == ["bar\n", "foobar\n"]
+        assert stdout_mock.write.call_count == 3
+
+        del command.register["foo"]
+
+    @patch("clinner.run.base.CLI")
+    def test_command_keep_going_python_exception(self, cli):
+        @command
+        def foo(*args, **kwargs):
+            raise ValueError("foo")
+
+        args = ["--keep-going", "foo"]
+        main = Main(args)
+        return_code = main.run()
+
+        assert return_code == 1
+        results = main.cli.print_report.call_args[0][0]
+        assert results[0].error == "ValueError('foo')"
+
+        del command.register["foo"]
+
+    @patch("clinner.run.base.CLI")
+    def test_command_independent_steps(self, cli):
+        @command(command_type=Type.SHELL)
+        def foo(*args, **kwargs):
+            return [["foo"], Step(["bar"], independent=True), Step(["foobar"], independent=True), ["barfoo"]]
+
+        args = ["foo"]
+        main = Main(args)
+        with patch("clinner.run.base.Popen") as popen_mock, patch("clinner.run.base.sys.stdout") as stdout_mock:
+            popen_mock.side_effect = lambda **kwargs: process(0, [b"output\n"])
+            return_code = main.run()
+
+        assert return_code == 0
+        assert popen_mock.call_count == 4
+        assert popen_mock.call_args_list[0][1]["args"] == ["foo"]
+        assert {tuple(c[1]["args"]) for c in popen_mock.call_args_list[1:3]} == {("bar",), ("foobar",)}
+        assert popen_mock.call_args_list[3][1]["args"] == ["barfoo"]
+        assert stdout_mock.write.call_args_list == [call("output\n")] * 2
+        results = main.cli.print_report.call_args[0][0]
+        assert [r.step for r in results] == ["foo", "bar", "foobar", "barfoo"]
+
+        del command.register["foo"]
+
+    @patch("clinner.run.base.CLI")
+    def test_command_independent_steps_failing(self, cli):
+        @command(command_type=Type.SHELL)
+        def foo(*args, **kwargs):
+            return [Step(["foo"], independent=True), Step(["bar"], independent=True), ["foobar"]]
+
+        args = ["foo"]
+        main = Main(args)
+        with patch("clinner.run.base.Popen") as popen_mock:
+            popen_mock.side_effect = lambda args, **kwargs: process(int(args == ["bar"]))
+            return_code = main.run()
+
+        assert return_code == 1
+        assert popen_mock.call_count == 2
+
+        del command.register["foo"]
+
+    @patch("clinner.run.base.CLI")
+    def test_command_independent_steps_jobs(self, cli):
+        @command(command_type=Type.SHELL)
+        def foo(*args, **kwargs):
+            return [Step(["foo"], independent=True), Step(["bar"], independent=True)]
+
+        args = ["--jobs", "1", "foo"]
+        main = Main(args)
+        with patch("clinner.run.base.Popen") as popen_mock, patch(
+            "clinner.run.base.ThreadPoolExecutor", wraps=ThreadPoolExecutor
+        ) as executor_mock:
+            popen_mock.side_effect = lambda **kwargs: process(0)
+            main.run()
+
+        assert executor_mock.call_args[1]["max_workers"] == 1
+
+        del command.register["foo"]
+
+    @patch("clinner.run.base.CLI")
+    def test_command_jobs_from_settings(self, cli, monkeypatch):
+        @command(command_type=Type.SHELL)
+        def foo(*args, **kwargs):
+            return [Step(["foo"], independent=True), Step(["bar"], independent=True)]
+
+        monkeypatch.setenv("CLINNER_FOO_JOBS", "1")
+        args = ["foo"]
+        main = Main(args)
+        with patch("clinner.run.base.Popen") as popen_mock, patch(
+            "clinner.run.base.ThreadPoolExecutor", wraps=ThreadPoolExecutor
+        ) as executor_mock:
+            popen_mock.side_effect = lambda **kwargs: process(0)
+            main.run()
+
+        assert executor_mock.call_args[1]["max_workers"] == 1
+
+        del command.register["foo"]
+
+    @patch("clinner.run.base.CLI")
+    def test_command_own_timeout_and_jobs_arguments(self, cli):
+        received = {}
+
+        @command(command_type=Type.SHELL, args=((("--timeout",),), (("--jobs",),)))
+        def foo(*args, **kwargs):
+            received.update(timeout=kwargs["timeout"], jobs=kwargs["jobs"])
+            return [Step(["foo"], independent=True), Step(["bar"], independent=True)]
+
+        args = ["foo", "--timeout", "30s", "--jobs", "1"]
+        main = Main(args)
+        with patch.object(Main, "run_concurrent_steps", return_value=[]) as steps_mock:
+            main.run()
+
+        assert received == {"timeout": "30s", "jobs": "1"}
+        assert steps_mock.call_args[1]["timeout"] is None
+        assert steps_mock.call_args[1]["jobs"] is None
+
+        del command.register["foo"]
+
+    @patch("clinner.run.base.CLI")
+    def test_command_timeout(self, cli):
+        @command(command_type=Type.SHELL)
+        def foo(*args, **kwargs):
+            return [[sys.executable, "-c", "import time; time.sleep(10)"]]
+
+        args = ["--timeout", "0.2", "foo"]
+        main = Main(args)
+        return_code = main.run()
+
+        assert return_code == 124
+        assert main.cli.print_timeout.call_count == 1
+
+        del command.register["foo"]
+
+    @patch("clinner.run.base.CLI")
+    def test_command_timeout_kills_group(self, cli):
+        @command(command_type=Type.SHELL)
+        def foo(*args, **kwargs):
+            return [["sh", "-c", "sleep 6; echo done"]]
+
+        args = ["--keep-going", "--timeout", "0.5", "foo"]
+        main = Main(args)
+        start = time.monotonic()
+        return_code = main.run()
+
+        assert return_code == 124
+        assert time.monotonic() - start < 3
+
+        del command.register["foo"]
+
+    @patch("clinner.run.base.time.sleep")
+    @patch("clinner.run.base.CLI")
+    def test_command_retry_global_setting(self, cli, sleep, monkeypatch):
+        monkeypatch.setenv("CLINNER_RETRY", "5")
+
+        @command(command_type=Type.SHELL, retry=Retry(attempts=3, codes=(2,)))
+        def foo(*args, **kwargs):
+            return [["foo"]]
+
+        main = Main(["foo"])
+        with patch("clinner.run.base.Popen") as popen_mock:
+            popen_mock.side_effect = lambda **kwargs: process(1)
+            return_code = main.run()
+
+        assert return_code == 1
+        assert popen_mock.call_count == 1
+
+        del command.register["foo"]
+
+    @patch("clinner.run.base.CLI")
+    def test_command_default_args(self, cli, tmpdir):
+        @command(command_type=Type.SHELL)
+        def foo(*args, **kwargs):
+            return [["foo"] + list(args)]
+
+        path = tmpdir.join("settings.json")
+        path.write(json.dumps({"default_args": {"foo": "--bar 'foo bar'"}}))
+        args = ["-s", str(path), "foo"]
+        main = Main(args)
+        with patch("clinner.run.base.Popen") as popen_mock:
+            popen_mock.side_effect = lambda **kwargs: process(0)
+            main.run()
+
+        assert popen_mock.call_args[1]["args"] == ["foo", "--bar", "foo bar"]
+
+        settings.build_from_module(None)
+
+        del command.register["foo"]
+
+    @patch("clinner.run.base.CLI")
+    def test_command_plan(self, cli, tmpdir, monkeypatch, capsys):
+        @command(command_type=Type.SHELL)
+        def foo(*args, **kwargs):
+            return [
+                Step(["lint"], name="lint"),
+                Step(["test", "a"], independent=True, retry=2),
+                Step(["test", "b"], independent=True),
+                Step(["test", "c"], independent=True),
+            ]
+
+        monkeypatch.setenv("CLINNER_HISTORY", str(tmpdir.join("history.db")))
+        monkeypatch.setenv("CLINNER_FOO_JOBS", "2")
+        DurationStore().record("steps.foo", {"lint": 1.0, "test a": 4.0, "test b": 3.0, "test c": 2.0})
+        main = Main(["--plan", "foo"])
+        with patch("clinner.run.base.Popen") as popen_mock:
+            return_code = main.run()
+
+        plan = json.loads(capsys.readouterr().out)
+
+        assert return_code == 0
+        assert popen_mock.call_count == 0
+        assert [s["depends_on"] for s in plan["steps"]] == [[], [0], [0], [0]]
+        assert plan["steps"][1] == {
+            "id": 1,
+            "name": "test a",
+            "args": ["test", "a"],
+            "group": 1,
+            "depends_on": [0],
+            "retry": 2,
+            "expected_duration": 4.0,
+        }
+        assert [(g["parallelism"], g["expected_duration"]) for g in plan["groups"]] == [(1, 1.0), (2, 5.0)]
+        assert plan["expected_duration"] == 6.0
+        assert plan["serial_duration"] == 10.0
+
+        del command.register["foo"]
+
+    @patch("clinner.run.base.CLI")
+    def test_command_plan_repeated_steps(self, cli, tmpdir, monkeypatch, capsys):
+        @command(command_type=Type.SHELL)
+        def foo(*args, **kwargs):
+            return [["test"], ["test"], ["test"], ["lint"], ["docs"]]
+
+        monkeypatch.setenv("CLINNER_HISTORY", str(tmpdir.join("history.db")))
+        monkeypatch.setenv("CLINNER_FOO_JOBS", "1")
+        DurationStore().record("steps.foo", {"test": 2.0, "lint": 1.0})
+        main = Main(["--plan", "foo"])
+        main.run()
+
+        plan = json.loads(capsys.readouterr().out)
+
+        assert plan["estimated_steps"] == 4
+        assert plan["serial_duration"] == 7.0
+        assert plan["expected_duration"] == 7.0
+
+        del command.register["foo"]
+
+    @patch("clinner.run.base.CLI")
+    def test_command_record_durations(self, cli, tmpdir, monkeypatch):
+        @command(command_type=Type.SHELL)
+        def foo(*args, **kwargs):
+            return [["foo"], ["bar"]]
+
+        monkeypatch.setenv("CLINNER_HISTORY", str(tmpdir.join("history.db")))
+        main = Main(["--keep-going", "foo"])
+        main.record_durations = True
+        with patch("clinner.run.base.Popen") as popen_mock:
+            popen_mock.side_effect = [process(0), process(1)]
+            main.run()
+
+        assert list(DurationStore().get("steps.foo")) == ["foo"]
+
+        del command.register["foo"]
+
+    @patch("clinner.run.base.CLI")
+    def test_command_cache(self, cli, tmpdir, monkeypatch):
+        calls = []
+        path = tmpdir.join("schema.json")
+        path.write("{}")
+
+        @command(args=((("--bar",), {}),), cache=[str(path)])
+        def foo(*args, **kwargs):
+            calls.append(kwargs["bar"])
+            return 0 if kwargs["bar"] != "fail" else 1
+
+        monkeypatch.setenv("CLINNER_CACHE", str(tmpdir.join("cache")))
+        for args in (["foo", "--bar", "a"], ["-v", "foo", "--bar", "a"], ["foo", "--bar", "b"]):
+            assert Main(args).run() == 0
+
+        path.write('{"a": 1}')
+        Main(["foo", "--bar", "a"]).run()
+        Main(["--no-cache", "foo", "--bar", "a"]).run()
+        Main(["foo", "--bar", "fail"]).run()
+        Main(["foo", "--bar", "fail"]).run()
+
+        assert calls == ["a", "b", "a", "a", "fail", "fail"]
+
+        del command.register["foo"]
+
+    @patch("clinner.run.base.CLI")
+    def test_command_cache_outputs(self, cli, tmpdir, monkeypatch):
+        calls = []
+        report = tmpdir.join("report.txt")
+        tmpdir.join("in.txt").write("foo")
+
+        @command(cache={"inputs": [str(tmpdir.join("in.txt"))], "outputs": [str(report)]})
+        def foo(*args, **kwargs):
+            calls.append(1)
+            report.write("report")
+
+        monkeypatch.setenv("CLINNER_CACHE", str(tmpdir.join("cache")))
+        Main(["foo"]).run()
+        report.remove()
+        main = Main(["foo"])
+        main.run()
+
+        assert calls == [1]
+        assert report.read() == "report"
+        assert main.cli.print_cached.call_count == 1
+
+        del command.register["foo"]
+
+    @patch("clinner.run.base.CLI")
+    def test_command_step_cache(self, cli, tmpdir, monkeypatch):
+        monkeypatch.chdir(tmpdir)
+        monkeypatch.setenv("CLINNER_CACHE", str(tmpdir.join("cache")))
+        monkeypatch.setenv("GREETING", "hello")
+        code = "import os; open('gen/out.txt', 'a').write(os.environ['GREETING'])"
+        tmpdir.mkdir("gen")
+
+        @command(command_type=Type.SHELL)
+        def foo(*args, **kwargs):
+            cache = {"inputs": ["src"], "outputs": ["gen/out.txt"], "env": ["GREETING"]}
+            return [Step([sys.executable, "-c", code], cache=cache)]
+
+        tmpdir.join("src").write("foo")
+        runs = [Main(["foo"]) for _ in range(3)]
+        runs[0].run()
+        tmpdir.join("gen", "out.txt").remove()
+        runs[1].run()
+
+        assert tmpdir.join("gen", "out.txt").read() == "hello"
+        assert runs[1].cli.print_cache_stats.call_args[0] == (1, 0)
+
+        monkeypatch.setenv("GREETING", "bye")
+        runs[2].run()
+
+        assert tmpdir.join("gen", "out.txt").read() == "hellobye"
+        assert runs[2].cli.print_cache_stats.call_args[0] == (0, 1)
+
+        del command.register["foo"]
+
+    @patch("clinner.run.base.CLI")
+    def test_command_step_name(self, cli):
+        @command(command_type=Type.SHELL)
+        def foo(*args, **kwargs):
+            return [Step(["foo", "--bar"], name="foo")]
+
+        args = ["--keep-going", "foo"]
+        main = Main(args)
+        with patch("clinner.run.base.Popen") as popen_mock:
+            popen_mock.side_effect = lambda **kwargs: process(0)
+            main.run()
+
+        assert popen_mock.call_args[1]["args"] == ["foo", "--bar"]
+        assert main.cli.print_report.call_args[0][0][0].step == "foo"
+
+        del command.register["foo"]
@@ -0,0 +1,97 @@
+import json
+import os
+import subprocess
+import sys
+from unittest.mock import patch
+
+import pytest
+
+from clinner import completion
+from clinner.command import command
+from clinner.run.main import Main
+
+
+class FooMain(Main):
+    @staticmethod
+    @command(args=((("version",), {"choices": ("patch", "minor")}), (("--bar",), {"choices": ("a", "b")})))
+    def completion_foo(*args, **kwargs):
+        pass
+
+
+@pytest.fixture
+def main():
+    with patch("clinner.run.base.CLI"):
+        yield FooMain(parse_args=False)
+
+
+@pytest.fixture
+def manifest(main):
+    return completion.build_manifest(main.parser, main.command_parsers)
+
+
+class TestCaseCompletion:
+    def test_manifest(self, manifest):
+        assert "--settings" in manifest["options"]
+        assert manifest["options"]["--log-format"] == {"value": True, "choices": ["text", "json"]}
+        assert manifest["options"]["--dry-run"] == {"value": False, "choices": None}
+        assert manifest["commands"]["completion_foo"]["choices"] == ["patch", "minor"]
+        assert "--bar" in manifest["commands"]["completion_foo"]["options"]
+
+    def test_complete_commands(self, manifest):
+        assert completion.complete(manifest, ["completion_f"]) == ["completion_foo"]
+        assert completion.complete(manifest, ["-v", "completion_f"]) == ["completion_foo"]
+
+    def test_complete_global_options(self, manifest):
+        assert completion.complete(manifest, ["--dry"]) == ["--dry-run"]
+
+    def test_complete_command_options(self, manifest):
+        assert completion.complete(manifest, ["completion_foo", "--b"]) == ["--bar"]
+
+    def test_complete_option_choices(self, manifest):
+        assert completion.complete(manifest, ["--log-format", ""]) == ["json", "text"]
+        assert completion.complete(manifest, ["completion_foo", "--bar", ""]) == ["a", "b"]
+        assert completion.complete(manifest, ["--settings", ""]) == []
+
+    def test_complete_positional_choices(self, manifest):
+        assert completion.complete(manifest, ["completion_foo", "p"]) == ["patch"]
+
+    def test_complete_empty(self, manifest):
+        assert "completion_foo" in completion.complete(manifest, [])
+
+    def test_manifest_path(self, monkeypatch):
+        monkeypatch.setenv("XDG_CACHE_HOME", "/cache")
+
+        assert completion.manifest_path("/foo/build.py") == "/cache/clinner/completion/build.py.json"
+
+    @pytest.mark.parametrize("shell", completion.SHELLS)
+    def test_script(self, shell):
+        script = completion.script(shell, "./build.py", "/cache/build.py.json", python="python")
+
+        assert "python -m clinner.completion query /cache/build.py.json" in script
+        assert "_clinner_build_py" in script
+
+    def test_query_without_user_modules(self, manifest, tmpdir):
+        path = str(tmpdir.join("manifest.json"))
+        completion.write_manifest(manifest, path)
+        code = (
+            "import sys; from clinner.completion import main; main(['query', {!r}, '--', 'completion_foo', '--b']); "
+            "assert 'clinner.run' not in sys.modules and 'tests' not in sys.modules"
+        ).format(path)
+
+        output = subprocess.check_output([sys.executable, "-c", code], universal_newlines=True, cwd=os.getcwd())
+
+        assert output.split() == ["--bar"]
+
+    def test_query_missing_manifest(self, tmpdir):
+        assert completion.main(["query", str(tmpdir.join("missing.json")), "--", "foo"]) == 1
+
+    def test_main_completion(self, tmpdir, monkeypatch):
+        monkeypatch.setenv("XDG_CACHE_HOME", str(tmpdir))
+
+        with patch("clinner.run.base.CLI"), patch("clinner.run.base.sys.stdout") as stdout_mock:
+            return_code = FooMain(["--completion", "bash"]).run()
+
+        assert return_code == 0
+        assert "complete -o default" in stdout_mock.write.call_args[0][0]
+        with open(completion.manifest_path(FooMain(parse_args=False).parser.prog)) as f:
+            assert "completion_foo" in json.load(f)["commands"]
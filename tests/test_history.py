@@ -0,0 +1,53 @@
+from unittest.mock import patch
+
+import pytest
+
+from clinner.history import DurationStore
+
+
+class TestCaseDurationStore:
+    @pytest.fixture
+    def store(self, tmpdir):
+        return DurationStore(path=str(tmpdir.join("history", "durations.db")))
+
+    def test_path_from_environ(self, tmpdir):
+        with patch.dict("os.environ", {"CLINNER_HISTORY": "foo.db"}):
+            assert DurationStore().path == "foo.db"
+
+    def test_get_missing_database(self, store):
+        assert store.get("foo") == {}
+
+    def test_record(self, store):
+        store.record("foo", {"a": 1.0, "b": 2.0})
+        store.record("bar", {"a": 3.0})
+
+        assert store.get("foo") == {"a": 1.0, "b": 2.0}
+        assert store.get("bar") == {"a": 3.0}
+
+    def test_record_replace(self, store):
+        store.record("foo", {"a": 1.0})
+        store.record("foo", {"a": 2.0})
+
+        assert store.get("foo") == {"a": 2.0}
+
+    def test_get_keys(self, store):
+        store.record("foo", {"a": 1.0, "b": 2.0})
+
+        assert store.get("foo", ["a", "c"]) == {"a": 1.0}
+
+    def test_evict_stale(self, store):
+        with patch("clinner.history.time.time", return_value=0.0):
+            store.record("foo", {"a": 1.0})
+
+        with patch("clinner.history.time.time", return_value=store.max_age + 1):
+            store.record("foo", {"b": 1.0})
+
+        assert store.get("foo") == {"b": 1.0}
+
+    def test_evict_max_entries(self, store):
+        store.max_entries = 2
+        for i, key in enumerate(("a", "b", "c")):
+            with patch("clinner.history.time.time", return_value=float(i)):
+                store.record("foo", {key: 1.0})
+
+        assert store.get("foo") == {"b": 1.0, "c": 1.0}
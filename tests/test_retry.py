@@ -0,0 +1,71 @@
+from unittest.mock import patch
+
+import pytest
+
+from clinner.retry import Retry
+
+
+class TestCaseRetry:
+    def test_build_none(self):
+        assert Retry.build(None) is None
+
+    def test_build_attempts(self):
+        retry = Retry.build(5)
+
+        assert retry.attempts == 5
+
+    def test_build_dict(self):
+        retry = Retry.build({"attempts": 2, "codes": (3,)})
+
+        assert retry.attempts == 2
+        assert retry.codes == {3}
+
+    def test_build_retry(self):
+        retry = Retry()
+
+        assert Retry.build(retry) is retry
+
+    def test_build_wrong(self):
+        with pytest.raises(TypeError):
+            Retry.build("foo")
+
+    def test_wrong_attempts(self):
+        with pytest.raises(ValueError):
+            Retry(attempts=0)
+
+    def test_delay_exponential(self):
+        retry = Retry(backoff=1.0, max_backoff=100.0, jitter=False)
+
+        assert [retry.delay(i) for i in range(1, 5)] == [1.0, 2.0, 4.0, 8.0]
+
+    def test_delay_capped(self):
+        retry = Retry(backoff=1.0, max_backoff=3.0, jitter=False)
+
+        assert retry.delay(10) == 3.0
+
+    def test_delay_jitter(self):
+        retry = Retry(backoff=1.0, max_backoff=3.0)
+
+        with patch("clinner.retry.uniform", return_value=0.5) as uniform_mock:
+            assert retry.delay(2) == 0.5
+
+        assert uniform_mock.call_args[0] == (0, 2.0)
+
+    def test_retry_code(self):
+        retry = Retry()
+
+        assert retry.retry_code(1)
+        assert not retry.retry_code(0)
+        assert not retry.retry_code(None)
+
+    def test_retry_code_explicit(self):
+        retry = Retry(codes=(2,))
+
+        assert retry.retry_code(2)
+        assert not retry.retry_code(1)
+
+    def test_retry_exception(self):
+        retry = Retry(exceptions=(ConnectionError,))
+
+        assert retry.retry_exception(ConnectionRefusedError())
+        assert not retry.retry_exception(ValueError())
@@ -0,0 +1,303 @@
+import json
+import os
+import threading
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+from clinner.exceptions import ImproperlyConfigured
+from clinner.retry import Retry
+from clinner.settings import CommandSettings, Settings, get_settings, is_settings_file, settings, use_settings
+
+
+@pytest.fixture
+def module():
+    return SimpleNamespace(
+        clinner_default_args={"foo": "-v"},
+        CLINNER_TIMEOUT=10,
+        clinner_commands={"foo": {"jobs": 2}, "bar": {"timeout": 5, "retry": 3}},
+    )
+
+
+class TestCaseSettings:
+    def test_get(self, module):
+        assert Settings.get(module, "clinner_timeout") == 10
+        assert Settings.get(module, "CLINNER_DEFAULT_ARGS") == {"foo": "-v"}
+        assert Settings.get(module, "missing", "default") == "default"
+
+    def test_build_from_module(self, module):
+        s = Settings()
+        s.build(module, environ={})
+
+        assert s.default_args == {"foo": ("-v",)}
+        assert s.command("foo") == CommandSettings(timeout=10.0, jobs=2)
+        assert s.command("bar").timeout == 5.0
+        assert s.command("bar").retry.attempts == 3
+        assert s.command("unknown") == CommandSettings(timeout=10.0)
+
+    def test_command_defaults(self, module):
+        module.clinner_retry = 5
+        s = Settings()
+        s.build(module, environ={})
+        retry = Retry(attempts=2, codes=(3,))
+
+        assert s.command("foo", defaults={"retry": retry}).retry is retry
+        assert s.command("bar", defaults={"retry": retry}).retry.attempts == 3
+        assert s.command("foo", defaults={"retry": None}).retry.attempts == 5
+
+    def test_default_args_immutable(self, module):
+        s = Settings()
+        s.build(module, environ={})
+
+        with pytest.raises(TypeError):
+            s.default_args["bar"] = "-q"
+
+    def test_file(self, module, tmpdir):
+        path = tmpdir.join("clinner.json")
+        path.write(json.dumps({"default_args": {"bar": ["-q", "a b"]}, "jobs": 4, "commands": {"bar": {"timeout": 1}}}))
+
+        s = Settings()
+        s.build(module, path=str(path), environ={})
+
+        assert s.default_args == {"foo": ("-v",), "bar": ("-q", "a b")}
+        assert s.command("foo") == CommandSettings(timeout=10.0, jobs=4)
+        assert s.command("bar").timeout == 1.0
+
+    def test_pyproject(self, tmpdir):
+        path = tmpdir.join("pyproject.toml")
+        path.write(
+            '[tool.poetry]\nname = "foo"\n\n[tool.clinner]\ntimeout = 3\n\n[tool.clinner.commands.foo]\njobs = 2\n'
+        )
+
+        s = Settings()
+        s.build(path=str(path), environ={})
+
+        assert s.command("foo") == CommandSettings(timeout=3.0, jobs=2)
+
+    def test_file_wrong_format(self, tmpdir):
+        path = tmpdir.join("clinner.yml")
+        path.write("")
+
+        with pytest.raises(ImproperlyConfigured):
+            Settings().build(path=str(path), environ={})
+
+    def test_file_missing(self, tmpdir):
+        with pytest.raises(ImproperlyConfigured):
+            Settings().build(path=str(tmpdir.join("missing.json")), environ={})
+
+    def test_environment(self, module):
+        s = Settings()
+        s.build(module, environ={"CLINNER_JOBS": "8", "CLINNER_FOO_BAR_TIMEOUT": "1.5", "CLINNER_HISTORY": "foo"})
+
+        assert s.command("foo") == CommandSettings(timeout=10.0, jobs=8)
+        assert s.command("foo-bar") == CommandSettings(timeout=1.5, jobs=8)
+
+    def test_command_line(self, module):
+        s = Settings()
+        s.build(module, environ={"CLINNER_FOO_JOBS": "8"})
+
+        assert s.command("foo", jobs=1, timeout=None, verbose=2) == CommandSettings(timeout=10.0, jobs=1)
+        assert s.command("foo") == CommandSettings(timeout=10.0, jobs=8)
+
+    def test_wrong_value(self, module):
+        with pytest.raises(ImproperlyConfigured):
+            Settings().build(module, environ={"CLINNER_JOBS": "0"})
+
+    def test_unknown_setting(self):
+        with pytest.raises(ImproperlyConfigured):
+            Settings().build(SimpleNamespace(clinner_commands={"foo": {"foo": 1}}), environ={})
+
+    def test_memoized(self, module):
+        s = Settings()
+        s.build(module, environ={})
+
+        assert s.command("foo") is s.command("foo")
+
+    def test_reset(self, module):
+        s = Settings()
+        s.build(module, environ={})
+        s.reset_default()
+
+        assert s.default_args == {}
+        assert s.command("foo") == CommandSettings()
+
+    def test_ini(self, tmpdir):
+        path = tmpdir.join("setup.cfg")
+        path.write(
+            "[metadata]\nname = foo\n\n[clinner]\ntimeout = 3\n\n[clinner.default_args]\nfooBar = -v --bar\n\n"
+            "[clinner.commands.fooBar]\nretry = 2\n"
+        )
+
+        s = Settings()
+        s.build(path=str(path), environ={})
+
+        assert s.default_args == {"fooBar": ("-v", "--bar")}
+        assert s.command("fooBar").timeout == 3.0
+        assert s.command("fooBar").retry.attempts == 2
+
+    def test_is_settings_file(self, tmpdir):
+        path = tmpdir.join("clinner.toml")
+        path.write("")
+
+        assert is_settings_file(str(path))
+        assert not is_settings_file(str(tmpdir.join("missing.toml")))
+        assert not is_settings_file("package.settings")
+        assert not is_settings_file(None)
+
+    def test_build_from_module_file(self, tmpdir, monkeypatch):
+        monkeypatch.delenv("CLINNER_SETTINGS_FILE", raising=False)
+        path = tmpdir.join("clinner.json")
+        path.write(json.dumps({"default_args": {"foo": "-v"}}))
+
+        s = Settings()
+        s.build_from_module(str(path))
+
+        assert s.default_args == {"foo": ("-v",)}
+        assert [layer["source"] for layer in s.layers] == ["defaults", "file {}".format(path), "environment"]
+
+    def test_file_cached(self, tmpdir):
+        path = tmpdir.join("clinner.json")
+        path.write(json.dumps({"jobs": 2}))
+
+        s = Settings()
+        with patch.object(Settings, "_read_file", wraps=Settings._read_file) as read_mock:
+            s.build(path=str(path), environ={})
+            s.build(path=str(path), environ={})
+
+            assert read_mock.call_count == 1
+
+            path.write(json.dumps({"jobs": 3}))
+            os.utime(str(path), ns=(0, 0))
+            s.build(path=str(path), environ={})
+
+            assert read_mock.call_count == 2
+            assert s.command("foo").jobs == 3
+
+    def test_build_from_module_cached(self, module, monkeypatch):
+        monkeypatch.delenv("CLINNER_SETTINGS_FILE", raising=False)
+        s = Settings()
+        s.build_from_module(module)
+
+        with patch.object(Settings, "build") as build_mock:
+            s.build_from_module(module)
+            s.refresh()
+
+        assert build_mock.call_count == 0
+
+    def test_build_from_module_changed(self, module, monkeypatch):
+        s = Settings()
+        s.build_from_module(module)
+
+        module.clinner_default_args = {"foo": "-q"}
+        s.refresh()
+
+        assert s.default_args == {"foo": ("-q",)}
+
+        monkeypatch.setenv("CLINNER_FOO_JOBS", "3")
+        s.refresh()
+
+        assert s.command("foo").jobs == 3
+
+    def test_build_from_module_modified_in_place(self, module, monkeypatch):
+        monkeypatch.delenv("CLINNER_SETTINGS_FILE", raising=False)
+        s = Settings()
+        s.build_from_module(module)
+
+        module.clinner_default_args["foo"] = "-q"
+        s.refresh()
+
+        assert s.default_args == {"foo": ("-q",)}
+
+        module.clinner_commands["foo"] = {"jobs": 5}
+        s.refresh()
+
+        assert s.command("foo").jobs == 5
+
+        with patch.object(Settings, "build") as build_mock:
+            s.refresh()
+
+        assert build_mock.call_count == 0
+
+    def test_build_from_module_new_equal_object(self, module, monkeypatch):
+        monkeypatch.delenv("CLINNER_SETTINGS_FILE", raising=False)
+        module.clinner_retry = Retry(attempts=2)
+        s = Settings()
+        s.build_from_module(module)
+
+        module.clinner_retry = Retry(attempts=2)
+        with patch.object(Settings, "build") as build_mock:
+            s.refresh()
+
+        assert build_mock.call_count == 0
+
+        module.clinner_retry = Retry(attempts=4)
+        s.refresh()
+
+        assert s.command("foo").retry.attempts == 4
+
+    def test_invalidate(self, module):
+        s = Settings()
+        s.build_from_module(module)
+
+        with patch.object(Settings, "build") as build_mock:
+            s.invalidate()
+            s.refresh()
+
+        assert build_mock.call_count == 1
+
+    def test_refresh_not_built(self, monkeypatch):
+        monkeypatch.setenv("CLINNER_JOBS", "2")
+        s = Settings()
+
+        s.refresh()
+
+        assert s.command("foo").jobs == 2
+
+    def test_copy(self, module):
+        s = Settings()
+        s.build_from_module(module)
+        copied = s.copy()
+
+        module.clinner_default_args = {"foo": "-q"}
+        s.refresh()
+
+        assert s.default_args == {"foo": ("-q",)}
+        assert copied.default_args == {"foo": ("-v",)}
+
+
+class TestCaseContextSettings:
+    def test_global_settings(self):
+        assert settings.default_args is get_settings().default_args
+        assert isinstance(settings, Settings)
+
+    def test_use_settings(self, module):
+        s = Settings()
+        s.build(module, environ={})
+
+        with use_settings(s):
+            assert get_settings() is s
+            assert settings.command("foo").jobs == 2
+
+            with use_settings(Settings()):
+                assert settings.command("foo").jobs is None
+
+            assert settings.command("foo").jobs == 2
+
+        assert get_settings() is not s
+
+    def test_use_settings_per_thread(self, module):
+        s = Settings()
+        s.build(module, environ={})
+        jobs = []
+
+        def run():
+            jobs.append(settings.command("foo").jobs)
+
+        with use_settings(s):
+            thread = threading.Thread(target=run)
+            thread.start()
+            thread.join()
+            run()
+
+        assert jobs == [None, 2]
@@ -0,0 +1,44 @@
+import pytest
+
+from clinner.template import CommandTemplate, tokenize
+
+
+class TestCaseTemplate:
+    def test_tokenize_string(self):
+        assert tokenize("foo --bar 'foo bar'") == ("foo", "--bar", "foo bar")
+
+    def test_tokenize_sequence(self):
+        assert tokenize(["foo", "--bar", 1]) == ("foo", "--bar", "1")
+
+    def test_render(self):
+        template = CommandTemplate("tox -e {env}")
+
+        assert template.render(env="py36") == ["tox", "-e", "py36"]
+
+    def test_render_args(self):
+        template = CommandTemplate("flake8")
+
+        assert template.render("foo.py", "bar.py") == ["flake8", "foo.py", "bar.py"]
+
+    def test_render_value_not_split(self):
+        template = CommandTemplate("sphinx-build {source}")
+
+        assert template.render(source="doc source") == ["sphinx-build", "doc source"]
+
+    def test_render_escaped_braces(self):
+        template = CommandTemplate(["echo", "{{foo}}", "--{bar}"])
+
+        assert template.render(bar="bar") == ["echo", "{foo}", "--bar"]
+
+    def test_render_missing_field(self):
+        with pytest.raises(KeyError):
+            CommandTemplate("tox -e {env}").render()
+
+    def test_render_does_not_modify_template(self):
+        template = CommandTemplate("tox -e {env}")
+        template.render(env="py36")
+
+        assert template.tokens == ("tox", "-e", "{env}")
+
+    def test_repr(self):
+        assert repr(CommandTemplate(["foo", "foo bar"])) == "CommandTemplate(\"foo 'foo bar'\")"